@@ -0,0 +1,193 @@
+"""Space Arena batch runner: bot-only matches over a process pool, one JSON line per match.
+
+    python batch.py --seeds 0-999 --teams 2,4,6 --out results.jsonl
+    python batch.py --seeds 0-99 --set CAPTURE_TIME=6,8,10 --set NUM_OBSTACLES=60 --out sweep.jsonl
+
+Every (seed, teams, overrides) combination is one match. Results stream to --out as
+matches finish; rerunning the same command skips matches already in the file, so an
+interrupted batch resumes where it stopped.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from typing import Any, Dict, Iterator, List, Tuple
+
+import space_arena as sa
+
+Job = Tuple[int, int, Dict[str, Any], int]  # seed, teams, overrides, ticks
+
+# Constants the simulation reads while it runs. Others are bound at import time (ARENA_W/H
+# through SPAWN_ZONES, FPS/SIM_DT, default arguments) and setting them would do nothing.
+OVERRIDABLE = (
+    'TEAM_SIZE', 'NUM_OBSTACLES', 'NUM_POINTS', 'POINT_RADIUS', 'CAPTURE_TIME', 'KILL_SCORE',
+    'INVULN_TIME', 'MAX_LEVEL', 'MAX_UPGRADE_LEVEL', 'SPHERE_BASE_REQUIREMENT', 'SPHERE_STEP',
+    'TELEPORT_CD', 'QUANTUM_CD', 'REINFORCE_CD', 'REINFORCE_LIFETIME', 'ULTIMATE_CD',
+    'AI_PLAN_NEAR', 'AI_PLAN_FAR', 'AI_LOD_MARGIN', 'AI_PLAN_BUDGET',
+)
+
+_DEFAULTS: Dict[str, Any] = {}  # overridable constants as imported, restored before every job
+
+
+# -----------------------------
+# Matrix
+# -----------------------------
+def parse_seeds(spec: str) -> List[int]:
+    """'0-99,200,300-309' -> seeds"""
+    seeds = []
+    for part in spec.split(','):
+        lo, sep, hi = part.partition('-')
+        if sep:
+            seeds.extend(range(int(lo), int(hi) + 1))
+        else:
+            seeds.append(int(part))
+    return seeds
+
+
+def parse_override(spec: str) -> Tuple[str, List[Any]]:
+    """'NAME=v1,v2' -> (NAME, values), typed like the constant being overridden"""
+    name, sep, values = spec.partition('=')
+    if not sep:
+        raise ValueError(f"expected NAME=value[,value...], got {spec!r}")
+    if name not in OVERRIDABLE:
+        raise ValueError(f"{name} cannot be overridden; one of: {', '.join(OVERRIDABLE)}")
+    current = getattr(sa, name)
+    return name, [type(current)(v) for v in values.split(',')]
+
+
+def job_key(seed: int, teams: int, overrides: Dict[str, Any]) -> str:
+    return json.dumps([seed, teams, sorted(overrides.items())], separators=(',', ':'))
+
+
+def jobs(seeds: List[int], teams: List[int], overrides: List[Tuple[str, List[Any]]],
+         ticks: int) -> Iterator[Job]:
+    names = [name for name, _ in overrides]
+    for combo in itertools.product(*(values for _, values in overrides)):
+        cfg = dict(zip(names, combo))
+        for t in teams:
+            for seed in seeds:
+                yield seed, t, cfg, ticks
+
+
+def done_keys(path: str) -> set:
+    """Keys of matches already in the results file; a torn last line is ignored"""
+    keys = set()
+    if not os.path.exists(path):
+        return keys
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if 'error' not in rec:
+                keys.add(rec['key'])
+    return keys
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+# -----------------------------
+# Workers
+# -----------------------------
+def _init_worker():
+    _DEFAULTS.update((name, getattr(sa, name)) for name in OVERRIDABLE)
+
+
+def run_job(job: Job) -> Dict[str, Any]:
+    seed, teams, overrides, ticks = job
+    rec: Dict[str, Any] = {'key': job_key(seed, teams, overrides), 'seed': seed, 'teams': teams,
+                           'overrides': overrides}
+    for name, value in _DEFAULTS.items():
+        setattr(sa, name, value)
+    for name, value in overrides.items():
+        setattr(sa, name, value)
+    try:
+        world = sa.World(seed=seed, num_teams=sa.clamp(teams, 2, sa.MAX_TEAMS_LIMIT))
+        res = world.simulate(ticks)
+    except Exception:
+        rec['error'] = traceback.format_exc(limit=-3)
+        return rec
+    rec.update({
+        'winner': res['winner'],
+        'winner_name': res['winner_name'],
+        'duration': res['sim_seconds'],
+        'ticks': res['ticks'],
+        'wall_seconds': res['wall_seconds'],
+        'kills': res['kills'],
+        'weapon_usage': res['weapon_usage'],
+        'team_scores': res['team_scores'],
+        'points_owned': res['points_owned'],
+        'digest': res['digest'],
+    })
+    return rec
+
+
+# -----------------------------
+# Driver
+# -----------------------------
+def run_batch(todo: List[Job], out: str, workers: int) -> int:
+    """Fan jobs out over the pool, append each result as it lands; returns the error count"""
+    errors = 0
+    sim = 0.0
+    t0 = time.perf_counter()
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'a', encoding='utf-8') as f, multiprocessing.Pool(workers, _init_worker) as pool:
+        if f.tell() and not _ends_with_newline(out):
+            f.write('\n')  # a torn line from an interrupted run stays on its own
+        for i, rec in enumerate(pool.imap_unordered(run_job, todo), 1):
+            f.write(json.dumps(rec, ensure_ascii=False) + '\n')
+            f.flush()
+            if 'error' in rec:
+                errors += 1
+                print(f"match {rec['key']} failed:\n{rec['error']}", file=sys.stderr)
+            else:
+                sim += rec['duration']
+            wall = time.perf_counter() - t0
+            if i == len(todo) or i % max(1, workers) == 0:
+                print(f"\r{i}/{len(todo)} matches  {i / wall:.2f} matches/s  "
+                      f"{sim / wall:.0f}x realtime  {errors} errors", end='', file=sys.stderr)
+    print(file=sys.stderr)
+    return errors
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Space Arena batch match runner")
+    ap.add_argument('--seeds', default='0-99', help="seed list/ranges, e.g. 0-999 or 1,5,10-20")
+    ap.add_argument('--teams', default='2', help="team counts, e.g. 2,4,6")
+    ap.add_argument('--set', dest='overrides', action='append', default=[], metavar='NAME=V1[,V2]',
+                    help="override a space_arena constant (see OVERRIDABLE); several values add a matrix axis")
+    ap.add_argument('--ticks', type=int, default=sa.FPS * 300, help="max ticks per match")
+    ap.add_argument('--out', default='batch_results.jsonl', help="JSON-lines results file (appended, resumable)")
+    ap.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help="worker processes")
+    args = ap.parse_args(argv)
+
+    try:
+        overrides = [parse_override(spec) for spec in args.overrides]
+    except ValueError as e:
+        ap.error(str(e))
+    teams = [int(t) for t in args.teams.split(',')]
+    all_jobs = list(jobs(parse_seeds(args.seeds), teams, overrides, args.ticks))
+    done = done_keys(args.out)
+    todo = [j for j in all_jobs if job_key(*j[:3]) not in done]
+    print(f"{len(all_jobs)} matches, {len(all_jobs) - len(todo)} already in {args.out}, "
+          f"{len(todo)} to run on {args.jobs} workers", file=sys.stderr)
+    if not todo:
+        return 0
+    try:
+        return 1 if run_batch(todo, args.out, args.jobs) else 0
+    except KeyboardInterrupt:
+        print("\ninterrupted; rerun the same command to resume", file=sys.stderr)
+        return 130
+
+
+if __name__ == '__main__':
+    sys.exit(main())
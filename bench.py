@@ -0,0 +1,831 @@
+"""Space Arena benchmarks (headless).
+
+    python bench.py collisions     # projectile-vs-ship broadphase vs brute force
+    python bench.py bullets        # BulletPool tick cost at 20k bullets
+    python bench.py entities       # tick cost vs entity count, vs list.remove()
+    python bench.py seek           # replay keyframe index + random seek latency
+    python bench.py arenas         # N worlds stepped round-robin in one process
+    python bench.py scenarios      # named match scenarios: per-phase mean/p95/p99 vs bench_baseline.json
+    python bench.py sweep          # per-phase cost as ship/bullet/obstacle counts grow
+    python bench.py micro          # ns/call and allocations/call of hot helpers vs bench_micro_baseline.json
+    python bench.py gc             # frame-time p99 of a 10-minute 6-team match under each GC policy
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import space_arena as sa
+
+
+def _timeit(fn, repeat: int) -> float:
+    """Best-of-N wall time of fn(), ms"""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def _world(num_teams: int, team_size: int, seed: int) -> sa.World:
+    random.seed(seed)
+    world = sa.World(seed=seed, num_teams=num_teams)
+    world.team_size = team_size
+    world.reset_world()
+    # Pull every team into the centre so projectiles actually meet ships
+    for sh in world.ships:
+        sh.x = sa.ARENA_W / 2 + random.uniform(-1500, 1500)
+        sh.y = sa.ARENA_H / 2 + random.uniform(-1500, 1500)
+    return world
+
+
+# -----------------------------
+# Projectile-vs-ship collisions
+# -----------------------------
+def _brute_force_hits(pool: sa.BulletPool, ships):
+    """The pre-broadphase O(P*S) loop: fresh Rects per pair, first ship wins"""
+    hits = []
+    for i in range(pool.n):
+        r = int(pool.radius[i])
+        br = sa.pygame.Rect(int(pool.x[i] - r), int(pool.y[i] - r), r*2, r*2)
+        team = pool.team[i]
+        for j, sh in enumerate(ships):
+            if sh.dead or sh.team == team:
+                continue
+            sr = sa.pygame.Rect(int(sh.x - sh.size*0.6), int(sh.y - sh.size*0.6), int(sh.size*1.2), int(sh.size*1.2))
+            if br.colliderect(sr):
+                hits.append((i, j))
+                break
+    return hits
+
+
+def _broadphase_hits(pool: sa.BulletPool, ships, bp: sa.ShipBroadphase):
+    bp.build(ships)
+    return [(bi, cands[0]) for bi, cands in pool.ship_candidates(bp)]
+
+
+def _fill_pool(pool: sa.BulletPool, ships, n: int, rnd: random.Random, spread: float = 1600):
+    pool.clear()
+    for _ in range(n):
+        owner = rnd.choice(ships)
+        ang = rnd.uniform(0, 2 * math.pi)
+        pool.emit(sa.ARENA_W / 2 + rnd.uniform(-spread, spread),
+                  sa.ARENA_H / 2 + rnd.uniform(-spread, spread),
+                  math.cos(ang), math.sin(ang), owner.team, owner,
+                  speed=rnd.choice((820, 900, 950)), life=rnd.uniform(0.7, 1.6))
+
+
+def bench_collisions(counts=(500, 2000, 10000), num_teams=6, team_size=4, repeat=5, seed=1):
+    game = _world(num_teams, team_size, seed)
+    ships = game.ships
+    bp = sa.ShipBroadphase()
+    pool = sa.BulletPool()
+    print(f"ships: {len(ships)} ({num_teams} teams x {team_size})")
+    print(f"{'projectiles':>12} {'brute ms':>10} {'hash ms':>10} {'speedup':>8} {'hits':>6}")
+    for n in counts:
+        _fill_pool(pool, ships, n, random.Random(seed + n))
+        ref = _brute_force_hits(pool, ships)
+        got = _broadphase_hits(pool, ships, bp)
+        if ref != got:
+            print(f"MISMATCH at {n} projectiles", file=sys.stderr)
+            return 1
+        brute = _timeit(lambda: _brute_force_hits(pool, ships), repeat)
+        fast = _timeit(lambda: _broadphase_hits(pool, ships, bp), repeat)
+        print(f"{n:>12} {brute:>10.2f} {fast:>10.2f} {brute / fast:>7.1f}x {len(got):>6}")
+    return 0
+
+
+def bench_bullets(count=20000, num_teams=6, team_size=4, ticks=120, seed=1):
+    """Full per-tick bullet cost (integrate/expire/compact + collide) at a steady count"""
+    game = _world(num_teams, team_size, seed)
+    for sh in game.ships:
+        sh.invuln = 1e9  # keep the ship set stable
+    rnd = random.Random(seed)
+    pool = game.projectiles.bullets
+    _fill_pool(pool, game.ships, count, rnd)
+    dt = 1.0 / sa.FPS
+    times = []
+    for _ in range(ticks):
+        # top up what expired last tick so the count stays flat
+        while pool.n < count:
+            owner = rnd.choice(game.ships)
+            ang = rnd.uniform(0, 2 * math.pi)
+            pool.emit(sa.ARENA_W / 2 + rnd.uniform(-1600, 1600), sa.ARENA_H / 2 + rnd.uniform(-1600, 1600),
+                      math.cos(ang), math.sin(ang), owner.team, owner, life=rnd.uniform(0.7, 1.6))
+        t0 = time.perf_counter()
+        pool.update(dt)
+        game.handle_combat(dt)
+        times.append((time.perf_counter() - t0) * 1000.0)
+    times.sort()
+    budget = 1000.0 / sa.FPS
+    mean = sum(times) / len(times)
+    p95 = times[int(len(times) * 0.95) - 1]
+    print(f"bullets: {count}  ships: {len(game.ships)}  mean {mean:.2f} ms  p95 {p95:.2f} ms  (budget {budget:.1f} ms)")
+    return 0 if p95 < budget else 1
+
+
+# -----------------------------
+# Entity containers
+# -----------------------------
+def _legacy_update(lst, dt):
+    """The old pattern: iterate a copy, list.remove() whatever expired"""
+    for obj in list(lst):
+        obj.update(dt)
+        if obj.life <= 0:
+            lst.remove(obj)
+
+
+def bench_entities(counts=(1000, 4000, 16000, 32000), ticks=60, seed=1):
+    """Per-tick cost of projectile/effect updates as bullet, particle, trail and text counts grow"""
+    dt = 1.0 / sa.FPS
+    game = _world(2, sa.TEAM_SIZE, seed)
+    for sh in game.ships:
+        sh.invuln = 1e9
+    print(f"{'entities':>9} {'tick ms':>9} {'ns/entity':>10} {'legacy ms':>10}")
+    for n in counts:
+        rnd = random.Random(seed + n)
+        game.projectiles.bullets.clear(); game.particles.clear(); game.trails.clear(); game.dmgtexts.clear()
+        legacy = []
+
+        def top_up():
+            # 1/4 of the entities of each kind; lifetimes spread so ~1-2% expire per tick
+            while game.projectiles.bullets.n < n // 4:
+                ang = rnd.uniform(0, 2 * math.pi)
+                game.projectiles.bullets.emit(rnd.uniform(0, sa.ARENA_W), rnd.uniform(0, sa.ARENA_H),
+                                  math.cos(ang), math.sin(ang), 9, None, speed=1, life=rnd.uniform(0.5, 2.0))
+            k = n // 4 - game.particles.n
+            if k > 0:
+                game.particles.emit_burst(rnd.uniform(0, sa.ARENA_W), rnd.uniform(0, sa.ARENA_H),
+                                          [rnd.uniform(-50, 50) for _ in range(k)], [rnd.uniform(-50, 50) for _ in range(k)],
+                                          rnd.uniform(0.5, 2.0), (255, 255, 255), 2)
+            while len(game.trails) < n // 4:
+                game.trails.append(sa.entity_pools.acquire(sa.TrailSeg, rnd.uniform(0, sa.ARENA_W), -500, 6, rnd.uniform(0.5, 2.0), 9))
+            while len(game.dmgtexts) < n // 4:
+                game.dmgtexts.append(sa.entity_pools.acquire(sa.DamageText, 0, 0, "1", rnd.uniform(0.5, 2.0)))
+            while len(legacy) < n // 2:
+                legacy.append(sa.TrailSeg(0, 0, 6, rnd.uniform(0.5, 2.0), 9))
+
+        times = []
+        legacy_times = []
+        for _ in range(ticks):
+            top_up()
+            t0 = time.perf_counter()
+            game._update_projectiles(dt)
+            game._update_effects(dt)
+            for lst in game.entity_lists():
+                lst.compact()
+            times.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            _legacy_update(legacy, dt)
+            legacy_times.append(time.perf_counter() - t0)
+        mean = sum(times) / len(times)
+        legacy_mean = sum(legacy_times) / len(legacy_times)
+        print(f"{n:>9} {mean * 1000:>9.2f} {mean * 1e9 / n:>10.0f} {legacy_mean * 1000:>10.2f}")
+    return 0
+
+
+# -----------------------------
+# Replay seeking
+# -----------------------------
+def _synthetic_replay(path: str, minutes: float, num_teams: int, seed: int) -> int:
+    """Scripted 'human' input written straight through ReplayWriter; returns the tick count"""
+    rnd = random.Random(seed)
+    ticks = int(minutes * 60 * sa.FPS)
+    w = sa.ReplayWriter.create(path, sa.ReplayHeader(seed, num_teams, sa.TEAM_SIZE, sa.NUM_OBSTACLES))
+    buttons, ax, ay = 0, sa.ARENA_W // 4, sa.ARENA_H // 4
+    moves = (0, sa.IN_FIRE, sa.IN_UP | sa.IN_FIRE, sa.IN_RIGHT | sa.IN_FIRE, sa.IN_DOWN | sa.IN_LEFT, sa.IN_DOWN)
+    for tick in range(1, ticks + 1):
+        if rnd.random() < 0.05:
+            buttons = rnd.choice(moves)
+        if buttons & sa.IN_FIRE:
+            ax += rnd.randint(-6, 6); ay += rnd.randint(-6, 6)
+        actions = [('weapon', rnd.randint(0, 8))] if rnd.random() < 0.01 else []
+        if rnd.random() < 0.002:
+            actions.append(('upgrade', rnd.choice(('speed', 'damage', 'Laser', 'Missile'))))
+        w.write(tick, sa.PlayerInput(buttons, ax, ay, actions))
+    w.close(ticks)
+    return ticks
+
+
+def _replay_game(path: str) -> sa.Game:
+    game = sa.Game(headless=True)
+    game.load_replay(path)
+    game.reset_world()
+    game.state = sa.GameState.PLAY
+    return game
+
+
+def bench_seek(minutes=15.0, num_teams=2, seeks=60, seed=1):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.sarp')
+        ticks = _synthetic_replay(path, minutes, num_teams, seed)
+        print(f"replay: {minutes:g} min, {ticks} ticks, {os.path.getsize(path)} bytes, {num_teams} teams")
+        game = _replay_game(path)
+        t0 = time.perf_counter()
+        game.seeker.build()
+        index_s = time.perf_counter() - t0
+        kf = game.seeker.keyframes
+        end = game.seeker.ticks[-1]
+        print(f"index: {index_s:.1f} s, {len(kf)} keyframes, {sum(map(len, kf.values())) / 2**20:.1f} MB")
+
+        # A seek must land on exactly the state a straight run reaches
+        probe = (end * 2) // 3 + 7
+        straight = _replay_game(path)
+        while straight.tick < probe:
+            straight.update(sa.SIM_DT)
+        game.seeker.seek(probe)
+        if game.state_digest() != straight.state_digest():
+            print(f"MISMATCH after seeking to tick {probe}", file=sys.stderr)
+            return 1
+
+        rnd = random.Random(seed)
+        times = []
+        for _ in range(seeks):
+            target = rnd.randint(0, end)
+            t0 = time.perf_counter()
+            game.seeker.seek(target)
+            times.append((time.perf_counter() - t0) * 1000.0)
+        times.sort()
+        p50 = times[len(times) // 2]
+        p95 = times[int(len(times) * 0.95) - 1]
+        print(f"seek: p50 {p50:.1f} ms  p95 {p95:.1f} ms  max {times[-1]:.1f} ms  (target 50 ms)")
+        return 0 if p95 < 50.0 else 1
+
+
+# -----------------------------
+# Independent arenas
+# -----------------------------
+def bench_arenas(count=10, num_teams=2, ticks=600, seed=1):
+    """Arenas stepped round-robin in one process vs the same arenas run one at a time"""
+    def make(i):
+        world = sa.World(seed=seed + i, num_teams=num_teams)
+        world.reset_world()
+        return world
+
+    t0 = time.perf_counter()
+    alone = []
+    for i in range(count):
+        world = make(i)
+        for _ in range(ticks):
+            world.update(sa.SIM_DT)
+        alone.append(world.state_digest())
+    one = (time.perf_counter() - t0) / count
+
+    worlds = [make(i) for i in range(count)]
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        for world in worlds:
+            world.update(sa.SIM_DT)
+    shared = time.perf_counter() - t0
+
+    print(f"1 arena: {one * 1000 / ticks:.2f} ms/tick   {count} round-robin: {shared * 1000 / ticks:.2f} ms/tick "
+          f"({shared / one:.1f}x one arena)")
+    if [w.state_digest() for w in worlds] != alone:
+        print("CROSS-TALK: round-robin digests differ from isolated runs", file=sys.stderr)
+        return 1
+    print("round-robin digests match isolated runs")
+    return 0
+
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+
+class Scenario(NamedTuple):
+    teams: int
+    team_size: int
+    ticks: int
+    setup: Optional[Callable] = None  # (world, rnd) after reset_world
+    per_tick: Optional[Callable] = None  # (world, rnd) before every update
+    obstacles: int = sa.NUM_OBSTACLES
+
+
+def _percentile(sorted_vals: List[float], q: float) -> float:
+    return sorted_vals[min(len(sorted_vals) - 1, int(len(sorted_vals) * q))]
+
+
+def _to_points(world, rnd):
+    """Everyone starts on a capture point instead of in their spawn zone"""
+    for sh in world.ships:
+        cp = rnd.choice(world.capture_points)
+        sh.x = cp.x + rnd.uniform(-cp.radius, cp.radius)
+        sh.y = cp.y + rnd.uniform(-cp.radius, cp.radius)
+
+
+def _arm(world, weapon: str):
+    for sh in world.ships:
+        sh.unlocked = {w: w == weapon for w in sa.WEAPON_TYPES}
+        sh.weapon = sa.WEAPON_TYPES.index(weapon)
+        sh.up_firerate = sa.MAX_UPGRADE_LEVEL
+
+
+def _shotgun_setup(world, rnd):
+    _to_points(world, rnd)
+    _arm(world, 'Shotgun')
+
+
+def _shotgun_top_up(world, rnd, count=5000):
+    """Keep the bullet pool at count: the AI alone can't fire that many pellets"""
+    pool = world.projectiles.bullets
+    while pool.n < count:
+        owner = rnd.choice(world.ships)
+        ang = rnd.uniform(0, 2 * math.pi)
+        pool.emit(owner.x, owner.y, math.cos(ang), math.sin(ang), owner.team, owner,
+                  speed=900, life=rnd.uniform(0.4, 0.9))
+
+
+def _missile_setup(world, rnd):
+    _to_points(world, rnd)
+    _arm(world, 'Missile')
+
+
+def _late_game_setup(world, rnd):
+    """Trail maxed, every weapon open and a career's worth of upgrades spent"""
+    for sh in world.ships:
+        sh.up_trail = sa.MAX_UPGRADE_LEVEL
+        sh.unlocked = {w: True for w in sa.WEAPON_TYPES}
+        sh.upgrade_points = 30
+        while sh.upgrade_points > 0:
+            left = sh.upgrade_points
+            world.apply_random_upgrade(sh)
+            if sh.upgrade_points == left:
+                break
+    _to_points(world, rnd)
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    'opener': Scenario(2, sa.TEAM_SIZE, 1800),
+    'brawl': Scenario(6, 4, 900, setup=_to_points),
+    'shotgun': Scenario(6, 4, 600, setup=_shotgun_setup, per_tick=_shotgun_top_up),
+    'missiles': Scenario(6, 4, 900, setup=_missile_setup),
+    'late_game': Scenario(4, 6, 900, setup=_late_game_setup),
+    'obstacles': Scenario(2, sa.TEAM_SIZE, 900, obstacles=1000),
+}
+
+
+def _scenario_world(sc: Scenario, seed: int, draw: bool):
+    """A World, or with draw=True a headless Game rendering into an offscreen surface"""
+    if draw:
+        world = sa.Game(headless=True, seed=seed)
+        world.num_teams = sc.teams
+        sa.pygame.font.init()
+        world.screen = sa.pygame.Surface((sa.SCREEN_W, sa.SCREEN_H))
+        world._init_fonts()
+    else:
+        world = sa.World(seed=seed, num_teams=sc.teams)
+    world.team_size = sc.team_size
+    world.num_obstacles = sc.obstacles
+    world.reset_world()
+    world.state = sa.GameState.PLAY
+    if draw:
+        world.camera.center_on(sa.ARENA_W / 2, sa.ARENA_H / 2)
+    return world
+
+
+def run_scenario(sc: Scenario, seed=1, draw=False, ticks: Optional[int] = None,
+                 work: Optional[Dict[str, float]] = None) -> Dict[str, List[float]]:
+    """Per-tick ms of every update() phase (plus 'draw' and 'total') over one scenario run;
+    per-tick means of the world's work counters go into work if given"""
+    rnd = random.Random(seed)
+    world = _scenario_world(sc, seed, draw)
+    if sc.setup:
+        sc.setup(world, rnd)
+    timer = world.phase_timer = sa.PhaseTimer()
+    world.take_counters()
+    counts: Dict[str, int] = {}
+    samples: Dict[str, List[float]] = {}
+    for _ in range(ticks or sc.ticks):
+        if sc.per_tick:
+            sc.per_tick(world, rnd)
+        t0 = time.perf_counter()
+        world.update(sa.SIM_DT)
+        if draw:
+            world.screen.fill((0, 0, 0))
+            world.draw_world()
+            timer.mark('draw')
+        total = time.perf_counter() - t0
+        if world.state != sa.GameState.PLAY:
+            break
+        for name, t in timer.take().items():
+            samples.setdefault(name, []).append(t * 1000.0)
+        samples.setdefault('total', []).append(total * 1000.0)
+        for name, v in world.take_counters().items():
+            counts[name] = counts.get(name, 0) + v
+    if work is not None:
+        n = len(samples.get('total', ())) or 1
+        work.update((name, v / n) for name, v in counts.items())
+    return samples
+
+
+def _summary(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    out = {}
+    for name, vals in samples.items():
+        vals = sorted(vals)
+        out[name] = {'mean': round(sum(vals) / len(vals), 4), 'p95': round(_percentile(vals, 0.95), 4),
+                     'p99': round(_percentile(vals, 0.99), 4)}
+    return out
+
+
+def bench_scenarios(names: List[str], seed=1, draw=False, baseline=BASELINE_FILE, save=False, tolerance=0.25):
+    """Run the named scenarios; fail any whose mean or p95 tick time regressed past tolerance"""
+    stored = {}
+    if os.path.exists(baseline):
+        with open(baseline, encoding='utf-8') as f:
+            stored = json.load(f)
+    key_suffix = '+draw' if draw else ''
+    failed = []
+    results = {}
+    for name in names:
+        sc = SCENARIOS[name]
+        work = {}
+        samples = run_scenario(sc, seed=seed, draw=draw, work=work)
+        summary = results[name + key_suffix] = _summary(samples)
+        base = stored.get(name + key_suffix, {})
+        n = len(samples['total'])
+        print(f"\n{name}{key_suffix}: {sc.teams} teams x {sc.team_size}, {sc.obstacles} obstacles, {n} ticks")
+        print(f"  {'phase':<12} {'mean':>8} {'p95':>8} {'p99':>8} {'base p95':>9} {'delta':>7}")
+        for phase, st in summary.items():
+            ref = base.get(phase)
+            line = f"  {phase:<12} {st['mean']:>8.3f} {st['p95']:>8.3f} {st['p99']:>8.3f}"
+            if ref:
+                line += f" {ref['p95']:>9.3f} {(st['p95'] / ref['p95'] - 1) * 100 if ref['p95'] else 0.0:>+6.0f}%"
+            print(line)
+        print("  per tick: " + '  '.join(f"{k} {v:.0f}" for k, v in work.items() if v >= 0.5))
+        ref = base.get('total')
+        if ref and (summary['total']['mean'] > ref['mean'] * (1 + tolerance)
+                    or summary['total']['p95'] > ref['p95'] * (1 + tolerance)):
+            failed.append(name + key_suffix)
+    if save:
+        stored.update(results)
+        with open(baseline, 'w', encoding='utf-8') as f:
+            json.dump(stored, f, indent=1, sort_keys=True)
+            f.write('\n')
+        print(f"\nbaseline written: {baseline}")
+        return 0
+    if not stored:
+        print(f"\nno baseline at {baseline}; rerun with --save-baseline to create one")
+        return 0
+    if failed:
+        print(f"\nFAIL: {', '.join(failed)} slower than baseline by more than {tolerance:.0%}", file=sys.stderr)
+        return 1
+    print(f"\nPASS: all scenarios within {tolerance:.0%} of baseline")
+    return 0
+
+
+# -----------------------------
+# Scaling curves
+# -----------------------------
+def _ships_axis(n):
+    return Scenario(6, n, 0, setup=_to_points)
+
+
+def _bullets_axis(n):
+    return Scenario(6, 4, 0, setup=_to_points, per_tick=lambda world, rnd: _shotgun_top_up(world, rnd, n))
+
+
+def _obstacles_axis(n):
+    return Scenario(2, sa.TEAM_SIZE, 0, obstacles=n)
+
+
+SWEEPS = {
+    'ships': ((2, 4, 8, 16, 32), _ships_axis),  # per team, 6 teams
+    'bullets': ((1000, 2000, 4000, 8000, 16000), _bullets_axis),
+    'obstacles': ((125, 250, 500, 1000, 2000), _obstacles_axis),
+}
+
+
+def bench_sweep(axes: List[str], ticks=180, seed=1, nonlinear=1.5):
+    """Mean ms per phase at each count; flags a phase whose cost grows faster than its count"""
+    for axis in axes:
+        counts, make = SWEEPS[axis]
+        rows = [(n, _summary(run_scenario(make(n), seed=seed, ticks=ticks))) for n in counts]
+        phases = list(rows[-1][1])
+        print(f"\n{axis}: mean ms/tick per phase ({ticks} ticks each)")
+        print(f"{axis:>10} " + ' '.join(f"{p:>11}" for p in phases))
+        notes = []
+        for i, (n, summary) in enumerate(rows):
+            cells = []
+            for p in phases:
+                ms = summary.get(p, {}).get('mean', 0.0)
+                mark = ' '
+                if i:
+                    prev_n, prev = rows[i - 1]
+                    prev_ms = prev.get(p, {}).get('mean', 0.0)
+                    growth = (ms / prev_ms) / (n / prev_n) if prev_ms > 0.01 else 0.0
+                    if growth > nonlinear:
+                        mark = '*'
+                        notes.append(f"{p}: x{ms / prev_ms:.1f} cost for x{n / prev_n:g} {axis} ({prev_n} -> {n})")
+                cells.append(f"{ms:>10.3f}{mark}")
+            print(f"{n:>10} " + ' '.join(cells))
+        for note in notes:
+            print(f"  * nonlinear {note}")
+    return 0
+
+
+# -----------------------------
+# Micro-benchmarks
+# -----------------------------
+MICRO_BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_micro_baseline.json')
+
+
+class Micro(NamedTuple):
+    make: Callable  # () -> zero-arg callable with fresh state for one batch (setup is not timed)
+    batch: int  # calls per batch; small enough that the state stays representative
+    rounds: int = 30
+
+
+def _micro_cases(seed=1) -> Dict[str, Micro]:
+    world = _world(6, 4, seed)
+    dt = sa.SIM_DT
+    cx, cy = sa.ARENA_W / 2, sa.ARENA_H / 2
+    cam = sa.Camera(sa.ARENA_W, sa.ARENA_H)
+    cam.center_on(cx, cy)
+    rect = sa.pygame.Rect(int(cx), int(cy), 120, 80)
+
+    def fresh():
+        world.projectiles.clear()
+        world.particles.clear()
+        world.dmgtexts.clear()
+        world.pickups.clear()
+
+    def ship(team=0):
+        sh = sa.Ship(world, cx, cy, team)
+        sh.unlocked = {w: True for w in sa.WEAPON_TYPES}
+        return sh
+
+    def get_class():
+        sh = ship()
+        sh.add_class_node('Trapper')
+        return lambda: sh.get_class('speed_mul', 1.0)
+
+    def shooter(weapon):
+        def make():
+            fresh()
+            sh = ship()
+            sh.weapon = sa.WEAPON_TYPES.index(weapon)
+            enemy = next(e for e in world.ships if e.team != sh.team)
+
+            def call():
+                sh.fire_cd = 0.0
+                sh.shoot(enemy.x, enemy.y)
+            return call
+        return make
+
+    def damage():
+        fresh()
+        sh = ship(team=1)
+        sh.invuln = 0.0  # past the spawn protection
+        attacker = world.ships[0]
+        return lambda: sh.damage(1.0, attacker=attacker)
+
+    def missile():
+        fresh()
+        m = sa.HomingMissile(cx, cy, 0, world.ships[0])
+        return lambda: m.update(dt, world)
+
+    def pulse():
+        fresh()
+        _fill_pool(world.projectiles.bullets, world.ships, 2000, random.Random(seed), spread=400)
+        g = sa.GravityPulse(cx, cy, 0, world.ships[0])
+        return lambda: g.update(dt, world.ships, world.projectiles.bullets)
+
+    def capture():
+        cp = sa.CapturePoint(cx, cy)
+        return lambda: cp.update(dt, world.ships)
+
+    cases = {
+        'world_to_screen': Micro(lambda: lambda: cam.world_to_screen((cx + 10.5, cy - 3.25)), 10000),
+        'rect_on_screen': Micro(lambda: lambda: cam.rect_on_screen(rect), 10000),
+        'normalize': Micro(lambda: lambda: sa.normalize(3.0, 4.0), 10000),
+        'vec_len': Micro(lambda: lambda: sa.vec_len(3.0, 4.0), 10000),
+        'distance': Micro(lambda: lambda: sa.distance((1.0, 2.0), (4.0, 6.0)), 10000),
+        'get_class': Micro(get_class, 10000),
+        'damage': Micro(damage, 40),
+        'missile_update': Micro(missile, 200),
+        'pulse_update': Micro(pulse, 25),
+        'capture_update': Micro(capture, 1000),
+        'make_tone': Micro(lambda: lambda: sa.SFX._make_tone(freq=440, ms=120, wave='triangle'), 3, rounds=5),
+    }
+    for weapon in sa.WEAPON_TYPES:
+        cases[f'shoot[{weapon}]'] = Micro(shooter(weapon), 50)
+    return cases
+
+
+def _measure(case: Micro) -> Dict[str, float]:
+    """Best-of-rounds ns/call; live blocks left behind per call; largest transient bytes of one call"""
+    best = float('inf')
+    for _ in range(case.rounds):
+        call = case.make()
+        t0 = time.perf_counter()
+        for _ in range(case.batch):
+            call()
+        best = min(best, (time.perf_counter() - t0) / case.batch)
+
+    gc.collect()
+    gc.disable()
+    try:
+        call = case.make()
+        blocks = sys.getallocatedblocks()
+        for _ in range(case.batch):
+            call()
+        kept = (sys.getallocatedblocks() - blocks) / case.batch
+
+        call = case.make()
+        tracemalloc.start()
+        peak = 0
+        for _ in range(case.batch):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            call()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+        tracemalloc.stop()
+    finally:
+        gc.enable()
+    return {'ns': round(best * 1e9, 1), 'blocks': round(kept, 2), 'peak_bytes': peak}
+
+
+def bench_micro(names: List[str], baseline=MICRO_BASELINE_FILE, save=False, tolerance=0.25):
+    """Pinned-iteration micro-benchmarks; fail any whose ns/call regressed past tolerance"""
+    cases = _micro_cases()
+    unknown = [n for n in names if n not in cases]
+    if unknown:
+        print(f"unknown case: {', '.join(unknown)} (choose from {', '.join(cases)})", file=sys.stderr)
+        return 2
+    stored = {}
+    if os.path.exists(baseline):
+        with open(baseline, encoding='utf-8') as f:
+            stored = json.load(f)
+    results = {}
+    failed = []
+    print(f"{'case':<18} {'calls':>7} {'ns/call':>11} {'blocks/call':>12} {'peak B':>9} {'base ns':>11} {'delta':>7}")
+    for name in names or list(cases):
+        case = cases[name]
+        r = results[name] = _measure(case)
+        line = f"{name:<18} {case.batch * case.rounds:>7} {r['ns']:>11.0f} {r['blocks']:>12.2f} {r['peak_bytes']:>9}"
+        ref = stored.get(name)
+        if ref:
+            delta = r['ns'] / ref['ns'] - 1
+            line += f" {ref['ns']:>11.0f} {delta * 100:>+6.0f}%"
+            if delta > tolerance:
+                failed.append(name)
+                line += ' SLOWER'
+        print(line)
+    if save:
+        stored.update(results)
+        with open(baseline, 'w', encoding='utf-8') as f:
+            json.dump(stored, f, indent=1, sort_keys=True)
+            f.write('\n')
+        print(f"\nbaseline written: {baseline}")
+        return 0
+    if not stored:
+        print(f"\nno baseline at {baseline}; rerun with --save-baseline to create one")
+        return 0
+    if failed:
+        print(f"\nFAIL: {', '.join(failed)} slower than baseline by more than {tolerance:.0%}", file=sys.stderr)
+        return 1
+    print(f"\nPASS: all cases within {tolerance:.0%} of baseline")
+    return 0
+
+
+# -----------------------------
+# GC policy
+# -----------------------------
+GC_POLICIES = ('default', 'freeze', 'freeze+defer')
+
+
+def run_gc_match(policy: str, minutes: float, num_teams: int, seed: int) -> Dict[str, float]:
+    """Frame times (update + draw + GC safe point) of one long windowless match under a GC policy"""
+    gc.unfreeze()
+    gc.collect()
+    sa.gc_manager.defer_gen2('defer' in policy)
+    world = _scenario_world(Scenario(num_teams, sa.TEAM_SIZE, 0), seed, draw=True)
+    world.killcam_enabled = True
+    world.gc_freeze = 'freeze' in policy
+    if world.gc_freeze:
+        world.freeze_heap()
+    runs0 = list(sa.gc_manager.runs)
+    pause0 = list(sa.gc_manager.pause_ns)
+    sa.gc_manager.max_pause_ns = 0
+    frames = []
+    for _ in range(int(minutes * 60 * sa.FPS)):
+        t0 = time.perf_counter()
+        world.step()
+        world.screen.fill((0, 0, 0))
+        world.draw_world()
+        sa.gc_manager.end_frame(world.gc_safe_point())
+        frames.append((time.perf_counter() - t0) * 1000.0)
+        if world.state != sa.GameState.PLAY:
+            world.reset_world()
+            world.state = sa.GameState.PLAY
+    sa.gc_manager.defer_gen2(False)
+    gc.unfreeze()
+    frames.sort()
+    out = {'frames': len(frames), 'mean': sum(frames) / len(frames), 'p50': _percentile(frames, 0.5),
+           'p99': _percentile(frames, 0.99), 'p999': _percentile(frames, 0.999), 'max': frames[-1],
+           'max_pause': sa.gc_manager.max_pause_ns / 1e6}
+    for gen in range(3):
+        out[f'gen{gen}'] = sa.gc_manager.runs[gen] - runs0[gen]
+        out[f'gen{gen}_ms'] = (sa.gc_manager.pause_ns[gen] - pause0[gen]) / 1e6
+    return out
+
+
+def bench_gc(policies: List[str], minutes=10.0, num_teams=6, seed=1):
+    """Frame-time percentiles and GC pauses of the same match under each GC policy"""
+    print(f"{num_teams} teams, {minutes:g} simulated minutes per policy, update + draw_world per frame")
+    print(f"{'policy':<14} {'mean':>6} {'p50':>6} {'p99':>6} {'p99.9':>6} {'max':>7} "
+          f"{'gen0/1/2 runs':>14} {'gc ms':>7} {'max pause':>9}")
+    ref = None
+    for policy in policies:
+        r = run_gc_match(policy, minutes, num_teams, seed)
+        line = (f"{policy:<14} {r['mean']:>6.2f} {r['p50']:>6.2f} {r['p99']:>6.2f} {r['p999']:>6.2f} {r['max']:>7.2f} "
+                f"{r['gen0']:>6}/{r['gen1']}/{r['gen2']:<4} {r['gen0_ms'] + r['gen1_ms'] + r['gen2_ms']:>7.1f} "
+                f"{r['max_pause']:>9.2f}")
+        if ref is None:
+            ref = r
+        else:
+            line += f"  p99 {(r['p99'] / ref['p99'] - 1) * 100:+.0f}%"
+        print(line)
+    return 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Space Arena benchmarks")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('collisions', help="projectile-vs-ship broadphase")
+    p.add_argument('--teams', type=int, default=6)
+    p.add_argument('--team-size', type=int, default=4)
+    p.add_argument('--repeat', type=int, default=5)
+    p = sub.add_parser('bullets', help="BulletPool tick cost at a steady bullet count")
+    p.add_argument('--count', type=int, default=20000)
+    p.add_argument('--ticks', type=int, default=120)
+    p = sub.add_parser('entities', help="tick cost vs entity count (tombstone/compact containers)")
+    p.add_argument('--ticks', type=int, default=60)
+    p = sub.add_parser('seek', help="replay keyframe index and random seek latency")
+    p.add_argument('--minutes', type=float, default=15.0)
+    p.add_argument('--teams', type=int, default=2)
+    p.add_argument('--seeks', type=int, default=60)
+    p = sub.add_parser('arenas', help="independent worlds stepped round-robin in one process")
+    p.add_argument('--count', type=int, default=10)
+    p.add_argument('--teams', type=int, default=2)
+    p.add_argument('--ticks', type=int, default=600)
+    p = sub.add_parser('scenarios', help="named match scenarios against the stored baseline")
+    p.add_argument('names', nargs='*', metavar='NAME',
+                   help=f"scenarios to run (default all: {', '.join(SCENARIOS)})")
+    p.add_argument('--draw', action='store_true', help="also time draw_world into an offscreen surface")
+    p.add_argument('--baseline', default=BASELINE_FILE)
+    p.add_argument('--save-baseline', action='store_true', help="record these results as the new baseline")
+    p.add_argument('--tolerance', type=float, default=0.25, help="allowed mean/p95 slowdown, 0.25 = 25%%")
+    p = sub.add_parser('sweep', help="per-phase scaling curves as entity counts grow")
+    p.add_argument('axes', nargs='*', metavar='AXIS',
+                   help=f"axes to sweep (default all: {', '.join(SWEEPS)})")
+    p.add_argument('--ticks', type=int, default=180)
+    p = sub.add_parser('micro', help="ns/call and allocations/call of hot helpers against the stored baseline")
+    p.add_argument('cases', nargs='*', metavar='CASE', help="cases to run (default all)")
+    p.add_argument('--baseline', default=MICRO_BASELINE_FILE)
+    p.add_argument('--save-baseline', action='store_true', help="record these results as the new baseline")
+    p.add_argument('--tolerance', type=float, default=0.25, help="allowed ns/call slowdown, 0.25 = 25%%")
+    p = sub.add_parser('gc', help="frame-time percentiles of a long match under each GC policy")
+    p.add_argument('policies', nargs='*', metavar='POLICY',
+                   help=f"policies to compare (default all: {', '.join(GC_POLICIES)})")
+    p.add_argument('--minutes', type=float, default=10.0)
+    p.add_argument('--teams', type=int, default=6)
+    args = ap.parse_args(argv)
+    unknown = [n for n in getattr(args, 'names', []) if n not in SCENARIOS]
+    unknown += [a for a in getattr(args, 'axes', []) if a not in SWEEPS]
+    unknown += [p for p in getattr(args, 'policies', []) if p not in GC_POLICIES]
+    if unknown:
+        ap.error(f"unknown scenario/axis/policy: {', '.join(unknown)}")
+    if args.cmd == 'collisions':
+        return bench_collisions(num_teams=args.teams, team_size=args.team_size, repeat=args.repeat)
+    if args.cmd == 'bullets':
+        return bench_bullets(count=args.count, ticks=args.ticks)
+    if args.cmd == 'entities':
+        return bench_entities(ticks=args.ticks)
+    if args.cmd == 'seek':
+        return bench_seek(minutes=args.minutes, num_teams=args.teams, seeks=args.seeks)
+    if args.cmd == 'arenas':
+        return bench_arenas(count=args.count, num_teams=args.teams, ticks=args.ticks)
+    if args.cmd == 'scenarios':
+        return bench_scenarios(args.names or list(SCENARIOS), draw=args.draw, baseline=args.baseline,
+                               save=args.save_baseline, tolerance=args.tolerance)
+    if args.cmd == 'sweep':
+        return bench_sweep(args.axes or list(SWEEPS), ticks=args.ticks)
+    if args.cmd == 'micro':
+        return bench_micro(args.cases, baseline=args.baseline, save=args.save_baseline, tolerance=args.tolerance)
+    if args.cmd == 'gc':
+        return bench_gc(args.policies or list(GC_POLICIES), minutes=args.minutes, num_teams=args.teams)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
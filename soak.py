@@ -0,0 +1,220 @@
+"""Space Arena soak test: headless matches back to back for as long as you like, watching memory.
+
+    python soak.py --minutes 240 --teams 2,4,6
+    python soak.py --minutes 5 --max-list 32 --json soak.json
+
+Every --every simulated seconds it takes a checkpoint: traced memory (tracemalloc,
+grouped by the class/function that allocated it), live instances per class, the size
+of every world container and the longest list/deque held by any single entity.
+Fails (exit 1) when a per-entity list passes --max-list, or when traced memory after
+the warm-up has grown by more than --max-growth MB.
+"""
+import argparse
+import ast
+import bisect
+import gc
+import itertools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+from typing import Any, Dict, List, Tuple
+
+import space_arena as sa
+
+IGNORE = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+CONTAINERS = ('ships', 'pickups', 'trails', 'dmgtexts', 'screen_effects', 'capture_points', 'obstacles')
+
+
+# -----------------------------
+# Attribution
+# -----------------------------
+class SourceOwners:
+    """Maps a space_arena line number to the Class.method (or function) it belongs to"""
+    def __init__(self, path: str):
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read())
+        spans: List[Tuple[int, int, str]] = []
+
+        def visit(node, prefix):
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, (ast.ClassDef, ast.FunctionDef)):
+                    name = f"{prefix}.{child.name}" if prefix else child.name
+                    spans.append((child.lineno, child.end_lineno, name))
+                    visit(child, name)
+        visit(tree, '')
+        spans.sort()
+        self.starts = [s[0] for s in spans]
+        self.spans = spans
+
+    def owner(self, lineno: int) -> str:
+        # Spans are sorted by start, so the first one covering the line from the right is the innermost
+        for start, end, name in reversed(self.spans[:bisect.bisect_right(self.starts, lineno)]):
+            if lineno <= end:
+                return name
+        return '<module>'
+
+
+def site(stat, owners: SourceOwners) -> str:
+    frame = stat.traceback[0]
+    if os.path.abspath(frame.filename) == os.path.abspath(sa.__file__):
+        return owners.owner(frame.lineno)
+    return f"{os.path.basename(frame.filename)}:{frame.lineno}"
+
+
+def by_owner(stats, owners: SourceOwners, attr: str) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for st in stats:
+        key = site(st, owners)
+        out[key] = out.get(key, 0) + getattr(st, attr)
+    return out
+
+
+# -----------------------------
+# Checkpoints
+# -----------------------------
+def container_sizes(world: sa.World) -> Dict[str, int]:
+    sizes = {name: len(getattr(world, name)) for name in CONTAINERS}
+    sizes.update((f"projectiles.{k}", v) for k, v in world.projectiles.counts().items())
+    sizes['particles'] = world.particles.n
+    sizes.update((f"entity_pools.{k}", v['free']) for k, v in sa.entity_pools.stats().items())
+    return sizes
+
+
+def entity_lists(world: sa.World) -> Dict[str, int]:
+    """Longest list/deque held by a single entity, per Class.attribute"""
+    longest: Dict[str, int] = {}
+    stores = [world.ships, world.pickups, world.trails, world.dmgtexts, world.capture_points]
+    stores += [s for s in world.projectiles.stores.values() if isinstance(s, list)]
+    for obj in itertools.chain.from_iterable(stores):
+        for attr, v in vars(obj).items():
+            if type(v) in (list, deque):
+                key = f"{type(obj).__name__}.{attr}"
+                if len(v) > longest.get(key, -1):
+                    longest[key] = len(v)
+    return longest
+
+
+def instance_counts() -> Dict[str, int]:
+    """Live gc-tracked instances of space_arena classes"""
+    counts: Dict[str, int] = {}
+    for o in gc.get_objects():
+        cls = type(o)
+        if cls.__module__ == sa.__name__:
+            counts[cls.__name__] = counts.get(cls.__name__, 0) + 1
+    return counts
+
+
+def top(d: Dict[str, float], n: int) -> List[Tuple[str, float]]:
+    return sorted(d.items(), key=lambda kv: -abs(kv[1]))[:n]
+
+
+# -----------------------------
+# Driver
+# -----------------------------
+def soak(args) -> int:
+    owners = SourceOwners(sa.__file__)
+    teams = [int(t) for t in args.teams.split(',')]
+    tracemalloc.start(1)
+    t_end = time.time() + args.minutes * 60
+    every = max(1, int(args.every * sa.FPS))
+    seeds = itertools.count(args.seed)
+    checkpoints: List[Dict[str, Any]] = []
+    baseline = None
+    worst_lists: Dict[str, int] = {}
+    matches = 0
+    sim_ticks = 0
+    failures: List[str] = []
+
+    world = sa.World(num_teams=teams[0])
+    while time.time() < t_end:
+        world.seed = next(seeds)
+        world.num_teams = teams[matches % len(teams)]
+        world.reset_world()
+        world.state = sa.GameState.PLAY
+        matches += 1
+        for _ in range(args.match_ticks):
+            world.update(sa.SIM_DT)
+            sim_ticks += 1
+            if sim_ticks % every == 0:
+                for key, n in entity_lists(world).items():
+                    worst_lists[key] = max(worst_lists.get(key, 0), n)
+                gc.collect()
+                current, _ = tracemalloc.get_traced_memory()
+                cp = {'sim_minutes': round(sim_ticks / sa.FPS / 60, 2), 'match': matches,
+                      'traced_mb': round(current / 2**20, 2), 'containers': container_sizes(world),
+                      'instances': instance_counts()}
+                checkpoints.append(cp)
+                if len(checkpoints) == args.warmup:
+                    baseline = (tracemalloc.take_snapshot().filter_traces(IGNORE), cp)
+                print(f"[{cp['sim_minutes']:7.1f} sim min] match {matches:4d}  traced {cp['traced_mb']:7.2f} MB  "
+                      f"longest entity list {max(worst_lists.values(), default=0)}", file=sys.stderr)
+                if time.time() >= t_end:
+                    break
+            if world.state != sa.GameState.PLAY:
+                break
+
+    # Verdict
+    for key, n in sorted(worst_lists.items(), key=lambda kv: -kv[1]):
+        if n > args.max_list:
+            failures.append(f"{key} reached {n} items on one entity (limit {args.max_list})")
+    report: Dict[str, Any] = {'matches': matches, 'sim_minutes': round(sim_ticks / sa.FPS / 60, 2),
+                              'checkpoints': checkpoints, 'longest_entity_lists': worst_lists}
+    if baseline is not None and len(checkpoints) > args.warmup:
+        base_snap, base_cp = baseline
+        gc.collect()
+        last = tracemalloc.take_snapshot().filter_traces(IGNORE)
+        diff = last.compare_to(base_snap, 'lineno')
+        growth_mb = checkpoints[-1]['traced_mb'] - base_cp['traced_mb']
+        report['growth_mb'] = round(growth_mb, 2)
+        report['growth_by_site_kb'] = {k: round(v / 1024, 1)
+                                       for k, v in top(by_owner(diff, owners, 'size_diff'), 15)}
+        last_inst = checkpoints[-1]['instances']
+        report['instance_growth'] = dict(top({k: last_inst.get(k, 0) - base_cp['instances'].get(k, 0)
+                                              for k in set(last_inst) | set(base_cp['instances'])}, 10))
+        if growth_mb > args.max_growth:
+            failures.append(f"traced memory grew {growth_mb:.1f} MB after warm-up (limit {args.max_growth} MB)")
+    else:
+        print("run too short for a memory trend; raise --minutes or lower --every/--warmup", file=sys.stderr)
+    tracemalloc.stop()
+
+    print(f"\n{matches} matches, {report['sim_minutes']} simulated minutes, {len(checkpoints)} checkpoints")
+    print("longest per-entity lists:")
+    for key, n in sorted(worst_lists.items(), key=lambda kv: -kv[1]):
+        print(f"  {key:<32} {n:>7}")
+    if 'growth_mb' in report:
+        print(f"traced memory growth after warm-up: {report['growth_mb']:+.2f} MB")
+        for key, kb in report['growth_by_site_kb'].items():
+            print(f"  {key:<40} {kb:>+10.1f} KB")
+        print("instance growth after warm-up:")
+        for key, n in report['instance_growth'].items():
+            print(f"  {key:<32} {n:>+7}")
+    report['failures'] = failures
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+    for msg in failures:
+        print(f"FAIL: {msg}", file=sys.stderr)
+    if not failures:
+        print("PASS")
+    return 1 if failures else 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Space Arena soak test")
+    ap.add_argument('--minutes', type=float, default=60.0, help="wall-clock duration")
+    ap.add_argument('--teams', default='2,4,6', help="team counts, cycled match by match")
+    ap.add_argument('--seed', type=int, default=0, help="first match seed; each match takes the next")
+    ap.add_argument('--match-ticks', type=int, default=sa.FPS * 600, help="max ticks per match")
+    ap.add_argument('--every', type=float, default=30.0, help="simulated seconds between checkpoints")
+    ap.add_argument('--warmup', type=int, default=4, help="checkpoints before the memory baseline is taken")
+    ap.add_argument('--max-list', type=int, default=32, help="longest list/deque one entity may hold")
+    ap.add_argument('--max-growth', type=float, default=8.0, help="allowed traced-memory growth after warm-up, MB")
+    ap.add_argument('--json', metavar='FILE', help="also write the full report as JSON")
+    return soak(ap.parse_args(argv))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
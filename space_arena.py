@@ -1,18 +1,36 @@
 import math
+import os
 import random
 import sys
 import json
+import hashlib
+import io
+import bisect
+import pickle
+import zlib
+import threading
 import time
-from dataclasses import dataclass
-from typing import List, Tuple, Optional, Dict, Any
+import gc
+from dataclasses import dataclass, field
+from collections import deque
+from typing import List, Tuple, Optional, Dict, Any, Iterator
 from enum import Enum
 
+# Keep stdout clean for headless JSON reports
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
 try:
     import pygame
 except Exception as e:
     print("Требуется pygame: pip install pygame", e)
     raise
 
+try:
+    import numpy as np
+except Exception as e:
+    print("Требуется numpy: pip install numpy", e)
+    raise
+
 # -----------------------------
 # Game States & Enums
 # -----------------------------
@@ -47,6 +65,7 @@ class SFX:
         self.enabled = False
         self.master_volume = 0.7
         self.sfx_volume = 0.8
+        self.plays = 0  # play() requests since startup, process-wide
         try:
             pygame.mixer.pre_init(44100, -16, 2, 512)
         except Exception:
@@ -129,6 +148,7 @@ class SFX:
         self.heal = snd(freq=330, ms=150, volume=0.2, wave='triangle')
 
     def play(self, sound_name: str):
+        self.plays += 1
         if not self.enabled:
             return
         try:
@@ -145,7 +165,10 @@ sfx = SFX()
 # Enhanced Config & Constants
 # -----------------------------
 SCREEN_W, SCREEN_H = 1280, 720
-FPS = 60
+FPS = 60  # simulation ticks per second
+SIM_DT = 1.0 / FPS
+RENDER_FPS = 144  # draw rate cap; the simulation stays at FPS
+MAX_SIM_STEPS = 5  # catch-up ticks per frame before the game slows down instead
 
 # Flexible window support
 class WindowManager:
@@ -316,9 +339,292 @@ def normalize(x, y):
 def lerp(a, b, t):
     return a + (b - a) * t
 
+def tri_overlaps_rect(tri, r) -> bool:
+    """Separating-axis test: triangle vs axis-aligned rect (touching is not overlap)"""
+    corners = ((r.left, r.top), (r.right, r.top), (r.right, r.bottom), (r.left, r.bottom))
+    xs = [p[0] for p in tri]; ys = [p[1] for p in tri]
+    if max(xs) <= r.left or min(xs) >= r.right or max(ys) <= r.top or min(ys) >= r.bottom:
+        return False
+    for i in range(3):
+        x1, y1 = tri[i]
+        x2, y2 = tri[(i + 1) % 3]
+        nx, ny = y2 - y1, x1 - x2
+        if nx == 0 and ny == 0:
+            continue
+        tp = [nx * px + ny * py for px, py in tri]
+        rp = [nx * px + ny * py for px, py in corners]
+        if max(tp) <= min(rp) or max(rp) <= min(tp):
+            return False
+    return True
+
 def distance(p1, p2):
     return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
 
+# -----------------------------
+# Spatial partitioning
+# -----------------------------
+# Ship hitbox is int(size*1.2) = 40px, the largest projectile radius is 10:
+# one cell fits a whole hitbox, so a ship and a projectile each span <= 4 cells.
+HASH_CELL = 64
+
+class SpatialHash:
+    """Uniform grid of integer ids keyed by cell; rebuilt every tick"""
+    def __init__(self, cell: int = HASH_CELL):
+        self.cell = cell
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+    def clear(self):
+        self.cells.clear()
+
+    def insert_rect(self, idx: int, x: int, y: int, w: int, h: int):
+        c = self.cell
+        cells = self.cells
+        for gx in range(x // c, (x + w - 1) // c + 1):
+            for gy in range(y // c, (y + h - 1) // c + 1):
+                bucket = cells.get((gx, gy))
+                if bucket is None:
+                    cells[(gx, gy)] = [idx]
+                else:
+                    bucket.append(idx)
+
+    def query_rect(self, x: int, y: int, w: int, h: int) -> List[int]:
+        """Ids whose cells overlap the rect, ascending (= insertion order)"""
+        c = self.cell
+        cells = self.cells
+        x0, x1 = x // c, (x + w - 1) // c
+        y0, y1 = y // c, (y + h - 1) // c
+        if x0 == x1 and y0 == y1:
+            return cells.get((x0, y0), [])
+        found = set()
+        for gx in range(x0, x1 + 1):
+            for gy in range(y0, y1 + 1):
+                bucket = cells.get((gx, gy))
+                if bucket:
+                    found.update(bucket)
+        return sorted(found)
+
+
+class ShipBroadphase:
+    """Per-tick ship hitboxes + spatial hash shared by every projectile type"""
+    def __init__(self, cell: int = HASH_CELL):
+        self.grid = SpatialHash(cell)
+        self.ships: List['Ship'] = []
+        self.rects: List[pygame.Rect] = []
+        self.live: List[int] = []
+        self.tests = 0  # hitbox tests made by first_hit() since build()
+
+    def build(self, ships: List['Ship']):
+        self.grid.clear()
+        self.tests = 0
+        self.ships = ships
+        self.rects = []
+        self.live = []
+        for i, sh in enumerate(ships):
+            sr = pygame.Rect(int(sh.x - sh.size*0.6), int(sh.y - sh.size*0.6), int(sh.size*1.2), int(sh.size*1.2))
+            self.rects.append(sr)
+            if not sh.dead:
+                self.live.append(i)
+                self.grid.insert_rect(i, sr.x, sr.y, sr.w, sr.h)
+        # Array view for vectorized (BulletPool) queries
+        self.rx = np.array([r.x for r in self.rects], np.int64)
+        self.ry = np.array([r.y for r in self.rects], np.int64)
+        self.rw = np.array([r.w for r in self.rects], np.int64)
+        self.rh = np.array([r.h for r in self.rects], np.int64)
+        self.team = np.array([sh.team for sh in ships], np.int16)
+
+    def first_hit(self, rect: pygame.Rect, team: int) -> Optional['Ship']:
+        """First live enemy ship (in ships order) whose hitbox overlaps rect"""
+        ships = self.ships
+        rects = self.rects
+        cands = self.grid.query_rect(rect.x, rect.y, rect.w, rect.h)
+        self.tests += len(cands)
+        for i in cands:
+            sh = ships[i]
+            if sh.dead or sh.team == team:
+                continue
+            if rect.colliderect(rects[i]):
+                return sh
+        return None
+
+TARGET_CELL = 512  # enemy-query grid; the 700px AI engagement radius is a two-ring search
+_CELL_KEY = 1 << 16  # cell (gx, gy) -> gx * _CELL_KEY + gy: int keys, and a ring is a list of key offsets
+
+
+def _ring_offsets(r: int) -> List[int]:
+    if r == 0:
+        return [0]
+    side = range(-r, r + 1)
+    inner = range(-r + 1, r)
+    return ([dx * _CELL_KEY - r for dx in side] + [dx * _CELL_KEY + r for dx in side]
+            + [-r * _CELL_KEY + dy for dy in inner] + [r * _CELL_KEY + dy for dy in inner])
+
+
+class TargetIndex:
+    """Per-tick grid of ships for enemy queries: one grid per team, holding every ship of the other teams.
+
+    Answers match a scan of world.ships: distances use live positions, the dead are skipped
+    at query time and ties go to the ship earliest in the list. Anything that moves a ship
+    mid-tick (its own update, a teleport, a respawn, a reinforcement spawn) calls moved().
+    """
+    rings: List[List[int]] = []  # shared ring offset cache, grown on demand
+
+    def __init__(self, cell: int = TARGET_CELL):
+        self.cell = cell
+        self.tick = -1
+        self.order: Dict['Ship', int] = {}  # position in world.ships at build; later arrivals go after
+        self.where: Dict['Ship', int] = {}  # ship -> cell key
+        self.grids: Dict[int, Dict[int, List['Ship']]] = {}  # team -> enemy cells, built on demand
+        self.bounds = (0, 0, 0, 0)  # occupied cell range, caps the ring search
+        self.tests = 0  # distance tests since the last take_counters()
+
+    def _key(self, x: float, y: float) -> int:
+        c = self.cell
+        return int(x // c) * _CELL_KEY + int(y // c)
+
+    def _extend(self, x: float, y: float):
+        c = self.cell
+        gx, gy = int(x // c), int(y // c)
+        gx0, gy0, gx1, gy1 = self.bounds
+        if not (gx0 <= gx <= gx1 and gy0 <= gy <= gy1):
+            self.bounds = (min(gx0, gx), min(gy0, gy), max(gx1, gx), max(gy1, gy))
+
+    def build(self, ships: List['Ship'], tick: int):
+        self.tick = tick
+        self.order = {sh: i for i, sh in enumerate(ships)}
+        self.where = {sh: self._key(sh.x, sh.y) for sh in ships}
+        self.grids.clear()
+        if ships:
+            c = self.cell
+            xs = [int(sh.x // c) for sh in ships]
+            ys = [int(sh.y // c) for sh in ships]
+            self.bounds = (min(xs), min(ys), max(xs), max(ys))
+
+    def _grid(self, team: int) -> Dict[int, List['Ship']]:
+        grid = self.grids.get(team)
+        if grid is None:
+            grid = self.grids[team] = {}
+            for sh, key in self.where.items():
+                if sh.team != team:
+                    bucket = grid.get(key)
+                    if bucket is None:
+                        grid[key] = [sh]
+                    else:
+                        bucket.append(sh)
+        return grid
+
+    def moved(self, sh: 'Ship'):
+        """Re-bin a ship after its position changed, or add one that joined mid-tick"""
+        key = self._key(sh.x, sh.y)
+        old = self.where.get(sh)
+        if old == key:
+            return
+        if old is None:
+            self.order[sh] = len(self.order)
+        self.where[sh] = key
+        self._extend(sh.x, sh.y)
+        for team, grid in self.grids.items():
+            if team == sh.team:
+                continue
+            if old is not None:
+                grid[old].remove(sh)
+            grid.setdefault(key, []).append(sh)
+
+    def nearest(self, team: int, x: float, y: float, r2: float = math.inf,
+                exclude=()) -> Tuple[Optional['Ship'], float]:
+        """Closest live enemy of team with squared distance <= r2, and that distance"""
+        grid = self._grid(team)
+        c = self.cell
+        order = self.order
+        cx, cy = int(x // c), int(y // c)
+        base = cx * _CELL_KEY + cy
+        gx0, gy0, gx1, gy1 = self.bounds
+        rmax = max(cx - gx0, gx1 - cx, cy - gy0, gy1 - cy)
+        rings = self.rings
+        while len(rings) <= rmax:
+            rings.append(_ring_offsets(len(rings)))
+        best = None
+        best_d2 = math.inf
+        tests = 0
+        for r in range(rmax + 1):
+            for off in rings[r]:
+                bucket = grid.get(base + off)
+                if not bucket:
+                    continue
+                for sh in bucket:
+                    if sh.dead or sh in exclude:
+                        continue
+                    tests += 1
+                    d2 = (sh.x - x)**2 + (sh.y - y)**2
+                    if d2 <= r2 and (d2 < best_d2 or (d2 == best_d2 and order[sh] < order[best])):
+                        best, best_d2 = sh, d2
+            # Every ship beyond ring r is more than r cells away
+            edge = (r * c) ** 2
+            if best_d2 < edge or edge > r2:
+                break
+        self.tests += tests
+        return best, best_d2
+
+    def within(self, team: int, x: float, y: float, radius: float) -> List['Ship']:
+        """Live enemies of team with squared distance <= radius**2, in world.ships order"""
+        grid = self._grid(team)
+        c = self.cell
+        r2 = radius * radius
+        found = []
+        for gx in range(int((x - radius) // c), int((x + radius) // c) + 1):
+            for gy in range(int((y - radius) // c), int((y + radius) // c) + 1):
+                for sh in grid.get(gx * _CELL_KEY + gy, ()):
+                    if not sh.dead:
+                        self.tests += 1
+                        if (sh.x - x)**2 + (sh.y - y)**2 <= r2:
+                            found.append(sh)
+        found.sort(key=self.order.__getitem__)
+        return found
+
+
+# -----------------------------
+# AI scheduling
+# -----------------------------
+# Bots steer and fire every tick; the planning pass (goal point, target, class nodes,
+# weapon swaps, upgrades) runs at a rate that depends on distance from the player's view.
+# The view is the default SCREEN_W x SCREEN_H one around the player ship, never the real
+# window or camera, so a replay plans the same whatever window it was recorded in.
+AI_PLAN_NEAR = 6  # ticks between plans for a bot in or near the view (10 Hz)
+AI_PLAN_FAR = 20  # ticks between plans elsewhere, and for every bot when there is no player (3 Hz)
+AI_LOD_MARGIN = 600  # px around the view that still counts as near
+AI_PLAN_BUDGET = 32  # plans per tick; the rest wait, oldest first
+
+class AIScheduler:
+    """Picks the bots that plan this tick.
+
+    The budget counts plans rather than milliseconds so a match replays identically;
+    a bot held back keeps steering on its last plan and goes first on the next tick.
+    """
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.deferred = 0  # due bots held back by the budget, summed until take_counters()
+        self.view: Optional[Tuple[float, float, float, float]] = None  # near box, x0 y0 x1 y1
+
+    def near(self, sh: 'Ship') -> bool:
+        v = self.view
+        return v is not None and v[0] <= sh.x <= v[2] and v[1] <= sh.y <= v[3]
+
+    def schedule(self, ships: List['Ship'], tick: int, player: Optional['Ship']):
+        if player is None:
+            self.view = None
+        else:
+            # Where a default-size camera following the player looks, clamped like Camera.center_on
+            x0 = clamp(player.x - SCREEN_W // 2, 0, ARENA_W - SCREEN_W) - AI_LOD_MARGIN
+            y0 = clamp(player.y - SCREEN_H // 2, 0, ARENA_H - SCREEN_H) - AI_LOD_MARGIN
+            self.view = (x0, y0, x0 + SCREEN_W + 2 * AI_LOD_MARGIN, y0 + SCREEN_H + 2 * AI_LOD_MARGIN)
+        due = [sh for sh in ships if not sh.dead and not sh.is_player and sh.ai_next_plan <= tick]
+        if len(due) > self.budget:
+            due.sort(key=lambda sh: sh.ai_next_plan)  # stable: ties keep world.ships order
+            self.deferred += len(due) - self.budget
+            del due[self.budget:]
+        for sh in due:
+            sh.ai_plan_due = True
+
+
 # -----------------------------
 # Enhanced Camera with Effects
 # -----------------------------
@@ -326,6 +632,8 @@ class Camera:
     def __init__(self, w, h):
         self.x = 0
         self.y = 0
+        self.prev_x = 0  # position at the start of the tick, for render interpolation
+        self.prev_y = 0
         self.w = w
         self.h = h
         self.shake_time = 0.0
@@ -333,6 +641,7 @@ class Camera:
         self.zoom = 1.0
         self.target_zoom = 1.0
         self.game = None  # Reference to game for window manager
+        self.rng = random.Random()  # shake jitter; a World hands over its cosmetic stream
 
     def set_game_reference(self, game):
         """Set reference to game for accessing window manager"""
@@ -348,6 +657,7 @@ class Camera:
         screen_w, screen_h = self.get_screen_size()
         self.x = clamp(target_x - screen_w // 2, 0, self.w - screen_w)
         self.y = clamp(target_y - screen_h // 2, 0, self.h - screen_h)
+        self.prev_x, self.prev_y = self.x, self.y
 
     def lerp_to(self, target_x, target_y, amt=CAMERA_LERP):
         screen_w, screen_h = self.get_screen_size()
@@ -359,14 +669,25 @@ class Camera:
     def world_to_screen(self, pos):
         screen_w, screen_h = self.get_screen_size()
         # Apply zoom and shake
-        shake_x = random.uniform(-self.shake_intensity, self.shake_intensity) if self.shake_time > 0 else 0
-        shake_y = random.uniform(-self.shake_intensity, self.shake_intensity) if self.shake_time > 0 else 0
+        shake_x = self.rng.uniform(-self.shake_intensity, self.shake_intensity) if self.shake_time > 0 else 0
+        shake_y = self.rng.uniform(-self.shake_intensity, self.shake_intensity) if self.shake_time > 0 else 0
         
         screen_x = (pos[0] - self.x) * self.zoom + screen_w // 2 * (1 - self.zoom) + shake_x
         screen_y = (pos[1] - self.y) * self.zoom + screen_h // 2 * (1 - self.zoom) + shake_y
         
         return (int(screen_x), int(screen_y))
 
+    def world_to_screen_arrays(self, xs, ys):
+        """Vectorized world_to_screen; one shake offset for the whole batch"""
+        screen_w, screen_h = self.get_screen_size()
+        shake_x = self.rng.uniform(-self.shake_intensity, self.shake_intensity) if self.shake_time > 0 else 0
+        shake_y = self.rng.uniform(-self.shake_intensity, self.shake_intensity) if self.shake_time > 0 else 0
+        
+        screen_x = (xs - self.x) * self.zoom + screen_w // 2 * (1 - self.zoom) + shake_x
+        screen_y = (ys - self.y) * self.zoom + screen_h // 2 * (1 - self.zoom) + shake_y
+        
+        return screen_x.astype(np.int64), screen_y.astype(np.int64)
+
     def rect_on_screen(self, rect: pygame.Rect):
         screen_w, screen_h = self.get_screen_size()
         return rect.move(-self.x, -self.y).colliderect(pygame.Rect(0, 0, screen_w, screen_h))
@@ -387,6 +708,128 @@ class Camera:
     def set_zoom(self, zoom: float):
         self.target_zoom = clamp(zoom, 0.5, 2.0)
 
+# -----------------------------
+# Entity containers
+# -----------------------------
+class EntityList(list):
+    """List with deferred removal: kill() tombstones, compact()/sweep() drop in one pass"""
+    def __init__(self, items=(), on_remove=None):
+        super().__init__(items)
+        self._dead: set = set()  # ids of tombstoned items (still referenced by the list)
+        self.on_remove = on_remove  # e.g. release back to a free list
+
+    def kill(self, obj):
+        self._dead.add(id(obj))
+
+    def is_dead(self, obj) -> bool:
+        return bool(self._dead) and id(obj) in self._dead
+
+    def sweep(self, expired=None):
+        """Drop tombstoned items and those where expired(item) is true; O(n)"""
+        dead = self._dead
+        if expired is None and not dead:
+            return
+        keep = []
+        removed = []
+        for obj in self:
+            if (dead and id(obj) in dead) or (expired is not None and expired(obj)):
+                removed.append(obj)
+            else:
+                keep.append(obj)
+        dead.clear()
+        if removed:
+            self[:] = keep
+            if self.on_remove is not None:
+                for obj in removed:
+                    self.on_remove(obj)
+
+    def compact(self):
+        self.sweep(None)
+
+    def clear(self):
+        if self.on_remove is not None:
+            for obj in self:
+                self.on_remove(obj)
+        self._dead.clear()
+        super().clear()
+
+
+# -----------------------------
+# Array-backed entity storage
+# -----------------------------
+class ArrayPool:
+    """Preallocated structure-of-arrays rows [0, n) with order-preserving compaction"""
+    FIELDS: Tuple[Tuple[str, Any, Tuple[int, ...]], ...] = ()
+
+    def __init__(self, capacity: int = 1024):
+        self.n = 0
+        self._alloc(capacity)
+
+    def _alloc(self, cap: int):
+        self.capacity = cap
+        for name, dtype, tail in self.FIELDS:
+            if dtype is object:
+                setattr(self, name, np.empty((cap,) + tail, dtype=object))
+            else:
+                setattr(self, name, np.zeros((cap,) + tail, dtype))
+
+    def reserve(self, k: int):
+        """Make room for k more rows (capacity doubles)"""
+        if self.n + k <= self.capacity:
+            return
+        n = self.n
+        old = {name: getattr(self, name) for name, _, _ in self.FIELDS}
+        cap = self.capacity
+        while cap < n + k:
+            cap *= 2
+        self._alloc(cap)
+        for name, arr in old.items():
+            getattr(self, name)[:n] = arr[:n]
+
+    def __len__(self):
+        return self.n
+
+    def clear(self):
+        for name, dtype, _ in self.FIELDS:
+            if dtype is object:
+                getattr(self, name)[:self.n] = None
+        self.n = 0
+
+    def compact(self, keep):
+        """Drop rows where keep is False, preserving order"""
+        n = self.n
+        idx = np.flatnonzero(keep)
+        k = len(idx)
+        if k == n:
+            return
+        for name, dtype, _ in self.FIELDS:
+            arr = getattr(self, name)
+            arr[:k] = arr[idx]
+            if dtype is object:
+                arr[k:n] = None
+        self.n = k
+
+    def remove(self, indices: List[int]):
+        if not indices:
+            return
+        keep = np.ones(self.n, bool)
+        keep[indices] = False
+        self.compact(keep)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copy of the live rows; object fields keep their references"""
+        n = self.n
+        return {name: getattr(self, name)[:n].copy() for name, _, _ in self.FIELDS}
+
+    def restore(self, rows: Dict[str, Any]):
+        self.clear()
+        k = len(rows[self.FIELDS[0][0]])
+        self.reserve(k)
+        for name, _, _ in self.FIELDS:
+            getattr(self, name)[:k] = rows[name]
+        self.n = k
+
+
 # -----------------------------
 # Enhanced Visual Effects
 # -----------------------------
@@ -427,6 +870,107 @@ class Particle:
             # Normal particle
             pygame.draw.circle(surf, self.color, (px, py), r)
 
+PARTICLE_TYPES = {"normal": 0, "spark": 1, "ring": 2}
+
+class ParticleSystem(ArrayPool):
+    """All free particles in arrays: one vectorized integrate/cull step, batched screen transform"""
+    FIELDS = (
+        ('x', np.float64, ()),
+        ('y', np.float64, ()),
+        ('vx', np.float64, ()),
+        ('vy', np.float64, ()),
+        ('gravity', np.float64, ()),
+        ('life', np.float64, ()),
+        ('size', np.float64, ()),
+        ('color', np.uint8, (3,)),
+        ('ptype', np.uint8, ()),
+        ('fade', np.bool_, ()),
+    )
+
+    def __init__(self, capacity: int = 2048):
+        super().__init__(capacity)
+
+    def emit(self, x, y, vx, vy, life, color, size, particle_type="normal", gravity=0.0, fade=True):
+        """Same arguments as Particle(...)"""
+        self.reserve(1)
+        i = self.n
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i] = vx
+        self.vy[i] = vy
+        self.gravity[i] = gravity
+        self.life[i] = life
+        self.size[i] = size
+        self.color[i] = color
+        self.ptype[i] = PARTICLE_TYPES[particle_type]
+        self.fade[i] = fade
+        self.n = i + 1
+
+    def emit_burst(self, x, y, vxs, vys, life, color, size, particle_type="normal", gravity=0.0, fade=True):
+        """Many particles from one point; vxs/vys are sequences of equal length"""
+        k = len(vxs)
+        if k == 0:
+            return
+        self.reserve(k)
+        s = slice(self.n, self.n + k)
+        self.x[s] = x
+        self.y[s] = y
+        self.vx[s] = vxs
+        self.vy[s] = vys
+        self.gravity[s] = gravity
+        self.life[s] = life
+        self.size[s] = size
+        self.color[s] = color
+        self.ptype[s] = PARTICLE_TYPES[particle_type]
+        self.fade[s] = fade
+        self.n += k
+
+    def update(self, dt):
+        n = self.n
+        if n == 0:
+            return
+        self.x[:n] += self.vx[:n] * dt
+        self.y[:n] += self.vy[:n] * dt
+        self.vy[:n] += self.gravity[:n] * dt
+        self.life[:n] -= dt
+        self.compact(self.life[:n] > 0)
+
+    def draw(self, surf, cam: Camera, lag: float = 0.0):
+        n = self.n
+        if n == 0:
+            return
+        screen_w, screen_h = cam.get_screen_size()
+        xs, ys = self.x[:n], self.y[:n]
+        if lag:
+            # Render interpolation: back off along velocity by the part of the tick not yet simulated
+            xs = xs - self.vx[:n] * lag
+            ys = ys - self.vy[:n] * lag
+        sx, sy = cam.world_to_screen_arrays(xs, ys)
+        pad = 40
+        vis = np.flatnonzero((sx > -pad) & (sx < screen_w + pad) & (sy > -pad) & (sy < screen_h + pad))
+        if len(vis) == 0:
+            return
+        life = self.life[vis]
+        alpha = np.where(self.fade[vis], np.maximum(0.2, life), 1.0)
+        radius = np.maximum(1, (self.size[vis] * alpha).astype(np.int64))
+        px = sx[vis].tolist(); py = sy[vis].tolist()
+        ex = (sx[vis] + self.vx[vis] * 0.1).tolist()
+        ey = (sy[vis] + self.vy[vis] * 0.1).tolist()
+        colors = [tuple(c) for c in self.color[vis].tolist()]
+        types = self.ptype[vis].tolist()
+        radius = radius.tolist()
+        spark, ring = PARTICLE_TYPES["spark"], PARTICLE_TYPES["ring"]
+        for j in range(len(px)):
+            if types[j] == spark:
+                # Spark effect
+                pygame.draw.line(surf, colors[j], (px[j], py[j]), (ex[j], ey[j]), 2)
+            elif types[j] == ring:
+                # Ring effect
+                pygame.draw.circle(surf, colors[j], (px[j], py[j]), radius[j], 2)
+            else:
+                # Normal particle
+                pygame.draw.circle(surf, colors[j], (px[j], py[j]), radius[j])
+
 @dataclass
 class DamageText:
     x: float
@@ -471,64 +1015,207 @@ class ScreenEffect:
 # -----------------------------
 # Enhanced Projectiles
 # -----------------------------
-class Bullet:
-    def __init__(self, x, y, dx, dy, team, owner, damage=12, speed=900, life=1.6, color=(255,255,255), 
-                 acid=False, crit_chance=0.0, plasma=False, void=False, size=4):
-        self.x = x
-        self.y = y
+# Bullet flags
+BULLET_ACID = 1
+BULLET_PLASMA = 2
+BULLET_VOID = 4
+BULLET_TRAIL = 5  # trail samples per bullet
+
+class BulletPool(ArrayPool):
+    """Structure-of-arrays storage for all live bullets, updated in vectorized passes"""
+    FIELDS = (
+        ('x', np.float64, ()),
+        ('y', np.float64, ()),
+        ('vx', np.float64, ()),
+        ('vy', np.float64, ()),
+        ('life', np.float64, ()),
+        ('damage', np.float64, ()),
+        ('crit', np.float64, ()),
+        ('radius', np.int32, ()),
+        ('team', np.int16, ()),
+        ('flags', np.uint8, ()),
+        ('color', np.uint8, (3,)),
+        ('age', np.int32, ()),  # updates lived = valid trail samples
+        ('trail_x', np.float64, (BULLET_TRAIL,)),
+        ('trail_y', np.float64, (BULLET_TRAIL,)),
+        ('owner', object, ()),
+    )
+
+    def __init__(self, capacity: int = 4096):
+        self.trail_head = 0  # shared ring position inside trail_x/trail_y rows
+        self.pair_tests = 0  # exact hitbox tests in the last ship_candidates()
+        super().__init__(capacity)
+
+    def snapshot(self) -> Dict[str, Any]:
+        rows = super().snapshot()
+        rows['trail_head'] = self.trail_head
+        return rows
+
+    def restore(self, rows: Dict[str, Any]):
+        super().restore(rows)
+        self.trail_head = rows['trail_head']
+
+    def emit(self, x, y, dx, dy, team, owner, damage=12, speed=900, life=1.6, color=(255,255,255),
+             acid=False, crit_chance=0.0, plasma=False, void=False, size=4):
+        self.reserve(1)
+        i = self.n
         ndx, ndy = normalize(dx, dy)
-        self.vx = ndx * speed
-        self.vy = ndy * speed
-        self.team = team
-        self.owner = owner
-        self.damage = damage
-        self.life = life
-        self.color = color
-        self.radius = size
-        self.acid = acid
-        self.plasma = plasma
-        self.void = void
-        self.crit_chance = crit_chance
-        self.trail = []
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i] = ndx * speed
+        self.vy[i] = ndy * speed
+        self.life[i] = life
+        self.damage[i] = damage
+        self.crit[i] = crit_chance
+        self.radius[i] = size
+        self.team[i] = team
+        self.flags[i] = (BULLET_ACID if acid else 0) | (BULLET_PLASMA if plasma else 0) | (BULLET_VOID if void else 0)
+        self.color[i] = color
+        self.age[i] = 0
+        self.owner[i] = owner
+        self.n = i + 1
 
     def update(self, dt):
-        # Add trail effect
-        self.trail.append((self.x, self.y))
-        if len(self.trail) > 5:
-            self.trail.pop(0)
-            
-        self.x += self.vx * dt
-        self.y += self.vy * dt
-        self.life -= dt
-
-    def draw(self, surf, cam: Camera):
-        # Draw trail
-        for i, (tx, ty) in enumerate(self.trail):
-            alpha = i / len(self.trail)
-            trail_color = tuple(int(c * alpha) for c in self.color)
-            px, py = cam.world_to_screen((tx, ty))
-            pygame.draw.circle(surf, trail_color, (px, py), max(1, int(self.radius * alpha)))
-        
-        px, py = cam.world_to_screen((self.x, self.y))
-        
-        if self.plasma:
-            # Plasma effect
-            pygame.draw.circle(surf, (100, 200, 255), (px, py), self.radius + 2)
-            pygame.draw.circle(surf, self.color, (px, py), self.radius)
-        elif self.void:
-            # Void effect
-            pygame.draw.circle(surf, (80, 40, 120), (px, py), self.radius + 3)
-            pygame.draw.circle(surf, self.color, (px, py), self.radius)
-        else:
-            pygame.draw.circle(surf, self.color, (px, py), self.radius)
+        n = self.n
+        if n == 0:
+            return
+        # Trail sample of the pre-move position
+        self.trail_x[:n, self.trail_head] = self.x[:n]
+        self.trail_y[:n, self.trail_head] = self.y[:n]
+        self.trail_head = (self.trail_head + 1) % BULLET_TRAIL
+        self.age[:n] += 1
+        
+        self.x[:n] += self.vx[:n] * dt
+        self.y[:n] += self.vy[:n] * dt
+        self.life[:n] -= dt
+        self.compact(self.life[:n] > 0)
+
+    def push(self, cx, cy, radius, strength, dt, exclude_team):
+        """Radial impulse from a gravity pulse on every enemy bullet inside radius"""
+        n = self.n
+        if n == 0:
+            return
+        dx = self.x[:n] - cx
+        dy = self.y[:n] - cy
+        d = np.hypot(dx, dy)
+        m = (self.team[:n] != exclude_team) & (d < radius) & (d > 1)
+        if not m.any():
+            return
+        idx = np.flatnonzero(m)
+        self.vx[idx] += dx[idx] / d[idx] * strength * 0.5 * dt
+        self.vy[idx] += dy[idx] / d[idx] * strength * 0.5 * dt
+
+    def ship_candidates(self, bp: 'ShipBroadphase') -> List[Tuple[int, List[int]]]:
+        """(bullet index, [ship indices]) for every enemy hitbox overlap, both ascending"""
+        n = self.n
+        self.pair_tests = 0
+        if n == 0 or not bp.live:
+            return []
+        cell = bp.grid.cell
+        # Ships go into every cell their hitbox touches, inflated by the largest bullet,
+        # so a bullet only needs the single cell of its centre.
+        margin = int(self.radius[:n].max()) + 2
+        keys = []
+        owners = []
+        for i in bp.live:
+            r = bp.rects[i]
+            for gx in range((r.x - margin) // cell, (r.x + r.w + margin) // cell + 1):
+                for gy in range((r.y - margin) // cell, (r.y + r.h + margin) // cell + 1):
+                    keys.append((gx << 32) + gy)
+                    owners.append(i)
+        skeys = np.array(keys, np.int64)
+        order = np.argsort(skeys, kind='stable')
+        skeys = skeys[order]
+        sidx = np.array(owners, np.int64)[order]
+        
+        bx = np.floor(self.x[:n] / cell).astype(np.int64)
+        by = np.floor(self.y[:n] / cell).astype(np.int64)
+        bkeys = (bx << 32) + by
+        lo = np.searchsorted(skeys, bkeys, 'left')
+        cnt = np.searchsorted(skeys, bkeys, 'right') - lo
+        has = np.flatnonzero(cnt)
+        if len(has) == 0:
+            return []
+        # Expand (bullet, ship) pairs
+        c = cnt[has]
+        b_rep = np.repeat(has, c)
+        pos = np.arange(len(b_rep)) - np.repeat(np.cumsum(c) - c, c) + np.repeat(lo[has], c)
+        s_rep = sidx[pos]
+        self.pair_tests = len(s_rep)
+        
+        # Exact Rect.colliderect with the same int() truncation as pygame.Rect(...)
+        r = self.radius[b_rep]
+        rx = np.trunc(self.x[b_rep] - r).astype(np.int64)
+        ry = np.trunc(self.y[b_rep] - r).astype(np.int64)
+        ok = ((self.team[b_rep] != bp.team[s_rep]) &
+              (rx < bp.rx[s_rep] + bp.rw[s_rep]) & (rx + 2*r > bp.rx[s_rep]) &
+              (ry < bp.ry[s_rep] + bp.rh[s_rep]) & (ry + 2*r > bp.ry[s_rep]))
+        out: List[Tuple[int, List[int]]] = []
+        for b, sh in zip(b_rep[ok].tolist(), s_rep[ok].tolist()):
+            if out and out[-1][0] == b:
+                out[-1][1].append(sh)
+            else:
+                out.append((b, [sh]))
+        return out
 
-    def rect(self):
-        return pygame.Rect(int(self.x - self.radius), int(self.y - self.radius), self.radius*2, self.radius*2)
+    def draw(self, surf, cam: 'Camera', lag: float = 0.0):
+        n = self.n
+        if n == 0:
+            return
+        screen_w, screen_h = cam.get_screen_size()
+        xs, ys = self.x[:n], self.y[:n]
+        if lag:
+            # Render interpolation: back off along velocity by the part of the tick not yet simulated
+            xs = xs - self.vx[:n] * lag
+            ys = ys - self.vy[:n] * lag
+        sx, sy = cam.world_to_screen_arrays(xs, ys)
+        pad = 80  # trail reach
+        vis = np.flatnonzero((sx > -pad) & (sx < screen_w + pad) & (sy > -pad) & (sy < screen_h + pad))
+        if len(vis) == 0:
+            return
+        tx, ty = cam.world_to_screen_arrays(self.trail_x[vis], self.trail_y[vis])
+        head = self.trail_head
+        ages = self.age[vis].tolist()
+        radii = self.radius[vis].tolist()
+        flags = self.flags[vis].tolist()
+        colors = [tuple(c) for c in self.color[vis].tolist()]
+        pts = list(zip(sx[vis].tolist(), sy[vis].tolist()))
+        txl = tx.tolist(); tyl = ty.tolist()
+        for j in range(len(pts)):
+            color = colors[j]
+            radius = radii[j]
+            # Draw trail, oldest sample first
+            cnt = min(ages[j], BULLET_TRAIL)
+            for k in range(cnt):
+                slot = (head - cnt + k) % BULLET_TRAIL
+                alpha = k / cnt
+                trail_color = tuple(int(c * alpha) for c in color)
+                pygame.draw.circle(surf, trail_color, (txl[j][slot], tyl[j][slot]), max(1, int(radius * alpha)))
+            
+            p = pts[j]
+            if flags[j] & BULLET_PLASMA:
+                # Plasma effect
+                pygame.draw.circle(surf, (100, 200, 255), p, radius + 2)
+                pygame.draw.circle(surf, color, p, radius)
+            elif flags[j] & BULLET_VOID:
+                # Void effect
+                pygame.draw.circle(surf, (80, 40, 120), p, radius + 3)
+                pygame.draw.circle(surf, color, p, radius)
+            else:
+                pygame.draw.circle(surf, color, p, radius)
 
 
 class HomingMissile:
+    kind = 'missile'
+
     def __init__(self, x, y, team, owner, target=None):
+        self.trail = []
+        self.reset(x, y, team, owner, target)
+
+    def reset(self, x, y, team, owner, target=None):
+        """(Re)initialize in place; keeps the trail list for pooling"""
         self.x, self.y = x, y
+        self.prev_x, self.prev_y = x, y
         self.team = team
         self.owner = owner
         self.target = target
@@ -539,30 +1226,30 @@ class HomingMissile:
         self.color = (250, 210, 120)
         self.vx, self.vy = 1, 0
         self.radius = 6
-        self.trail = []
-        self.engine_particles = []
+        self.trail.clear()
 
-    def update(self, dt, ships: List['Ship']):
+    def update(self, dt, world: 'World'):
         self.life -= dt
+        fx_rng = world.fx_rng
         
         # Add trail
         self.trail.append((self.x, self.y))
         if len(self.trail) > 8:
             self.trail.pop(0)
         
-        # Engine particles
-        if random.random() < 0.3:
-            self.engine_particles.append(Particle(
+        # Engine particles: into the shared system, which ages and culls them
+        if fx_rng.random() < 0.3:
+            world.particles.emit(
                 self.x - self.vx * 10, self.y - self.vy * 10,
-                -self.vx * 0.5 + random.uniform(-20, 20),
-                -self.vy * 0.5 + random.uniform(-20, 20),
+                -self.vx * 0.5 + fx_rng.uniform(-20, 20),
+                -self.vy * 0.5 + fx_rng.uniform(-20, 20),
                 0.5, (255, 200, 100), 3, "spark"
-            ))
+            )
         
         if self.target is None or self.target.dead:
-            enemies = [s for s in ships if s.team != self.team and not s.dead]
-            if enemies:
-                self.target = min(enemies, key=lambda e: (e.x - self.x)**2 + (e.y - self.y)**2)
+            target, _ = world.target_index().nearest(self.team, self.x, self.y)
+            if target is not None:
+                self.target = target
         
         if self.target is not None:
             dx, dy = self.target.x - self.x, self.target.y - self.y
@@ -598,6 +1285,8 @@ class HomingMissile:
 
 
 class LaserBeam:
+    kind = 'laser'
+
     def __init__(self, x, y, dx, dy, team, owner, damage=20, length=820, time=0.45, color=(255,255,255)):
         self.x, self.y = x, y
         nx, ny = normalize(dx, dy)
@@ -609,21 +1298,20 @@ class LaserBeam:
         self.time = time
         self.color = color
         self.max_time = time
-        self.particles = []
 
-    def update(self, dt):
+    def update(self, dt, fx_rng: random.Random, particles: ParticleSystem):
         self.time -= dt
         
         # Generate particles along the beam
-        if random.random() < 0.3:
-            t = random.random()
+        if fx_rng.random() < 0.3:
+            t = fx_rng.random()
             px = self.x + self.dx * self.length * t
             py = self.y + self.dy * self.length * t
-            self.particles.append(Particle(
+            particles.emit(
                 px, py,
-                random.uniform(-30, 30), random.uniform(-30, 30),
+                fx_rng.uniform(-30, 30), fx_rng.uniform(-30, 30),
                 0.3, self.color, 2, "spark"
-            ))
+            )
 
     def draw(self, surf, cam: Camera):
         sx, sy = self.x - cam.x, self.y - cam.y
@@ -634,17 +1322,16 @@ class LaserBeam:
         glow_color = tuple(int(c * alpha) for c in self.color)
         pygame.draw.line(surf, glow_color, (sx, sy), (ex, ey), 8)
         pygame.draw.line(surf, self.color, (sx, sy), (ex, ey), 4)
-        
-        # Draw particles
-        for particle in self.particles:
-            particle.draw(surf, cam)
 
     def segment(self):
         return (self.x, self.y, self.x + self.dx * self.length, self.y + self.dy * self.length)
 
 class PlasmaBall:
+    kind = 'plasma'
+
     def __init__(self, x, y, dx, dy, team, owner, damage=25, speed=750, life=2.0):
         self.x, self.y = x, y
+        self.prev_x, self.prev_y = x, y
         ndx, ndy = normalize(dx, dy)
         self.vx = ndx * speed
         self.vy = ndy * speed
@@ -654,22 +1341,21 @@ class PlasmaBall:
         self.life = life
         self.max_life = life
         self.radius = 8
-        self.particles = []
         self.pulse_time = 0.0
 
-    def update(self, dt):
+    def update(self, dt, fx_rng: random.Random, particles: ParticleSystem):
         self.x += self.vx * dt
         self.y += self.vy * dt
         self.life -= dt
         self.pulse_time += dt * 8
         
         # Generate plasma particles
-        if random.random() < 0.4:
-            self.particles.append(Particle(
-                self.x + random.uniform(-10, 10), self.y + random.uniform(-10, 10),
-                random.uniform(-20, 20), random.uniform(-20, 20),
+        if fx_rng.random() < 0.4:
+            particles.emit(
+                self.x + fx_rng.uniform(-10, 10), self.y + fx_rng.uniform(-10, 10),
+                fx_rng.uniform(-20, 20), fx_rng.uniform(-20, 20),
                 0.6, (100, 200, 255), 3, "spark"
-            ))
+            )
 
     def draw(self, surf, cam: Camera):
         px, py = cam.world_to_screen((self.x, self.y))
@@ -679,17 +1365,16 @@ class PlasmaBall:
         pygame.draw.circle(surf, (150, 220, 255), (px, py), pulse_size + 4)
         pygame.draw.circle(surf, (100, 200, 255), (px, py), pulse_size + 2)
         pygame.draw.circle(surf, (50, 150, 255), (px, py), pulse_size)
-        
-        # Draw particles
-        for particle in self.particles:
-            particle.draw(surf, cam)
 
     def rect(self):
         return pygame.Rect(int(self.x - self.radius), int(self.y - self.radius), self.radius*2, self.radius*2)
 
 class VoidProjectile:
+    kind = 'void'
+
     def __init__(self, x, y, dx, dy, team, owner, damage=30, speed=650, life=2.5):
         self.x, self.y = x, y
+        self.prev_x, self.prev_y = x, y
         ndx, ndy = normalize(dx, dy)
         self.vx = ndx * speed
         self.vy = ndy * speed
@@ -725,6 +1410,8 @@ class VoidProjectile:
 
 
 class ElectricArc:
+    kind = 'arc'
+
     def __init__(self, path: List[Tuple[float,float]], damage: float, team: int, owner: 'Ship', time=0.22):
         self.path = path
         self.damage = damage
@@ -743,6 +1430,8 @@ class ElectricArc:
 
 
 class GravityPulse:
+    kind = 'pulse'
+
     def __init__(self, x, y, team, owner, radius=240, strength=900, time=0.45):
         self.x, self.y = x, y
         self.team = team
@@ -751,7 +1440,7 @@ class GravityPulse:
         self.strength = strength
         self.time = time
 
-    def update(self, dt, ships, bullets):
+    def update(self, dt, ships, bullets: BulletPool):
         self.time -= dt
         for sh in ships:
             if sh.team == self.team or sh.dead:
@@ -764,15 +1453,7 @@ class GravityPulse:
                 sh.vx += nx * force * dt
                 sh.vy += ny * force * dt
                 sh.damage(1.0 * dt, attacker=self.owner)  # лёгкий урон
-        for b in list(bullets):
-            if b.team == self.team:
-                continue
-            dx, dy = b.x - self.x, b.y - self.y
-            d = vec_len(dx, dy)
-            if d < self.radius and d > 1:
-                nx, ny = dx / d, dy / d
-                b.vx += nx * self.strength * 0.5 * dt
-                b.vy += ny * self.strength * 0.5 * dt
+        bullets.push(self.x, self.y, self.radius, self.strength, dt, exclude_team=self.team)
 
     def draw(self, surf, cam: Camera):
         pygame.draw.circle(surf, (180, 160, 255), (int(self.x - cam.x), int(self.y - cam.y)), int(self.radius), 2)
@@ -794,6 +1475,227 @@ class TrailSeg:
         pygame.draw.circle(surf, (230, 200, 90), (int(self.x - cam.x), int(self.y - cam.y)), int(self.r), 1)
 
 
+# -----------------------------
+# Projectile registry
+# -----------------------------
+class ProjectileKind:
+    """Behaviour table for one projectile kind: how its container steps, expires, hits and draws"""
+    def __init__(self, name: str, expired=None, step=None, on_hit=None, collide=None, pooled: bool = False,
+                 moving: bool = False):
+        self.name = name
+        self.expired = expired  # p -> bool, swept after the step
+        self.step = step or (lambda p, dt, world: p.update(dt))
+        self.on_hit = on_hit  # (p, ship): generic first-hit test against the broadphase
+        self.collide = collide  # (store, world, bp, dt): custom pass, replaces on_hit
+        self.pooled = pooled  # objects come from entity_pools
+        self.moving = moving  # objects keep prev_x/prev_y and are drawn interpolated
+
+    def make(self):
+        return EntityList(on_remove=entity_pools.release if self.pooled else None)
+
+    def update(self, store, dt, world):
+        step = self.step
+        for p in store:
+            step(p, dt, world)
+        store.sweep(self.expired)
+
+    def hit_test(self, store, world, bp: ShipBroadphase, dt):
+        if self.collide is not None:
+            self.collide(store, world, bp, dt)
+            return
+        on_hit = self.on_hit
+        world.counters.combat_broad += len(store)
+        for p in store:
+            sh = bp.first_hit(p.rect(), p.team)
+            if sh is not None:
+                on_hit(p, sh)
+                store.kill(p)
+
+    def draw(self, store, surf, cam: Camera, lag: float = 0.0):
+        for p in store:
+            p.draw(surf, cam)
+
+    def snapshot(self, store):
+        return list(store)
+
+    def restore(self, store, items):
+        store.clear()
+        store.extend(items)
+
+
+class BulletKind(ProjectileKind):
+    """Bullets live in a BulletPool and are processed as whole arrays"""
+    def __init__(self):
+        super().__init__('bullet', collide=_collide_bullets)
+
+    def make(self):
+        return BulletPool()
+
+    def update(self, store, dt, world):
+        store.update(dt)
+
+    def draw(self, store, surf, cam: Camera, lag: float = 0.0):
+        store.draw(surf, cam, lag)
+
+    def snapshot(self, store):
+        return store.snapshot()
+
+    def restore(self, store, rows):
+        store.restore(rows)
+
+
+def _collide_bullets(pool: BulletPool, world, bp: ShipBroadphase, dt):
+    ships = bp.ships
+    hit = []
+    candidates = pool.ship_candidates(bp)
+    world.counters.combat_broad += pool.n
+    world.counters.combat_narrow += pool.pair_tests
+    for bi, cands in candidates:
+        sh = None
+        for si in cands:
+            if not ships[si].dead:
+                sh = ships[si]
+                break
+        if sh is None:
+            continue
+        hit.append(bi)
+        dmg = float(pool.damage[bi])
+        crit = False
+        if world.rng.random() < pool.crit[bi]:
+            dmg *= 2.0; crit = True
+        
+        damage_type = "normal"
+        flags = pool.flags[bi]
+        if flags & BULLET_ACID:
+            sh.add_acid(dps=6.0, dur=2.2)
+            damage_type = "acid"
+        elif flags & BULLET_PLASMA:
+            sh.status_burn.append((3.0, 4.0))
+            damage_type = "plasma"
+        elif flags & BULLET_VOID:
+            sh.status_void.append((2.5, 3.0))
+            damage_type = "void"
+        
+        sh.damage(dmg, attacker=pool.owner[bi], crit=crit, damage_type=damage_type)
+    pool.remove(hit)
+
+
+def _collide_lasers(lasers, world, bp: ShipBroadphase, dt):
+    # Laser: щит снимается быстрее, HP — слабее
+    ships = bp.ships
+    world.counters.combat_narrow += len(lasers) * len(bp.live)
+    for lz in lasers:
+        x1, y1, x2, y2 = lz.segment()
+        for i in bp.live:
+            sh = ships[i]
+            if sh.dead or sh.team == lz.team:
+                continue
+            px, py = sh.x, sh.y
+            vx, vy = x2 - x1, y2 - y1
+            l2 = vx*vx + vy*vy
+            if l2 == 0: continue
+            t = max(0.0, min(1.0, ((px - x1)*vx + (py - y1)*vy) / l2))
+            projx = x1 + t*vx; projy = y1 + t*vy
+            d2 = (px - projx)**2 + (py - projy)**2
+            if d2 < (sh.size*0.7)**2:
+                base = lz.damage * 0.9 * dt
+                if sh.invuln <= 0:
+                    if sh.shield > 0:
+                        sh.shield = max(0.0, sh.shield - base * 1.7)
+                        sh.hp -= base * 0.25
+                    else:
+                        sh.hp -= base * 0.7
+                    sfx.play("hit")
+                    if sh.hp <= 0:
+                        sh.die(attacker=lz.owner)
+
+
+def _plasma_hit(pb: PlasmaBall, sh):
+    sh.damage(pb.damage, attacker=pb.owner, damage_type="plasma")
+    sh.status_burn.append((3.0, 5.0))
+
+
+def _void_hit(vp: VoidProjectile, sh):
+    sh.damage(vp.damage, attacker=vp.owner, damage_type="void")
+    sh.status_void.append((4.0, 6.0))
+    sh.status_slow = max(sh.status_slow, 2.0)
+
+
+# Registration order is the update order
+PROJECTILE_KINDS: Tuple[ProjectileKind, ...] = (
+    BulletKind(),
+    ProjectileKind('missile', lambda m: m.life <= 0, step=lambda m, dt, world: m.update(dt, world),
+                   on_hit=lambda m, sh: sh.damage(m.damage, attacker=m.owner), pooled=True, moving=True),
+    ProjectileKind('laser', lambda lz: lz.time <= 0, step=lambda lz, dt, world: lz.update(dt, world.fx_rng, world.particles),
+                   collide=_collide_lasers),
+    ProjectileKind('arc', lambda arc: arc.time <= 0),  # урон наносится при выстреле
+    ProjectileKind('pulse', lambda pulse: pulse.time <= 0,
+                   step=lambda pulse, dt, world: pulse.update(dt, world.ships, world.projectiles.bullets)),
+    ProjectileKind('plasma', lambda pb: pb.life <= 0, step=lambda pb, dt, world: pb.update(dt, world.fx_rng, world.particles),
+                   on_hit=_plasma_hit, moving=True),
+    ProjectileKind('void', lambda vp: vp.life <= 0, on_hit=_void_hit, moving=True),
+)
+# Beams resolve before anything in flight; kinds without a hit test are left out
+PROJECTILE_COLLIDE_ORDER = ('laser', 'bullet', 'missile', 'plasma', 'void')
+PROJECTILE_DRAW_ORDER = ('arc', 'pulse', 'laser', 'bullet', 'missile', 'plasma', 'void')
+
+
+class ProjectileRegistry:
+    """All live projectiles, one container per kind.
+
+    add() takes projectile objects, emit_bullet() takes bullets, which are rows of the
+    BulletPool rather than objects; nothing else puts projectiles in the stores.
+    """
+    def __init__(self, kinds=PROJECTILE_KINDS):
+        self.kinds: Dict[str, ProjectileKind] = {k.name: k for k in kinds}
+        self.stores = {k.name: k.make() for k in kinds}
+        self.bullets: BulletPool = self.stores['bullet']
+        self.emit_bullet = self.bullets.emit  # bound once: shotgun volleys call it per pellet
+        # Pre-bound passes so the per-frame loops are flat
+        self._update = [(k, self.stores[k.name]) for k in kinds]
+        self._collide = [(self.kinds[n], self.stores[n]) for n in PROJECTILE_COLLIDE_ORDER if n in self.kinds]
+        self._draw = [(self.kinds[n], self.stores[n]) for n in PROJECTILE_DRAW_ORDER if n in self.kinds]
+
+    def __getitem__(self, kind: str):
+        return self.stores[kind]
+
+    def add(self, p):
+        self.stores[p.kind].append(p)
+
+    def clear(self):
+        for store in self.stores.values():
+            store.clear()
+
+    def entity_lists(self) -> Tuple[EntityList, ...]:
+        return tuple(s for s in self.stores.values() if isinstance(s, EntityList))
+
+    def moving(self) -> List[EntityList]:
+        """Stores whose objects are drawn between their previous and current positions"""
+        return [self.stores[name] for name, k in self.kinds.items() if k.moving]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: kind.snapshot(self.stores[name]) for name, kind in self.kinds.items()}
+
+    def restore(self, state: Dict[str, Any]):
+        for name, kind in self.kinds.items():
+            kind.restore(self.stores[name], state[name])
+
+    def counts(self) -> Dict[str, int]:
+        return {name: len(store) for name, store in self.stores.items()}
+
+    def update(self, dt, world):
+        for kind, store in self._update:
+            kind.update(store, dt, world)
+
+    def collide(self, world, bp: ShipBroadphase, dt):
+        for kind, store in self._collide:
+            kind.hit_test(store, world, bp, dt)
+
+    def draw(self, surf, cam: Camera, lag: float = 0.0):
+        for kind, store in self._draw:
+            kind.draw(store, surf, cam, lag)
+
+
 # -----------------------------
 # Map entities
 # -----------------------------
@@ -808,6 +1710,14 @@ class Obstacle:
             x, y, w, h = rect
             self.tri = [(x, y+h), (x+w//2, y), (x+w, y+h)]
 
+    def hits_rect(self, r: pygame.Rect) -> bool:
+        """Exact overlap of a rect with a 'rect' or 'tri' obstacle"""
+        if not r.colliderect(self.rect):
+            return False
+        if self.shape == 'tri':
+            return tri_overlaps_rect(self.tri, r)
+        return True
+
     def draw(self, surf, cam: Camera):
         r = self.rect.move(-cam.x, -cam.y)
         col = self.color
@@ -828,6 +1738,26 @@ class Obstacle:
                 pygame.draw.line(surf, (230, 200, 40), (cx, cy), (ex, ey), 2)
 
 
+class ObstacleIndex:
+    """Static grid over obstacles; built once per map in reset_world"""
+    CELL = 128
+
+    def __init__(self, obstacles: List[Obstacle]):
+        self.obstacles = obstacles
+        self.grid = SpatialHash(self.CELL)
+        for i, ob in enumerate(obstacles):
+            r = ob.rect
+            self.grid.insert_rect(i, r.x, r.y, r.w, r.h)
+
+    def query(self, x: int, y: int, w: int, h: int) -> List[Obstacle]:
+        """Obstacles whose cells overlap the rect, in map order"""
+        obs = self.obstacles
+        return [obs[i] for i in self.grid.query_rect(x, y, w, h)]
+
+    def query_rect(self, r: pygame.Rect, margin: int = 0) -> List[Obstacle]:
+        return self.query(r.x - margin, r.y - margin, r.w + 2*margin, r.h + 2*margin)
+
+
 class Pickup:
     def __init__(self, x, y, value=1, color=(230, 230, 60)):
         self.x, self.y = x, y
@@ -848,6 +1778,70 @@ class Pickup:
         return pygame.Rect(int(self.x - self.radius), int(self.y - self.radius), self.radius*2, self.radius*2)
 
 
+# -----------------------------
+# Object pools
+# -----------------------------
+class FreeListPool:
+    """Free list of recycled instances of one class, capped, with hit/miss counters"""
+    def __init__(self, cls, cap: int):
+        self.cls = cls
+        self.cap = cap
+        self.free: List[Any] = []
+        # classes that own containers provide reset() to reuse them
+        self._reinit = getattr(cls, 'reset', cls.__init__)
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            obj = self.free.pop()
+            self._reinit(obj, *args, **kwargs)
+            self.hits += 1
+            return obj
+        self.misses += 1
+        return self.cls(*args, **kwargs)
+
+    def release(self, obj):
+        if len(self.free) < self.cap:
+            self.free.append(obj)
+        else:
+            self.dropped += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'dropped': self.dropped,
+                'free': len(self.free), 'cap': self.cap}
+
+
+class EntityPools:
+    """Per-type free lists for short-lived entities"""
+    def __init__(self, caps: Dict[type, int]):
+        self.pools: Dict[type, FreeListPool] = {cls: FreeListPool(cls, cap) for cls, cap in caps.items()}
+
+    def acquire(self, cls, *args, **kwargs):
+        return self.pools[cls].acquire(*args, **kwargs)
+
+    def release(self, obj):
+        pool = self.pools.get(type(obj))
+        if pool is not None:
+            pool.release(obj)
+
+    def release_all(self, objs):
+        for obj in objs:
+            self.release(obj)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {cls.__name__: pool.stats() for cls, pool in self.pools.items()}
+
+
+entity_pools = EntityPools({
+    DamageText: 512,
+    TrailSeg: 2048,
+    Pickup: 256,
+    HomingMissile: 256,
+})
+
+
 class CapturePoint:
     def __init__(self, x, y):
         self.x, self.y = x, y
@@ -871,9 +1865,7 @@ class CapturePoint:
                 self.owner = team
                 for t in range(MAX_TEAMS_LIMIT):
                     self.progress[t] = 0.0
-                if sfx.enabled:
-                    try: sfx.capture.play()
-                    except Exception: pass
+                sfx.play("capture")
         elif len(teams_inside) == 0:
             for t in range(MAX_TEAMS_LIMIT):
                 self.progress[t] = max(0.0, self.progress[t] - dt*0.5)
@@ -904,8 +1896,10 @@ class CapturePoint:
 # Ship
 # -----------------------------
 class Ship:
-    def __init__(self, x, y, team: int, is_player=False, reinforcement=False):
+    def __init__(self, world: 'World', x, y, team: int, is_player=False, reinforcement=False):
+        self.world = world  # the arena this ship fights in; all match state goes through it
         self.x, self.y = x, y
+        self.prev_x, self.prev_y = x, y
         self.vx, self.vy = 0.0, 0.0
         self.team = team
         self.is_player = is_player
@@ -969,11 +1963,12 @@ class Ship:
 
         # AI
         self.target: Optional[Ship] = None
-        self.aggro = False
-        self.aggro_timer = 0.0
         self.goal_point: Optional[CapturePoint] = None
         self.ai_state = "patrol"  # patrol, attack, retreat, capture
         self.ai_timer = 0.0
+        self.ai_next_plan = 0  # tick of the next planning pass, see AIScheduler
+        self.ai_plan_due = False
+        self.ai_ticks = 0  # ticks steered since the last plan
 
         # Spawn origin
         self.spawn_rect = None
@@ -986,7 +1981,6 @@ class Ship:
         self.reinforce_life = 0.0
         
         # Visual effects
-        self.engine_particles = []
         self.damage_flash = 0.0
         self.level_up_flash = 0.0
         self.ability_charge = 0.0
@@ -1054,7 +2048,7 @@ class Ship:
                 'crit_add': 0.0,
                 'triple_unlock': False,
             }
-            for nid in self.class_nodes:
+            for nid in sorted(self.class_nodes):  # fixed float order regardless of str hashing
                 nd = CLASS_NODES.get(nid)
                 if not nd: continue
                 for k, v in nd['mods'].items():
@@ -1098,15 +2092,17 @@ class Ship:
             self.upgrade_points += 1
             leveled = True
             self.grant_class_points_if_needed()
-            if sfx.enabled:
-                try: sfx.levelup.play()
-                except Exception: pass
+            sfx.play("levelup")
         if leveled:
             # сброс кеша классов (на случай порогов)
             self.class_mods_cache = {}
 
     def award_kill(self):
         self.score += KILL_SCORE
+        self.kills += 1
+        world = self.world
+        world.total_kills += 1
+        world.team_kills[self.team] += 1
 
     def award_spheres(self, n: int):
         gain = int(n * self.resource_mult())
@@ -1116,6 +2112,7 @@ class Ship:
 
     # ---- Combat ----
     def damage(self, amount, attacker: Optional['Ship']=None, ignore_invuln=False, crit=False, damage_type="normal"):
+        self.world.counters.damage_calls += 1
         if self.dead:
             return
         if self.invuln > 0 and not ignore_invuln:
@@ -1123,14 +2120,14 @@ class Ship:
         
         # Damage tracking
         self.damage_taken += amount
-        self.last_damage_time = time.time()
+        self.last_damage_time = self.world.sim_time
         
         # Visual feedback
         self.damage_flash = 0.3
         
         # Camera shake for player
         if self.is_player and amount > 15:
-            Game.instance.camera.shake(amount * 0.5, 0.2)
+            self.world.camera.shake(amount * 0.5, 0.2)
         
         rem = amount
         if self.shield > 0:
@@ -1156,7 +2153,7 @@ class Ship:
         elif damage_type == "acid":
             color = (120, 255, 140)
         
-        Game.instance.dmgtexts.append(DamageText(self.x, self.y - 20, f"{int(amount)}", 0.5, crit=crit, color=color))
+        self.world.dmgtexts.append(entity_pools.acquire(DamageText, self.x, self.y - 20, f"{int(amount)}", 0.5, crit=crit, color=color))
         
         if self.hp <= 0:
             self.die(attacker)
@@ -1168,25 +2165,31 @@ class Ship:
     def die(self, attacker: Optional['Ship']):
         if self.dead: return
         self.dead = True
+        self.deaths += 1
+        vxs = []; vys = []
         for _ in range(40):
-            ang = random.random() * 2*math.pi
-            sp = random.uniform(80, 320)
-            vx, vy = math.cos(ang)*sp, math.sin(ang)*sp
-            Game.instance.particles.append(Particle(self.x, self.y, vx, vy, 0.8, TEAM_COLORS[self.team], 3))
+            ang = self.world.fx_rng.random() * 2*math.pi
+            sp = self.world.fx_rng.uniform(80, 320)
+            vxs.append(math.cos(ang)*sp); vys.append(math.sin(ang)*sp)
+        self.world.particles.emit_burst(self.x, self.y, vxs, vys, 0.8, TEAM_COLORS[self.team], 3)
+        if self.world.flight:
+            self.world.flight.event('death', team=self.team, level=self.level, player=self.is_player,
+                                    reinforcement=self.is_reinforcement, burst=len(vxs),
+                                    particles=self.world.particles.n)
         # подкрепления не дропают
         if not self.is_reinforcement:
             drop = max(1, self.level // 3)
             for _ in range(drop):
-                ox = random.uniform(-20, 20)
-                oy = random.uniform(-20, 20)
-                Game.instance.pickups.append(Pickup(self.x + ox, self.y + oy, value=1))
+                ox = self.world.rng.uniform(-20, 20)
+                oy = self.world.rng.uniform(-20, 20)
+                self.world.pickups.append(entity_pools.acquire(Pickup, self.x + ox, self.y + oy, value=1))
         if attacker is not None:
             attacker.award_kill()
         if self.is_reinforcement:
             self.delete_me = True
-        if sfx.enabled:
-            try: sfx.explosion.play()
-            except Exception: pass
+        if self.is_player:
+            self.world.on_player_death(self, attacker)
+        sfx.play("explosion")
 
     def respawn(self):
         self.dead = False
@@ -1195,26 +2198,30 @@ class Ship:
         self.invuln = INVULN_TIME
         def safe_pos(rect: pygame.Rect):
             for _ in range(20):
-                x = random.uniform(rect.left+40, rect.right-40)
-                y = random.uniform(rect.top+40, rect.bottom-40)
+                x = self.world.rng.uniform(rect.left+40, rect.right-40)
+                y = self.world.rng.uniform(rect.top+40, rect.bottom-40)
                 ok = True
-                for ob in Game.instance.obstacles:
+                sr = pygame.Rect(int(x - self.size*0.5), int(y - self.size*0.5), int(self.size), int(self.size))
+                reach = int(self.size*0.7) + 1  # kill-circle clearance
+                for ob in self.world.obstacle_index.query(int(x) - reach, int(y) - reach, 2*reach, 2*reach):
                     if ob.kill or ob.spiked:
                         cx, cy = ob.rect.center
                         if (x - cx)**2 + (y - cy)**2 < (ob.rect.w//2 + self.size*0.7)**2:
                             ok = False; break
-                    elif ob.shape in ('rect','tri') and pygame.Rect(int(x - self.size*0.5), int(y - self.size*0.5), int(self.size), int(self.size)).colliderect(ob.rect):
+                    elif ob.shape in ('rect','tri') and ob.hits_rect(sr):
                         ok = False; break
                 if ok:
                     return x, y
-            return random.uniform(rect.left+40, rect.right-40), random.uniform(rect.top+40, rect.bottom-40)
+            return self.world.rng.uniform(rect.left+40, rect.right-40), self.world.rng.uniform(rect.top+40, rect.bottom-40)
         if self.spawn_rect:
             self.x, self.y = safe_pos(self.spawn_rect)
         else:
-            self.x, self.y = random.uniform(100, ARENA_W-100), random.uniform(100, ARENA_H-100)
+            self.x, self.y = self.world.rng.uniform(100, ARENA_W-100), self.world.rng.uniform(100, ARENA_H-100)
+        self.prev_x, self.prev_y = self.x, self.y
         self.vx = self.vy = 0
 
-    def update(self, dt, game: 'Game'):
+    def update(self, dt):
+        world = self.world
         if self.dead:
             return
         
@@ -1270,19 +2277,22 @@ class Ship:
         
         # AI
         if not self.is_player:
-            self.ai_update(dt, game)
+            pt = world.phase_timer
+            if pt: pt.mark('ships')
+            self.ai_update(dt)
+            if pt: pt.mark('ai')
         
         # Visual effects
-        self._update_visual_effects(dt, game)
+        self._update_visual_effects(dt)
         
         # Engine particles
-        if random.random() < 0.3:
-            self.engine_particles.append(Particle(
+        if world.fx_rng.random() < 0.3:
+            world.particles.emit(
                 self.x - self.vx * 0.1, self.y - self.vy * 0.1,
-                -self.vx * 0.3 + random.uniform(-10, 10),
-                -self.vy * 0.3 + random.uniform(-10, 10),
+                -self.vx * 0.3 + world.fx_rng.uniform(-10, 10),
+                -self.vy * 0.3 + world.fx_rng.uniform(-10, 10),
                 0.4, TEAM_COLORS[self.team], 2, "spark"
-            ))
+            )
 
     def _update_status_effects(self, dt):
         # Acid DoT
@@ -1310,40 +2320,38 @@ class Ship:
         if self.hp <= 0:
             self.die(attacker=None)
 
-    def _update_visual_effects(self, dt, game):
+    def _update_visual_effects(self, dt):
+        world = self.world
         # Energy trail
-        if self.up_trail > 0 and (random.random() < 0.9):
-            game.trails.append(TrailSeg(
+        if self.up_trail > 0 and (world.rng.random() < 0.9):
+            world.trails.append(entity_pools.acquire(TrailSeg,
                 self.x, self.y, 
                 r=6 + 2*self.up_trail, 
                 life=0.35 + 0.03*self.up_trail, 
                 team=self.team
             ))
-        
-        # Update engine particles
-        for particle in list(self.engine_particles):
-            particle.update(dt)
-            if particle.life <= 0:
-                self.engine_particles.remove(particle)
 
     # ---- Shooting ----
     def shoot(self, tx, ty):
-        if self.dead: return []
-        out = []
+        if self.dead: return
+        fired = False
+        projectiles = self.world.projectiles
         level_mult = 1.0 + 0.05 * (self.up_firerate - 1)
         level_mult *= self.get_class('firerate_mul', 1.0)
         dmg_mult = self.dmg_mult()
         min_cd = 0.08
         name = WEAPON_TYPES[self.weapon]
         if not self.unlocked.get(name, False):
-            return out
+            return
+        ready = self.fire_cd <= 0
         if name == 'Blaster':
             rate = self.base_fire_rate * level_mult
             cd = max(min_cd, 1.0 / rate)
             if self.fire_cd <= 0:
                 dx, dy = tx - self.x, ty - self.y
                 dmg = (12 + 2*(self.get_weapon_level('Blaster')-1)) * dmg_mult
-                out.append(Bullet(self.x, self.y, dx, dy, self.team, self, damage=dmg, speed=950, color=TEAM_COLORS[self.team], crit_chance=self.base_crit_chance()))
+                projectiles.emit_bullet(self.x, self.y, dx, dy, self.team, self, damage=dmg, speed=950, color=TEAM_COLORS[self.team], crit_chance=self.base_crit_chance())
+                fired = True
                 self.fire_cd = cd
         elif name == 'Shotgun':
             rate = 1.6 + 0.1*(self.get_weapon_level('Shotgun')-1)
@@ -1352,10 +2360,11 @@ class Ship:
             if self.fire_cd <= 0:
                 pellets = 6 + self.get_weapon_level('Shotgun') + int(self.get_class('shotgun_pellets_add', 0))
                 for _ in range(pellets):
-                    spread = random.uniform(-0.28, 0.28)
+                    spread = self.world.rng.uniform(-0.28, 0.28)
                     ang = math.atan2(ty - self.y, tx - self.x) + spread
                     dx, dy = math.cos(ang), math.sin(ang)
-                    out.append(Bullet(self.x, self.y, dx, dy, self.team, self, damage=7*dmg_mult, speed=820, life=0.7, color=TEAM_COLORS[self.team], crit_chance=self.base_crit_chance()))
+                    projectiles.emit_bullet(self.x, self.y, dx, dy, self.team, self, damage=7*dmg_mult, speed=820, life=0.7, color=TEAM_COLORS[self.team], crit_chance=self.base_crit_chance())
+                fired = True
                 self.fire_cd = cd
         elif name == 'Triple':
             rate = 3.0 * level_mult
@@ -1365,17 +2374,19 @@ class Ship:
                 for off in (-0.12, 0, 0.12):
                     ang = base + off
                     dx, dy = math.cos(ang), math.sin(ang)
-                    out.append(Bullet(self.x, self.y, dx, dy, self.team, self, damage=10*dmg_mult, speed=900, color=TEAM_COLORS[self.team], crit_chance=self.base_crit_chance()))
+                    projectiles.emit_bullet(self.x, self.y, dx, dy, self.team, self, damage=10*dmg_mult, speed=900, color=TEAM_COLORS[self.team], crit_chance=self.base_crit_chance())
+                fired = True
                 self.fire_cd = cd
         elif name == 'Missile':
             rate = 1.2 * (1.0 + 0.05*(self.get_weapon_level('Missile')-1)) * level_mult
             cd = max(0.25, 1.0 / rate)
             if self.fire_cd <= 0:
-                m = HomingMissile(self.x, self.y, self.team, self)
+                m = entity_pools.acquire(HomingMissile, self.x, self.y, self.team, self)
                 # классовые бонусы
                 m.damage = int(m.damage * self.get_class('missile_damage_mul', 1.0))
                 m.turn_rate *= self.get_class('missile_turn_mul', 1.0)
-                out.append(m)
+                projectiles.add(m)
+                fired = True
                 self.fire_cd = cd
         elif name == 'Laser':
             base_cd = 4.0
@@ -1384,7 +2395,8 @@ class Ship:
                 dx, dy = tx - self.x, ty - self.y
                 dmg = (16 + 2*(self.get_weapon_level('Laser')-1)) * dmg_mult * self.get_class('laser_damage_mul', 1.0)
                 length = 820 + 20*(self.get_weapon_level('Laser')-1) + self.get_class('laser_len_add', 0.0)
-                out.append(LaserBeam(self.x, self.y, dx, dy, self.team, self, damage=dmg, length=length, color=TEAM_COLORS[self.team]))
+                projectiles.add(LaserBeam(self.x, self.y, dx, dy, self.team, self, damage=dmg, length=length, color=TEAM_COLORS[self.team]))
+                fired = True
                 self.fire_cd = cd
         elif name == 'Arc':
             rate = 2.2 * level_mult
@@ -1394,49 +2406,44 @@ class Ship:
                 chain = 2 + lvl + int(self.get_class('arc_chain_add', 0))
                 base_rng = 420 + 25 * lvl + self.get_class('arc_range_add', 0.0)
                 dmg = (16 + 2 * lvl) * dmg_mult
-                enemies = [s for s in Game.instance.ships if s.team != self.team and not s.dead]
-                if enemies:
-                    if self.is_player:
-                        cand = [(e, (e.x - tx)**2 + (e.y - ty)**2) for e in enemies]
-                    else:
-                        cand = [(e, (e.x - self.x)**2 + (e.y - self.y)**2) for e in enemies]
-                    cand = [c for c in cand if c[1] <= base_rng * base_rng]
-                    if cand:
-                        first, _ = min(cand, key=lambda t: t[1])
-                        path = [(self.x, self.y), (first.x, first.y)]
-                        first.damage(dmg, attacker=self)
-                        used = {first}
-                        curx, cury = first.x, first.y
-                        for _ in range(chain - 1):
-                            nexts = [(e, (e.x - curx)**2 + (e.y - cury)**2) for e in enemies if e not in used]
-                            nexts = [c for c in nexts if c[1] <= base_rng * base_rng]
-                            if not nexts:
-                                break
-                            nxt, _ = min(nexts, key=lambda t: t[1])
-                            path.append((nxt.x, nxt.y))
-                            nxt.damage(dmg, attacker=self)
-                            used.add(nxt)
-                            curx, cury = nxt.x, nxt.y
-                        if len(path) >= 2:
-                            Game.instance.arcs.append(ElectricArc(path, dmg, self.team, self))
-                            if sfx.enabled:
-                                try: sfx.ability.play()
-                                except Exception: pass
-                            self.fire_cd = cd
+                targets = self.world.target_index()
+                r2 = base_rng * base_rng
+                # Игрок целится курсором, бот — от себя
+                ox, oy = (tx, ty) if self.is_player else (self.x, self.y)
+                first, _ = targets.nearest(self.team, ox, oy, r2)
+                if first is not None:
+                    path = [(self.x, self.y), (first.x, first.y)]
+                    first.damage(dmg, attacker=self)
+                    used = {first}
+                    curx, cury = first.x, first.y
+                    for _ in range(chain - 1):
+                        # Each hop re-centres on the last victim; ships killed by earlier hops are in used
+                        nxt, _ = targets.nearest(self.team, curx, cury, r2, exclude=used)
+                        if nxt is None:
+                            break
+                        path.append((nxt.x, nxt.y))
+                        nxt.damage(dmg, attacker=self)
+                        used.add(nxt)
+                        curx, cury = nxt.x, nxt.y
+                    if len(path) >= 2:
+                        projectiles.add(ElectricArc(path, dmg, self.team, self))
+                        sfx.play("ability")
+                        self.fire_cd = cd
         elif name == 'Gravity':
             rate = 1.6 * level_mult
             cd = max(0.4, 1.0 / rate)
             if self.fire_cd <= 0:
                 radius = 240 * self.get_class('gravity_radius_mul', 1.0)
                 pulse = GravityPulse(self.x, self.y, self.team, self, radius=radius, strength=900 * self.get_class('gravity_strength_mul',1.0))
-                Game.instance.pulses.append(pulse)
+                projectiles.add(pulse)
                 self.fire_cd = cd
         elif name == 'Acid':
             rate = 3.2 * level_mult
             cd = max(min_cd, 1.0 / rate)
             if self.fire_cd <= 0:
                 dx, dy = tx - self.x, ty - self.y
-                out.append(Bullet(self.x, self.y, dx, dy, self.team, self, damage=8*dmg_mult, speed=880, color=(120, 255, 140), acid=True, crit_chance=self.base_crit_chance()))
+                projectiles.emit_bullet(self.x, self.y, dx, dy, self.team, self, damage=8*dmg_mult, speed=880, color=(120, 255, 140), acid=True, crit_chance=self.base_crit_chance())
+                fired = True
                 self.fire_cd = cd
         elif name == 'Plasma':
             rate = 2.8 * level_mult
@@ -1445,7 +2452,7 @@ class Ship:
                 dx, dy = tx - self.x, ty - self.y
                 dmg = (18 + 2*(self.get_weapon_level('Plasma')-1)) * dmg_mult * self.get_class('plasma_damage_mul', 1.0)
                 plasma = PlasmaBall(self.x, self.y, dx, dy, self.team, self, damage=dmg)
-                Game.instance.plasma_balls.append(plasma)
+                projectiles.add(plasma)
                 self.fire_cd = cd
         elif name == 'Void':
             rate = 2.0 * level_mult
@@ -1454,10 +2461,13 @@ class Ship:
                 dx, dy = tx - self.x, ty - self.y
                 dmg = (25 + 3*(self.get_weapon_level('Void')-1)) * dmg_mult * self.get_class('void_damage_mul', 1.0)
                 void = VoidProjectile(self.x, self.y, dx, dy, self.team, self, damage=dmg)
-                Game.instance.void_projectiles.append(void)
+                projectiles.add(void)
                 self.fire_cd = cd
         
-        if out or any(name in ['Plasma', 'Void'] for name in [WEAPON_TYPES[self.weapon]]):
+        if ready and self.fire_cd > 0:
+            self.world.weapon_shots[name] += 1
+        
+        if fired or any(name in ['Plasma', 'Void'] for name in [WEAPON_TYPES[self.weapon]]):
             if WEAPON_TYPES[self.weapon] == 'Laser':
                 sfx.play("shoot_laser")
             elif WEAPON_TYPES[self.weapon] == 'Missile':
@@ -1466,8 +2476,6 @@ class Ship:
                 sfx.play("shoot_heavy")
             else:
                 sfx.play("shoot")
-        
-        return out
 
     # ---- Abilities ----
     def can_reinforce(self) -> bool:
@@ -1485,19 +2493,20 @@ class Ship:
     def use_reinforce(self):
         if not self.can_reinforce():
             return
-        ally = Ship(self.x + 40, self.y + 40, self.team, is_player=False, reinforcement=True)
+        ally = Ship(self.world, self.x + 40, self.y + 40, self.team, is_player=False, reinforcement=True)
         ally.reinforce_life = REINFORCE_LIFETIME * (1.0 + 0.08*self.up_reinforce)
         ally.set_spawn_rect(self.spawn_rect)
         ally.unlocked['Blaster'] = True
         ally.weapon = 0
-        Game.instance.ships.append(ally)
+        self.world.ships.append(ally)
+        self.world.targets.moved(ally)
         self.reinforce_cd = max(4.0, REINFORCE_CD * (1.0 - 0.05*self.up_reinforce))
         sfx.play("ability")
 
     def use_quantum(self):
         if not self.can_quantum():
             return
-        roll = random.random()
+        roll = self.world.rng.random()
         if roll < 0.33:
             self.hp = clamp(self.hp + 40 + 6*self.up_quantum, 0, self.max_hp)
             sfx.play("heal")
@@ -1519,23 +2528,25 @@ class Ship:
         
         # Create teleport effect
         for _ in range(20):
-            Game.instance.particles.append(Particle(
+            self.world.particles.emit(
                 self.x, self.y,
-                random.uniform(-100, 100), random.uniform(-100, 100),
+                self.world.fx_rng.uniform(-100, 100), self.world.fx_rng.uniform(-100, 100),
                 0.5, TEAM_COLORS[self.team], 4, "spark"
-            ))
+            )
         
         # Teleport
         self.x, self.y = target_x, target_y
+        self.prev_x, self.prev_y = self.x, self.y
         self.vx = self.vy = 0
+        self.world.targets.moved(self)
         
         # Create arrival effect
         for _ in range(20):
-            Game.instance.particles.append(Particle(
+            self.world.particles.emit(
                 self.x, self.y,
-                random.uniform(-100, 100), random.uniform(-100, 100),
+                self.world.fx_rng.uniform(-100, 100), self.world.fx_rng.uniform(-100, 100),
                 0.5, TEAM_COLORS[self.team], 4, "spark"
-            ))
+            )
         
         self.teleport_cd = max(3.0, TELEPORT_CD * (1.0 - 0.05*self.up_teleport))
         sfx.play("teleport")
@@ -1548,80 +2559,92 @@ class Ship:
         if 'Legend' in self.class_nodes:
             # Legend ultimate: Massive damage burst
             for _ in range(8):
-                ang = random.uniform(0, 2*math.pi)
+                ang = self.world.rng.uniform(0, 2*math.pi)
                 dx, dy = math.cos(ang), math.sin(ang)
-                Game.instance.bullets.append(Bullet(
+                self.world.projectiles.emit_bullet(
                     self.x, self.y, dx, dy, self.team, self,
                     damage=50, speed=1200, life=2.0, color=(255, 255, 100), size=8
-                ))
+                )
         
         elif 'VoidLord' in self.class_nodes:
             # Void Lord ultimate: Void explosion
-            for sh in Game.instance.ships:
-                if sh.team != self.team and not sh.dead:
-                    dist = distance((self.x, self.y), (sh.x, sh.y))
-                    if dist < 400:
-                        sh.damage(30, attacker=self)
-                        sh.status_void.append((3.0, 8.0))
+            for sh in self.world.target_index().within(self.team, self.x, self.y, 400):
+                dist = distance((self.x, self.y), (sh.x, sh.y))
+                if dist < 400:
+                    sh.damage(30, attacker=self)
+                    sh.status_void.append((3.0, 8.0))
         
         elif 'Omega' in self.class_nodes:
             # Omega ultimate: Time slow
-            for sh in Game.instance.ships:
-                if sh.team != self.team and not sh.dead:
-                    dist = distance((self.x, self.y), (sh.x, sh.y))
-                    if dist < 500:
-                        sh.status_slow = max(sh.status_slow, 5.0)
+            for sh in self.world.target_index().within(self.team, self.x, self.y, 500):
+                dist = distance((self.x, self.y), (sh.x, sh.y))
+                if dist < 500:
+                    sh.status_slow = max(sh.status_slow, 5.0)
         
         self.ultimate_cd = ULTIMATE_CD
         sfx.play("explosion_large")
 
     # ---- AI ----
-    def ai_update(self, dt, game: 'Game'):
-        cam = game.camera
-        my_rect = pygame.Rect(self.x-20, self.y-20, 40, 40)
-        on_screen = cam.rect_on_screen(my_rect)
-        if on_screen and not self.aggro:
-            self.aggro = True
-            self.aggro_timer = random.uniform(2.0, 4.0)
+    def ai_update(self, dt):
+        self.ai_ticks += 1
+        if self.ai_plan_due:
+            self.ai_plan()
+        self.ai_steer(dt)
+
+    def ai_plan(self):
+        """Low-rate decisions: goal point, target, class nodes, weapon and upgrades"""
+        world = self.world
+        world.counters.ai_plans += 1
+        ticks, self.ai_ticks = self.ai_ticks, 0
+        self.ai_plan_due = False
+        self.ai_next_plan = world.tick + (AI_PLAN_NEAR if world.ai.near(self) else AI_PLAN_FAR)
         # Точки
-        needy = [cp for cp in game.capture_points if (cp.owner is None or cp.owner != self.team)]
+        needy = [cp for cp in world.capture_points if (cp.owner is None or cp.owner != self.team)]
         self.goal_point = min(needy, key=lambda cp: (cp.x - self.x)**2 + (cp.y - self.y)**2) if needy else None
-        ax = ay = 0.0
-        if self.goal_point is not None:
-            dx, dy = self.goal_point.x - self.x, self.goal_point.y - self.y
-            ndx, ndy = normalize(dx, dy)
-            ax += ndx * 420; ay += ndy * 420
-        enemies = [s for s in game.ships if s.team != self.team and not s.dead]
-        if enemies:
-            nearest = min(enemies, key=lambda e: (e.x-self.x)**2 + (e.y-self.y)**2)
-            d2 = (nearest.x-self.x)**2 + (nearest.y-self.y)**2
-            if d2 < (700*700):
-                self.target = nearest
-        if self.target is not None and not self.target.dead:
-            dx, dy = self.target.x - self.x, self.target.y - self.y
-            ndx, ndy = normalize(dx, dy)
-            ax += ndx * 120; ay += ndy * 120
-            if random.random() < 0.9:
-                game.spawn_projectiles(self.shoot(self.target.x, self.target.y))
-        self.accelerate(ax, ay, dt)
+        nearest, d2 = world.target_index().nearest(self.team, self.x, self.y, 700*700)
+        if nearest is not None and d2 < (700*700):
+            self.target = nearest
         # Классовые поинты тратим иногда
         self.grant_class_points_if_needed()
         if self.class_points > 0:
             # выберем случайный доступный узел из текущего тира
-            avail = game.available_class_nodes(self)
+            avail = world.available_class_nodes(self)
             if avail:
-                nid = random.choice(avail)
+                nid = world.rng.choice(avail)
                 self.add_class_node(nid)
                 self.class_points -= 1
-        # Смена оружия — среди открытых
-        if random.random() < 0.0025:
+        # Смена оружия — среди открытых; per-tick chances compound over the ticks since the last plan
+        if world.rng.random() < 1.0 - (1.0 - 0.0025) ** ticks:
             unlocked = [i for i,w in enumerate(WEAPON_TYPES) if self.unlocked.get(w, False)]
             if unlocked:
-                self.weapon = random.choice(unlocked)
+                self.weapon = world.rng.choice(unlocked)
         # Бот иногда получает и тратит апгрейды
-        if random.random() < 0.003 and self.upgrade_points < 6:
+        if world.rng.random() < 1.0 - (1.0 - 0.003) ** ticks and self.upgrade_points < 6:
             self.upgrade_points += 1
-            game.apply_random_upgrade(self)
+            world.apply_random_upgrade(self)
+
+    def ai_steer(self, dt):
+        """Every tick: head for the goal point and the target, fire when the weapon is ready"""
+        world = self.world
+        ax = ay = 0.0
+        goal = self.goal_point
+        if goal is not None:
+            if goal.owner == self.team:
+                self.ai_next_plan = min(self.ai_next_plan, world.tick + 1)  # taken: pick the next one
+            dx, dy = goal.x - self.x, goal.y - self.y
+            ndx, ndy = normalize(dx, dy)
+            ax += ndx * 420; ay += ndy * 420
+        tgt = self.target
+        if tgt is not None:
+            if tgt.dead:
+                self.ai_next_plan = min(self.ai_next_plan, world.tick + 1)  # look for another
+            else:
+                dx, dy = tgt.x - self.x, tgt.y - self.y
+                ndx, ndy = normalize(dx, dy)
+                ax += ndx * 120; ay += ndy * 120
+                if self.fire_cd <= 0 and world.rng.random() < 0.9:
+                    self.shoot(tgt.x, tgt.y)
+        self.accelerate(ax, ay, dt)
 
     # ---- Draw ----
     def draw(self, surf, cam: Camera):
@@ -1629,7 +2652,7 @@ class Ship:
         
         # Stealth effect
         if self.stealth:
-            alpha = 0.3 + 0.4 * math.sin(time.time() * 8)
+            alpha = 0.3 + 0.4 * math.sin(self.world.sim_time * 8)
             col = tuple(int(c * alpha) for c in TEAM_COLORS[self.team])
         else:
             col = TEAM_COLORS[self.team]
@@ -1647,8 +2670,12 @@ class Ship:
         # Calculate ship angle
         ang = math.atan2(self.vy if (abs(self.vx)+abs(self.vy))>5 else 0, self.vx if (abs(self.vx)+abs(self.vy))>5 else 1)
         if self.is_player:
-            mx, my = pygame.mouse.get_pos()
-            ax, ay = mx + cam.x - self.x, my + cam.y - self.y
+            world = self.world
+            if world.replaying() and world.input is not None:
+                ax, ay = world.input.aim_x - self.x, world.input.aim_y - self.y
+            else:
+                mx, my = pygame.mouse.get_pos()
+                ax, ay = mx + cam.x - self.x, my + cam.y - self.y
             ang = math.atan2(ay, ax)
         
         # Draw ship body
@@ -1664,7 +2691,7 @@ class Ship:
         
         # Invulnerability effect
         if self.invuln > 0:
-            invuln_alpha = 0.5 + 0.5 * math.sin(time.time() * 10)
+            invuln_alpha = 0.5 + 0.5 * math.sin(self.world.sim_time * 10)
             invuln_color = tuple(int(c * invuln_alpha) for c in (255, 255, 255))
             pygame.draw.circle(surf, invuln_color, (px, py), int(size*0.7), 2)
         
@@ -1678,10 +2705,6 @@ class Ship:
         if self.status_slow > 0:
             pygame.draw.circle(surf, (255, 200, 100), (px + 15, py + 15), 3)
         
-        # Draw engine particles
-        for particle in self.engine_particles:
-            particle.draw(surf, cam)
-        
         # Health and shield bars
         bw = 44; bh = 5; base_x = px - bw//2
         pygame.draw.rect(surf, (30,30,36), (base_x, py + size*0.9, bw, bh), border_radius=3)
@@ -1701,6 +2724,661 @@ class Ship:
             pygame.draw.rect(surf, (255, 200, 100), (base_x, py + size*0.9 + (bh+2)*2, charge_w, bh), border_radius=3)
 
 
+# -----------------------------
+# Player input & replays
+# -----------------------------
+# Input buttons held during a tick
+IN_UP, IN_DOWN, IN_LEFT, IN_RIGHT = 1, 2, 4, 8
+IN_FIRE, IN_TELEPORT, IN_ULTIMATE = 16, 32, 64
+INPUT_KEYS = ((pygame.K_w, IN_UP), (pygame.K_s, IN_DOWN), (pygame.K_a, IN_LEFT), (pygame.K_d, IN_RIGHT),
+              (pygame.K_t, IN_TELEPORT), (pygame.K_SPACE, IN_ULTIMATE))
+
+# One-shot player actions: name -> argument types ('i' int, 's' str); the index is the wire code
+ACTIONS = (
+    ('weapon', 'i'), ('reinforce', ''), ('quantum', ''), ('teleport', 'ii'), ('ultimate', ''),
+    ('upgrade', 's'), ('class', 's'), ('dev_level', 'i'),
+)
+ACTION_CODES = {name: (code, args) for code, (name, args) in enumerate(ACTIONS)}
+
+KEYFRAME_TICKS = FPS // 2  # replay seek = restore keyframe + re-simulate < this many ticks
+KILLCAM_SECONDS = 5.0
+KILLCAM_EVERY = 2  # ticks per kill cam frame
+KILLCAM_SPEED = 2.0  # playback speed
+KILLCAM_MAX_BULLETS = 2048
+KILLCAM_COLORS = {'missile': (250, 210, 120), 'plasma': (100, 200, 255), 'void': (120, 60, 180)}
+
+REPLAY_SEEK_KEYS = {pygame.K_LEFT: -5 * FPS, pygame.K_RIGHT: 5 * FPS,
+                    pygame.K_PAGEDOWN: -60 * FPS, pygame.K_PAGEUP: 60 * FPS,
+                    pygame.K_HOME: -(1 << 30), pygame.K_END: 1 << 30}
+
+REPLAY_MAGIC = b'SARP'
+REPLAY_VERSION = 2
+REPLAY_DIR = 'replays'
+# Record tags, packed with the tick delta into one varint: (delta << 2) | tag
+REC_END, REC_BUTTONS, REC_AIM, REC_ACTION = 0, 1, 2, 3
+
+
+@dataclass
+class PlayerInput:
+    """Everything the player did in one tick; the only way player intent reaches the simulation"""
+    buttons: int = 0
+    aim_x: int = 0  # world position, whole pixels
+    aim_y: int = 0
+    actions: List[tuple] = field(default_factory=list)  # (name, *args), see ACTIONS
+
+
+@dataclass
+class ReplayHeader:
+    seed: int
+    num_teams: int
+    team_size: int
+    num_obstacles: int
+    hz: int = FPS
+
+
+def _put_varint(buf: bytearray, v: int):
+    while v >= 0x80:
+        buf.append((v & 0x7F) | 0x80)
+        v >>= 7
+    buf.append(v)
+
+def _put_svarint(buf: bytearray, v: int):
+    _put_varint(buf, v * 2 if v >= 0 else -v * 2 - 1)  # zigzag
+
+def _get_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    v = shift = 0
+    while True:
+        b = data[pos]  # IndexError on a truncated record
+        pos += 1
+        v |= (b & 0x7F) << shift
+        if b < 0x80:
+            return v, pos
+        shift += 7
+
+def _get_svarint(data: bytes, pos: int) -> Tuple[int, int]:
+    v, pos = _get_varint(data, pos)
+    return (v >> 1) if not v & 1 else -((v + 1) >> 1), pos
+
+
+class ReplayWriter:
+    """Append-only replay stream: header, then a record only when the input changes.
+
+    Layout: magic, version byte, varint header fields, then records of
+    varint((ticks since previous record << 2) | tag) + payload:
+    BUTTONS u8, AIM zigzag dx dy, ACTION code u8 + args, END + u8 length + final state digest.
+    """
+    FLUSH_TICKS = FPS  # a crash loses at most ~1 s of input
+
+    def __init__(self, f, header: ReplayHeader):
+        self.f = f
+        head = bytearray(REPLAY_MAGIC)
+        head.append(REPLAY_VERSION)
+        _put_svarint(head, header.seed)
+        for v in (header.num_teams, header.team_size, header.num_obstacles, header.hz):
+            _put_varint(head, v)
+        f.write(head)
+        self.buf = bytearray()
+        self.last_tick = 0
+        self.flushed_tick = 0
+        self.buttons = 0
+        self.aim_x = self.aim_y = 0
+
+    @classmethod
+    def create(cls, path: str, header: ReplayHeader) -> 'ReplayWriter':
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        return cls(open(path, 'wb'), header)
+
+    def _record(self, tick: int, tag: int):
+        _put_varint(self.buf, ((tick - self.last_tick) << 2) | tag)
+        self.last_tick = tick
+
+    def write(self, tick: int, inp: PlayerInput):
+        buf = self.buf
+        if inp.buttons != self.buttons:
+            self._record(tick, REC_BUTTONS)
+            buf.append(inp.buttons)
+            self.buttons = inp.buttons
+        if inp.aim_x != self.aim_x or inp.aim_y != self.aim_y:
+            self._record(tick, REC_AIM)
+            _put_svarint(buf, inp.aim_x - self.aim_x)
+            _put_svarint(buf, inp.aim_y - self.aim_y)
+            self.aim_x, self.aim_y = inp.aim_x, inp.aim_y
+        for act in inp.actions:
+            code, argtypes = ACTION_CODES[act[0]]
+            self._record(tick, REC_ACTION)
+            buf.append(code)
+            for t, a in zip(argtypes, act[1:]):
+                if t == 'i':
+                    _put_svarint(buf, int(a))
+                else:
+                    raw = str(a).encode('utf-8')
+                    _put_varint(buf, len(raw))
+                    buf.extend(raw)
+        if tick - self.flushed_tick >= self.FLUSH_TICKS:
+            self.flush(tick)
+
+    def flush(self, tick: int = 0):
+        if self.buf:
+            self.f.write(self.buf)
+            self.buf.clear()
+        self.f.flush()
+        self.flushed_tick = max(self.flushed_tick, tick)
+
+    def close(self, tick: int, digest: Optional[str] = None):
+        """Seal the stream with the final tick and, if known, the final state digest"""
+        self._record(max(tick, self.last_tick), REC_END)
+        raw = bytes.fromhex(digest) if digest else b''
+        self.buf.append(len(raw))
+        self.buf.extend(raw)
+        self.flush(tick)
+        self.f.close()
+
+
+class ReplayReader:
+    """Parses a replay stream; a truncated tail (crash mid-match) just ends playback early"""
+    def __init__(self, data: bytes):
+        if data[:4] != REPLAY_MAGIC:
+            raise ValueError("not a Space Arena replay")
+        if data[4] != REPLAY_VERSION:
+            raise ValueError(f"unsupported replay version {data[4]}")
+        pos = 5
+        seed, pos = _get_svarint(data, pos)
+        fields = []
+        for _ in range(4):
+            v, pos = _get_varint(data, pos)
+            fields.append(v)
+        self.header = ReplayHeader(seed, *fields)
+        self.data = data
+        self.start = pos
+        # Resume points every MARK_EVERY records: (tick, pos, buttons, aim_x, aim_y)
+        self.marks: List[Tuple[int, int, int, int, int]] = [(0, pos, 0, 0, 0)]
+        self.ticks, self.digest = self._scan()
+
+    @classmethod
+    def load(cls, path: str) -> 'ReplayReader':
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    MARK_EVERY = 64
+
+    def _records(self, pos: int = 0, tick: int = 0):
+        """(tick, tag, value, end pos) for every complete record from pos on"""
+        data = self.data
+        pos = pos or self.start
+        while pos < len(data):
+            try:
+                head, pos = _get_varint(data, pos)
+                tick += head >> 2
+                tag = head & 3
+                if tag == REC_BUTTONS:
+                    value = data[pos]; pos += 1
+                elif tag == REC_AIM:
+                    dx, pos = _get_svarint(data, pos)
+                    dy, pos = _get_svarint(data, pos)
+                    value = (dx, dy)
+                elif tag == REC_ACTION:
+                    name, argtypes = ACTIONS[data[pos]]; pos += 1
+                    act = [name]
+                    for t in argtypes:
+                        if t == 'i':
+                            a, pos = _get_svarint(data, pos)
+                        else:
+                            n, pos = _get_varint(data, pos)
+                            if pos + n > len(data):
+                                return
+                            a = data[pos:pos + n].decode('utf-8'); pos += n
+                        act.append(a)
+                    value = tuple(act)
+                else:
+                    n = data[pos]; pos += 1
+                    if pos + n > len(data):
+                        return
+                    value = data[pos:pos + n].hex() or None
+                    pos += n
+            except IndexError:
+                return
+            yield tick, tag, value, pos
+            if tag == REC_END:
+                return
+
+    def _scan(self) -> Tuple[int, Optional[str]]:
+        last = 0
+        buttons = aim_x = aim_y = 0
+        for i, (tick, tag, value, pos) in enumerate(self._records(), 1):
+            last = tick
+            if tag == REC_END:
+                return tick, value
+            if tag == REC_BUTTONS:
+                buttons = value
+            elif tag == REC_AIM:
+                aim_x += value[0]; aim_y += value[1]
+            if i % self.MARK_EVERY == 0:
+                self.marks.append((tick, pos, buttons, aim_x, aim_y))
+        return last, None
+
+    def inputs(self, start: int = 1) -> Iterator[PlayerInput]:
+        """One PlayerInput per recorded tick, from tick `start` on"""
+        # Resume from the last mark before start instead of parsing from the beginning
+        mark = self.marks[bisect.bisect_left(self.marks, (start,)) - 1]
+        base, pos, buttons, aim_x, aim_y = mark
+        actions: List[tuple] = []
+        tick = max(base, 1)
+        for rec_tick, tag, value, _ in self._records(pos, base):
+            while tick < rec_tick:
+                if tick >= start:
+                    yield PlayerInput(buttons, aim_x, aim_y, actions)
+                actions = []
+                tick += 1
+            if tag == REC_BUTTONS:
+                buttons = value
+            elif tag == REC_AIM:
+                aim_x += value[0]; aim_y += value[1]
+            elif tag == REC_ACTION:
+                actions.append(value)
+        while tick <= self.ticks:
+            if tick >= start:
+                yield PlayerInput(buttons, aim_x, aim_y, actions)
+            actions = []
+            tick += 1
+
+
+class ReplaySeeker:
+    """Keyframes of the replay being viewed; a seek restores the nearest one and re-simulates the rest"""
+    def __init__(self, game: 'Game', reader: ReplayReader):
+        self.game = game
+        self.reader = reader
+        self.keyframes: Dict[int, bytes] = {}
+        self.ticks: List[int] = []  # sorted keyframe ticks
+
+    def capture(self):
+        g = self.game
+        t = g.tick
+        if t % KEYFRAME_TICKS == 0 and t not in self.keyframes:
+            self.keyframes[t] = g.snapshot()
+            bisect.insort(self.ticks, t)
+
+    def _advance(self, target: int):
+        g = self.game
+        while g.tick < target and g.state == GameState.PLAY and g.replay is not None:
+            g.update(SIM_DT)
+            self.capture()
+
+    def seek(self, tick: int):
+        g = self.game
+        tick = clamp(tick, 0, self.reader.ticks)
+        paused = g.state == GameState.PAUSE
+        base = self.ticks[bisect.bisect_right(self.ticks, tick) - 1]
+        # Forward within reach of no newer keyframe: just keep simulating from here
+        if base <= g.tick <= tick and g.replay is not None:
+            if paused:
+                g.state = GameState.PLAY
+        else:
+            g.restore(self.keyframes[base])
+            g.replay = self.reader.inputs(base + 1)
+        g.killcam.reset()
+        self._advance(tick)
+        g.store_prev_state()
+        if paused and g.state == GameState.PLAY:
+            g.state = GameState.PAUSE
+
+    def build(self):
+        """Index the rest of the replay in one pass, then come back to the current tick"""
+        here = self.game.tick
+        self._advance(self.reader.ticks)
+        self.seek(here)
+
+
+class KillCam:
+    """Ring buffer of lightweight render frames; replays the last seconds before the player died"""
+    def __init__(self, seconds: float = KILLCAM_SECONDS, every: int = KILLCAM_EVERY):
+        self.every = every
+        self.frames: deque = deque(maxlen=int(seconds * FPS / every))
+        self.last_tick = -1  # steps that did not advance the tick (pause, menus) add nothing
+        self.clip: Optional[list] = None
+        self.pos = 0.0  # frame index into clip
+        self.victim: Optional['Ship'] = None
+        self.focus: Optional['Ship'] = None  # killer if any, else the victim
+        self.camera: Optional[Camera] = None
+
+    @property
+    def playing(self) -> bool:
+        return self.clip is not None
+
+    def reset(self):
+        self.frames.clear()
+        self.last_tick = -1
+        self.clip = None
+
+    def capture(self, game: 'Game'):
+        if game.tick % self.every or game.tick == self.last_tick:
+            return
+        self.last_tick = game.tick
+        ships = [(sh, sh.x, sh.y, sh.vx, sh.vy, sh.hp, sh.shield, sh.dead) for sh in game.ships]
+        pool = game.projectiles.bullets
+        n = min(pool.n, KILLCAM_MAX_BULLETS)
+        bullets = (pool.x[:n].copy(), pool.y[:n].copy(), pool.radius[:n].copy(), pool.color[:n].copy())
+        shots = [(color, p.x, p.y, p.radius) for kind, color in KILLCAM_COLORS.items() for p in game.projectiles[kind]]
+        beams = [(lz.segment(), lz.color) for lz in game.projectiles['laser']]
+        self.frames.append((ships, bullets, shots, beams))
+
+    def trigger(self, victim: 'Ship', killer: Optional['Ship']):
+        """Freeze the buffer into a clip; O(frames), the simulation keeps running"""
+        if not self.frames:
+            return
+        self.clip = list(self.frames)
+        self.pos = 0.0
+        self.victim = victim
+        self.focus = killer if killer is not None else victim
+
+    def advance(self, frame_dt: float):
+        if self.clip is None:
+            return
+        self.pos += frame_dt * KILLCAM_SPEED * FPS / self.every
+        if self.pos >= len(self.clip):
+            self.clip = None
+
+    def skip(self):
+        self.clip = None
+
+    def draw(self, game: 'Game', surf):
+        if self.camera is None:
+            self.camera = Camera(ARENA_W, ARENA_H)
+            self.camera.set_game_reference(game)
+        cam = self.camera
+        ships, (bx, by, br, bc), shots, beams = self.clip[min(int(self.pos), len(self.clip) - 1)]
+        fx, fy = next(((x, y) for sh, x, y, *_ in ships if sh is self.focus),
+                      next(((x, y) for sh, x, y, *_ in ships if sh is self.victim), (ARENA_W / 2, ARENA_H / 2)))
+        cam.center_on(fx, fy)
+        screen_w, screen_h = cam.get_screen_size()
+        
+        surf.fill((8, 10, 18))
+        for ob in game.obstacle_index.query(int(cam.x), int(cam.y), screen_w, screen_h):
+            ob.draw(surf, cam)
+        for cp in game.capture_points:
+            cp.draw(surf, cam)
+        for (x1, y1, x2, y2), color in beams:
+            pygame.draw.line(surf, color, (x1 - cam.x, y1 - cam.y), (x2 - cam.x, y2 - cam.y), 4)
+        if len(bx):
+            sx, sy = cam.world_to_screen_arrays(bx, by)
+            for x, y, r, c in zip(sx.tolist(), sy.tolist(), br.tolist(), bc.tolist()):
+                pygame.draw.circle(surf, c, (x, y), r)
+        for color, x, y, r in shots:
+            pygame.draw.circle(surf, color, cam.world_to_screen((x, y)), r)
+        
+        # Pose the live ship objects as they were, draw, put them back
+        saved = []
+        try:
+            for sh, x, y, vx, vy, hp, shield, dead in ships:
+                if dead:
+                    continue
+                saved.append((sh, sh.x, sh.y, sh.vx, sh.vy, sh.hp, sh.shield))
+                sh.x, sh.y, sh.vx, sh.vy, sh.hp, sh.shield = x, y, vx, vy, hp, shield
+                sh.draw(surf, cam)
+        finally:
+            for sh, x, y, vx, vy, hp, shield in saved:
+                sh.x, sh.y, sh.vx, sh.vy, sh.hp, sh.shield = x, y, vx, vy, hp, shield
+        
+        # Caption + progress
+        if self.focus is not None and self.focus is not self.victim:
+            text = f"KILL CAM — {TEAM_NAMES[self.focus.team]}"
+        else:
+            text = "KILL CAM"
+        lbl = game.mid.render(text, True, (255, 220, 200))
+        surf.blit(lbl, (screen_w // 2 - lbl.get_width() // 2, 20))
+        w = int((screen_w - 80) * min(1.0, self.pos / len(self.clip)))
+        pygame.draw.rect(surf, (200, 80, 80), (40, screen_h - 20, w, 6))
+        hint = game.font.render("любая клавиша — пропустить", True, (170, 170, 190))
+        surf.blit(hint, (screen_w // 2 - hint.get_width() // 2, screen_h - 44))
+
+
+# -----------------------------
+# Save games
+# -----------------------------
+SAVE_MAGIC = b'SASV'
+SAVE_VERSION = 2
+SAVE_DIR = 'saves'
+AUTOSAVE_FILE = 'autosave.sasv'
+QUICKSAVE_FILE = 'quicksave.sasv'
+AUTOSAVE_SECONDS = 60.0  # of simulated time
+
+# Classes stored field-by-field inside the world; ships and capture points live in
+# their own tables and everything else points at them by index
+SAVE_TYPES = {cls.__name__: cls for cls in (
+    Particle, DamageText, ScreenEffect, TrailSeg, Pickup, Obstacle, PlayerInput,
+    HomingMissile, LaserBeam, PlasmaBall, VoidProjectile, ElectricArc, GravityPulse,
+)}
+
+
+class SaveEncoder:
+    """Live objects -> JSON-ready lists/dicts; non-JSON values become one-key tagged dicts.
+
+    Tags: {"t": tuple}, {"s": set}, {"d": [[key, value], ...]}, {"r": rect},
+    {"ship": index}, {"point": index}, {"obj": [class name, fields]}, {"w": 0} for the world.
+    """
+    def __init__(self, world: 'World'):
+        self.world = world
+        self.ships: List[Ship] = list(world.ships)
+        self.ship_ids = {id(sh): i for i, sh in enumerate(self.ships)}
+        self.point_ids = {id(cp): i for i, cp in enumerate(world.capture_points)}
+
+    def ship(self, sh: Optional['Ship']):
+        if sh is None:
+            return None
+        i = self.ship_ids.get(id(sh))
+        if i is None:
+            # Already left the match (expired reinforcement) but still owns projectiles
+            i = self.ship_ids[id(sh)] = len(self.ships)
+            self.ships.append(sh)
+        return i
+
+    def value(self, v):
+        t = type(v)
+        if v is None or t is int or t is float or t is str or t is bool:
+            return v
+        if t is list:
+            return [self.value(x) for x in v]
+        if t is tuple:
+            return {'t': [self.value(x) for x in v]}
+        if t is dict:
+            return {'d': [[self.value(k), self.value(x)] for k, x in v.items()]}
+        if t is set:
+            return {'s': sorted(self.value(x) for x in v)}
+        if t is Ship:
+            return {'ship': self.ship(v)}
+        if t is CapturePoint:
+            return {'point': self.point_ids[id(v)]}
+        if t is pygame.Rect:
+            return {'r': [v.x, v.y, v.w, v.h]}
+        if v is self.world:
+            return {'w': 0}
+        if t.__name__ in SAVE_TYPES:
+            return {'obj': [t.__name__, self.fields(v)]}
+        if isinstance(v, np.generic):  # numpy scalars picked up from the bullet arrays
+            return v.item()
+        raise TypeError(f"cannot save {t.__name__}")
+
+    def fields(self, obj) -> Dict[str, Any]:
+        return {k: self.value(v) for k, v in vars(obj).items()}
+
+    def ship_table(self) -> List[Dict[str, Any]]:
+        """Encode last: the table grows while other objects are encoded"""
+        out = []
+        i = 0
+        while i < len(self.ships):  # ships may reference ships not yet in the table
+            out.append(self.fields(self.ships[i]))
+            i += 1
+        return out
+
+
+class SaveDecoder:
+    """Inverse of SaveEncoder; ship/point shells exist up front so references can point anywhere"""
+    def __init__(self, world: 'World', num_ships: int, points: List[CapturePoint]):
+        self.world = world
+        self.ships = [Ship.__new__(Ship) for _ in range(num_ships)]
+        self.points = points
+
+    def value(self, v):
+        t = type(v)
+        if t is list:
+            return [self.value(x) for x in v]
+        if t is not dict:
+            return v
+        (tag, x), = v.items()
+        if tag == 't':
+            return tuple(self.value(e) for e in x)
+        if tag == 'd':
+            return {self.value(k): self.value(e) for k, e in x}
+        if tag == 's':
+            return set(self.value(e) for e in x)
+        if tag == 'ship':
+            return self.ships[x]
+        if tag == 'point':
+            return self.points[x]
+        if tag == 'r':
+            return pygame.Rect(*x)
+        if tag == 'w':
+            return self.world
+        if tag == 'obj':
+            return self.fill(SAVE_TYPES[x[0]].__new__(SAVE_TYPES[x[0]]), x[1])
+        raise ValueError(f"unknown save tag {tag!r}")
+
+    def fill(self, obj, fields: Dict[str, Any]):
+        obj.__dict__.update((k, self.value(v)) for k, v in fields.items())
+        return obj
+
+
+def capture_save(world: 'World') -> Dict[str, Any]:
+    """Whole match as plain data; nothing in the result aliases live objects"""
+    enc = SaveEncoder(world)
+    projectiles = {}
+    for name, store in world.projectiles.stores.items():
+        if isinstance(store, BulletPool):
+            n = store.n
+            rows = {f: getattr(store, f)[:n].tolist() for f, dtype, _ in BulletPool.FIELDS if dtype is not object}
+            rows['owner'] = [enc.ship(o) for o in store.owner[:n]]
+            rows['trail_head'] = store.trail_head
+            projectiles[name] = rows
+        else:
+            projectiles[name] = [enc.value(p) for p in store]
+    cam = world.camera
+    state = {
+        'version': SAVE_VERSION,
+        'match': {'seed': world.match_seed, 'num_teams': world.num_teams, 'team_size': world.team_size,
+                  'num_obstacles': world.num_obstacles, 'human_player': world.human_player},
+        'tick': world.tick, 'sim_time': world.sim_time, 'game_duration': world.game_duration,
+        'winner': world.winner, 'dev_anti_repeat': world.dev_anti_repeat,
+        'total_kills': world.total_kills, 'total_captures': world.total_captures,
+        'team_kills': enc.value(world.team_kills), 'weapon_shots': dict(world.weapon_shots),
+        'rng': enc.value(world.rng.getstate()), 'fx_rng': enc.value(world.fx_rng.getstate()),
+        'camera': [cam.x, cam.y, cam.zoom, cam.target_zoom],
+        'input': enc.value(world.input),
+        'obstacles': [enc.fields(ob) for ob in world.obstacles],
+        'points': [enc.fields(cp) for cp in world.capture_points],
+        'pickups': [enc.fields(p) for p in world.pickups],
+        'trails': [enc.fields(tr) for tr in world.trails],
+        'dmgtexts': [enc.fields(d) for d in world.dmgtexts],
+        'projectiles': projectiles,
+        'player': enc.ship(world.player),
+    }
+    state['ships'] = enc.ship_table()
+    state['live_ships'] = len(world.ships)  # the rest are referenced only by projectiles
+    return state
+
+
+def _json_chunks(v, depth: int) -> Iterator[str]:
+    """JSON text in per-item pieces: one json.dumps over the whole world holds the GIL
+    for tens of ms, small pieces let the game thread run between them"""
+    if depth and type(v) is dict:
+        yield '{'
+        for i, (k, x) in enumerate(v.items()):
+            yield (',' if i else '') + json.dumps(k) + ':'
+            yield from _json_chunks(x, depth - 1)
+        yield '}'
+    elif depth and type(v) is list:
+        yield '['
+        for i, x in enumerate(v):
+            if i:
+                yield ','
+            yield from _json_chunks(x, depth - 1)
+        yield ']'
+    else:
+        yield json.dumps(v, separators=(',', ':'), ensure_ascii=False)
+
+
+def encode_save(state: Dict[str, Any]) -> bytes:
+    """Magic, version byte, zlib'd JSON; meant for the worker thread"""
+    z = zlib.compressobj(6)
+    out = [SAVE_MAGIC, bytes([SAVE_VERSION])]
+    for chunk in _json_chunks(state, 2):
+        out.append(z.compress(chunk.encode('utf-8')))
+    out.append(z.flush())
+    return b''.join(out)
+
+
+def decode_save(data: bytes) -> Dict[str, Any]:
+    if data[:4] != SAVE_MAGIC:
+        raise ValueError("not a Space Arena save")
+    if data[4] != SAVE_VERSION:
+        raise ValueError(f"unsupported save version {data[4]}")
+    return json.loads(zlib.decompress(data[5:]).decode('utf-8'))
+
+
+def write_save(path: str, data: bytes):
+    """Write-then-rename so a crash mid-write never leaves a broken save behind"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class AutoSaver:
+    """Periodic saves: capture on the simulation thread, encode and write on a worker thread"""
+    def __init__(self, path: str, every: float = AUTOSAVE_SECONDS):
+        self.path = path
+        self.every = every
+        self.next_at = every
+        self.thread: Optional[threading.Thread] = None
+        self.saves = 0
+        self.capture_ms = 0.0  # main-thread cost of the last save
+        self.error: Optional[str] = None
+
+    def busy(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def reset(self, sim_time: float = 0.0):
+        self.next_at = sim_time + self.every
+
+    def update(self, game: 'Game'):
+        if game.sim_time >= self.next_at and not self.busy():
+            self.save(game)
+
+    def save(self, game: 'Game', path: Optional[str] = None):
+        self.wait()
+        t0 = time.perf_counter()
+        state = capture_save(game)
+        self.capture_ms = (time.perf_counter() - t0) * 1000.0
+        self.next_at = game.sim_time + self.every
+        if game.flight:
+            game.flight.event('autosave', capture_ms=round(self.capture_ms, 2))
+        self.thread = threading.Thread(target=self._write, args=(path or self.path, state),
+                                       name='autosave', daemon=True)
+        self.thread.start()
+
+    def _write(self, path: str, state: Dict[str, Any]):
+        try:
+            write_save(path, encode_save(state))
+            self.saves += 1
+            self.error = None
+        except (OSError, TypeError, ValueError) as e:
+            self.error = f"{type(e).__name__}: {e}"
+
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
 # -----------------------------
 # UI Elements
 # -----------------------------
@@ -1756,182 +3434,532 @@ class Slider:
 
 
 # -----------------------------
-# Game Orchestrator
+# Work counters
 # -----------------------------
-class Game:
-    instance: 'Game' = None
+class WorkCounters:
+    """Work done since the last take(): collision tests, damage calls, text renders"""
+    FIELDS = ('combat_broad', 'combat_narrow', 'obstacle_broad', 'obstacle_narrow', 'damage_calls', 'font_renders',
+              'ai_plans')
 
     def __init__(self):
-        Game.instance = self
-        pygame.init()
-        pygame.display.set_caption("Space Arena — командные космобои")
-        
-        # Initialize window manager
-        self.window_manager = WindowManager()
-        
-        # Create resizable window
-        self.screen = pygame.display.set_mode((SCREEN_W, SCREEN_H), pygame.RESIZABLE)
-        self.clock = pygame.time.Clock()
-        
-        # Initialize fonts with scaling
-        self._init_fonts()
-        
-        # Update window manager with current size
-        self.window_manager.resize_window(SCREEN_W, SCREEN_H)
+        self.reset()
+
+    def reset(self):
+        self.combat_broad = 0  # projectiles looked up in the ship broadphase
+        self.combat_narrow = 0  # exact projectile/beam/trail vs ship tests
+        self.obstacle_broad = 0  # ships looked up in the obstacle index
+        self.obstacle_narrow = 0  # exact ship vs obstacle/pickup tests
+        self.damage_calls = 0
+        self.font_renders = 0
+        self.ai_plans = 0  # bot planning passes (Ship.ai_plan)
+
+    def take(self) -> Dict[str, int]:
+        out = {name: getattr(self, name) for name in self.FIELDS}
+        self.reset()
+        return out
 
-        sfx.init(); sfx.build()
-        if sfx.enabled:
-            pygame.mixer.music.set_volume(0.35)
 
-        # Settings
-        self.num_teams = 2
-        self.volume = 0.7
+class CountingFont:
+    """pygame Font whose render() calls are tallied in a WorkCounters"""
+    def __init__(self, font, counters: WorkCounters):
+        self._font = font
+        self._counters = counters
 
-        # World
-        self.camera = Camera(ARENA_W, ARENA_H)
-        self.camera.set_game_reference(self)
-        self.ships: List[Ship] = []
-        self.player: Optional[Ship] = None
-        self.obstacles: List[Obstacle] = []
-        self.capture_points: List[CapturePoint] = []
-        self.pickups: List[Pickup] = []
-        self.particles: List[Particle] = []
-        self.dmgtexts: List[DamageText] = []
-        self.trails: List[TrailSeg] = []
+    def render(self, *args, **kwargs):
+        self._counters.font_renders += 1
+        return self._font.render(*args, **kwargs)
 
-        # Projectiles/effects
-        self.bullets: List[Bullet] = []
-        self.missiles: List[HomingMissile] = []
-        self.lasers: List[LaserBeam] = []
-        self.arcs: List[ElectricArc] = []
-        self.pulses: List[GravityPulse] = []
-        self.plasma_balls: List[PlasmaBall] = []
-        self.void_projectiles: List[VoidProjectile] = []
+    def __getattr__(self, name):
+        return getattr(self._font, name)
 
-        # UI state
-        self.state = GameState.MENU
-        self.buttons: List[Button] = []
-        self.sliders: List[Slider] = []
-        self.show_upgrades = False
-        self.show_classes = False
-        self.show_stats = False
-        self.show_tutorial = False
 
-        # Game statistics
-        self.game_start_time = 0.0
-        self.game_duration = 0.0
-        self.total_kills = 0
-        self.total_captures = 0
-        self.team_scores = {i: 0 for i in range(MAX_TEAMS_LIMIT)}
+# -----------------------------
+# Garbage collection
+# -----------------------------
+GC_FREEZE = True  # move everything alive at match start out of the collector's reach
+GC_DEFER_GEN2 = False  # hold full collections for a safe point (pause, menus, respawn wait, kill cam)
+GC_MAX_DEFER = 60.0  # seconds a due full collection may wait for a safe point
 
-        # Dev helpers
-        self.dev_anti_repeat = 0.0
-        
-        # Screen effects
-        self.screen_effects: List[ScreenEffect] = []
-        
-        # Tutorial system
-        self.tutorial_step = 0
-        self.tutorial_completed = False
 
-        self.setup_menu()
+class GCManager:
+    """Process-wide GC policy and pause telemetry.
 
-    def _init_fonts(self):
-        """Initialize fonts with proper scaling"""
-        scale_x, scale_y = self.window_manager.get_scale_factors()
-        base_font_size = int(20 * min(scale_x, scale_y))
-        base_font_size = max(12, min(base_font_size, 32))  # Clamp between 12 and 32
-        
-        big_font_size = int(48 * min(scale_x, scale_y))
-        big_font_size = max(24, min(big_font_size, 72))
-        
-        mid_font_size = int(28 * min(scale_x, scale_y))
-        mid_font_size = max(16, min(mid_font_size, 48))
-        
-        self.font = pygame.font.SysFont("Segoe UI", base_font_size)
-        self.big = pygame.font.SysFont("Segoe UI Semibold", big_font_size)
-        self.mid = pygame.font.SysFont("Segoe UI", mid_font_size)
+    A gc callback times every collection; runs and pause_ns are cumulative per generation.
+    freeze() parks the long-lived heap (map, obstacles, fonts, sounds) in the permanent
+    generation so later full collections only walk what the match allocated since.
+    """
+    def __init__(self):
+        self.runs = [0, 0, 0]
+        self.pause_ns = [0, 0, 0]
+        self.max_pause_ns = 0
+        self.installed = False
+        self.deferring = False
+        self.threshold = gc.get_threshold()
+        self.due_since: Optional[float] = None
+        self._t = 0
+
+    def install(self):
+        if not self.installed:
+            gc.callbacks.append(self._callback)
+            self.installed = True
+
+    def _callback(self, phase: str, info: Dict[str, int]):
+        if phase == 'start':
+            self._t = time.perf_counter_ns()
+        else:
+            ns = time.perf_counter_ns() - self._t
+            gen = info['generation']
+            self.runs[gen] += 1
+            self.pause_ns[gen] += ns
+            if ns > self.max_pause_ns:
+                self.max_pause_ns = ns
+
+    def totals(self) -> Tuple[int, int]:
+        """(collections, pause ns) over all generations"""
+        return sum(self.runs), sum(self.pause_ns)
+
+    def freeze(self):
+        """Collect what the last match left behind, then freeze everything still alive"""
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+
+    def defer_gen2(self, on: bool):
+        """Lift the gen-2 threshold out of reach; full collections then wait for end_frame(safe=True)"""
+        t0, t1, t2 = self.threshold
+        gc.set_threshold(t0, t1, 1 << 30 if on else t2)
+        self.deferring = on
+        self.due_since = None
+
+    def end_frame(self, safe: bool):
+        """Run a deferred full collection at a safe point, or anyway once it has waited GC_MAX_DEFER"""
+        if not self.deferring or gc.get_count()[2] <= self.threshold[2]:
+            return
+        now = time.perf_counter()
+        if self.due_since is None:
+            self.due_since = now
+        if safe or now - self.due_since >= GC_MAX_DEFER:
+            gc.collect(2)
+            self.due_since = None
 
-    def _handle_resize(self, width, height):
-        """Handle window resize event"""
-        self.window_manager.resize_window(width, height)
-        self._init_fonts()
-        
-        # Recreate screen with new size
-        self.screen = pygame.display.set_mode((width, height), pygame.RESIZABLE)
-        
-        # Recreate UI elements for current state
-        if self.state == GameState.MENU:
-            self.setup_menu()
-        elif self.state == GameState.SETTINGS:
-            self.goto_settings()
+    def report(self) -> Dict[str, Any]:
+        return {'runs': list(self.runs), 'pause_ms': [round(ns / 1e6, 2) for ns in self.pause_ns],
+                'max_pause_ms': round(self.max_pause_ns / 1e6, 2), 'frozen': gc.get_freeze_count()}
 
-    # ---------- State setups ----------
-    def setup_menu(self):
-        self.buttons = []
-        cx, cy = self.window_manager.center_position(280, 54)
-        button_y_start = int(280 * self.window_manager.scale_y)
-        button_spacing = int(70 * self.window_manager.scale_y)
-        
-        self.buttons.append(Button((cx, button_y_start, 280, 54), "Играть", self.start_game))
-        self.buttons.append(Button((cx, button_y_start + button_spacing, 280, 54), "Настройки", self.goto_settings))
-        self.buttons.append(Button((cx, button_y_start + button_spacing * 2, 280, 54), "Туториал", self.show_tutorial_menu))
-        self.buttons.append(Button((cx, button_y_start + button_spacing * 3, 280, 54), "Выход", self.exit_game))
 
-    def show_tutorial_menu(self):
-        self.show_tutorial = True
-        self.state = GameState.PLAY
-        self.reset_world()
-        self.game_start_time = time.time()
-        self.game_duration = 0.0
+gc_manager = GCManager()
 
-    def goto_settings(self):
-        self.state = GameState.SETTINGS
-        self.buttons = []
-        self.sliders = []
-        cx, cy = self.window_manager.center_position(320, 50)
-        slider_cx, slider_cy = self.window_manager.center_position(400, 40)
-        
-        # Scale positions
-        back_y = int(560 * self.window_manager.scale_y)
-        slider1_y = int(200 * self.window_manager.scale_y)
-        slider2_y = int(300 * self.window_manager.scale_y)
-        
-        self.buttons.append(Button((cx, back_y, 320, 50), "Назад", self.back_to_menu))
-        self.sliders.append(Slider((slider_cx, slider1_y, 400, 40), 0.0, 1.0, self.volume))
-        self.sliders.append(Slider((slider_cx, slider2_y, 400, 40), 2, 6, self.num_teams))
-        
-        # Add SFX volume slider
-        slider3_y = int(400 * self.window_manager.scale_y)
-        self.sliders.append(Slider((slider_cx, slider3_y, 400, 40), 0.0, 1.0, sfx.sfx_volume))
 
-    def back_to_menu(self):
-        self.volume = self.sliders[0].value
-        self.num_teams = int(round(self.sliders[1].value))
-        sfx.sfx_volume = self.sliders[2].value
-        pygame.mixer.music.set_volume(self.volume if sfx.enabled else 0)
-        self.state = GameState.MENU
-        self.setup_menu()
+# -----------------------------
+# Phase timing
+# -----------------------------
+class PhaseTimer:
+    """Wall time per stage: start() restarts the clock, mark(name) books the time since the last mark.
 
-    def exit_game(self):
-        pygame.quit(); sys.exit()
+    Times accumulate until take(), so a frame can collect several ticks plus its draw.
+    """
+    def __init__(self):
+        self.times: Dict[str, float] = {}  # seconds
+        self._t = 0.0
 
-    def start_game(self):
-        self.reset_world()
+    def start(self):
+        self._t = time.perf_counter()
+
+    def mark(self, name: str):
+        t = time.perf_counter()
+        self.times[name] = self.times.get(name, 0.0) + (t - self._t)
+        self._t = t
+
+    def take(self) -> Dict[str, float]:
+        times, self.times = self.times, {}
+        return times
+
+
+PROFILER_PHASES = ('events', 'input', 'ships', 'ai', 'respawn', 'projectiles', 'effects', 'combat',
+                   'obstacles', 'capture', 'upkeep', 'killcam', 'keyframes', 'autosave', 'draw', 'hud', 'overlays',
+                   'profiler', 'flip')
+PROFILER_WINDOW = 120  # frames in the rolling averages
+PROFILER_GRAPH = 240  # frames in the frame-time graph
+PROFILER_REDRAW = 8  # frames between panel redraws; the text is unreadable at full rate anyway
+
+
+class FrameProfiler:
+    """F3 overlay: per-phase rolling averages, worst frame, work counters and a frame-time graph"""
+    def __init__(self, timer: PhaseTimer):
+        self.timer = timer  # shared with the flight recorder
+        self.frames: deque = deque(maxlen=PROFILER_GRAPH)  # (work ms, {phase: ms}, {counter: n})
+        self.panel: Optional[pygame.Surface] = None
+        self.panel_age = 0
+
+    def end_frame(self, times: Dict[str, float], counters: Dict[str, int]):
+        self.frames.append((sum(times.values()), times, counters))
+
+    def draw(self, surf, font):
+        self.panel_age += 1
+        if self.panel is None or self.panel_age >= PROFILER_REDRAW:
+            self.panel = self._render(font)
+            self.panel_age = 0
+        if self.panel is not None:
+            surf.blit(self.panel, (surf.get_width() - self.panel.get_width() - 10, 40))
+        self.timer.mark('profiler')
+
+    def _render(self, font) -> Optional[pygame.Surface]:
+        recent = list(self.frames)[-PROFILER_WINDOW:]
+        if not recent:
+            return None
+        n = len(recent)
+        worst_ms, worst, _ = max(recent, key=lambda f: f[0])
+        avg = {}
+        work_avg = {}
+        work_max = {}
+        for _, times, counters in recent:
+            for name, ms in times.items():
+                avg[name] = avg.get(name, 0.0) + ms / n
+            for name, v in counters.items():
+                work_avg[name] = work_avg.get(name, 0.0) + v / n
+                work_max[name] = max(work_max.get(name, 0), v)
+        budget = 1000.0 / FPS
+        
+        rows = [("frame ms", "avg", "worst", (255, 255, 255)),
+                ("total", f"{sum(f[0] for f in recent) / n:.2f}", f"{worst_ms:.2f}",
+                 (255, 140, 120) if worst_ms > budget else (255, 255, 255))]
+        for name in PROFILER_PHASES:
+            if name in avg:
+                color = (255, 140, 120) if worst.get(name, 0.0) > budget / 2 else (200, 210, 230)
+                rows.append((name, f"{avg[name]:.2f}", f"{worst.get(name, 0.0):.2f}", color))
+        rows.append(("per frame", "avg", "max", (255, 255, 255)))
+        for name, v in work_avg.items():
+            if work_max[name]:
+                rows.append((name, f"{v:.0f}", str(work_max[name]), (170, 200, 255)))
+        
+        gw, gh = PROFILER_GRAPH, 70
+        line_h = font.get_linesize()
+        pw, ph = gw + 16, len(rows) * line_h + gh + 24
+        panel = pygame.Surface((pw, ph), pygame.SRCALPHA)
+        panel.fill((10, 12, 20, 200))
+        for i, (name, a, w, color) in enumerate(rows):
+            y = 6 + i * line_h
+            panel.blit(font.render(name, True, color), (8, y))
+            for text, right in ((a, pw - 80), (w, pw - 10)):
+                img = font.render(text, True, color)
+                panel.blit(img, (right - img.get_width(), y))
+        
+        # Frame-time graph: one bar per frame, scaled to two frame budgets
+        gx, gy = 8, ph - gh - 8
+        pygame.draw.rect(panel, (30, 34, 48, 220), (gx, gy, gw, gh))
+        for i, (ms, _, _) in enumerate(self.frames):
+            h = min(gh, int(gh * ms / (2 * budget)))
+            color = (120, 220, 140) if ms <= budget else (255, 110, 90)
+            pygame.draw.line(panel, color, (gx + i, gy + gh - 1), (gx + i, gy + gh - h))
+        pygame.draw.line(panel, (255, 230, 120), (gx, gy + gh // 2), (gx + gw - 1, gy + gh // 2))
+        return panel
+
+
+# -----------------------------
+# Flight recorder
+# -----------------------------
+FLIGHT_FRAMES = 300  # frames kept for a post-mortem, 5 s at 60 fps
+FLIGHT_SPIKE_MS = 50.0  # frame work time that triggers a dump
+FLIGHT_COOLDOWN = 10.0  # seconds between dumps, so one bad stretch writes one file
+FLIGHT_MAX_DUMPS = 20  # per session
+FLIGHT_CRASH_FILE = 'error_flight.json'  # written next to error_log.txt when the game crashes
+
+
+class FlightRecorder:
+    """Always-on ring buffer of the last frames: phase times, entity/work counts, GC activity, events.
+
+    A frame whose work time passes threshold_ms dumps the buffer to spike_<time>_<ms>ms.json,
+    so every hitch leaves a post-mortem without the profiler running.
+    """
+    def __init__(self, threshold_ms: float = FLIGHT_SPIKE_MS, frames: int = FLIGHT_FRAMES):
+        self.timer = PhaseTimer()
+        self.threshold_ms = threshold_ms  # 0 disables dumps
+        self.frames: deque = deque(maxlen=frames)  # (frame, tick, dt ms, work ms, {phase: ms}, counts, gc, events)
+        self.events: List[Tuple[str, Dict[str, Any]]] = []  # this frame's, until end_frame()
+        self.frame = 0
+        self.dumps: List[str] = []
+        self.last_dump = -FLIGHT_COOLDOWN
+        self.context = None  # callable returning match state for the dump header
+        self.gc_seen = (list(gc_manager.runs), list(gc_manager.pause_ns))
+
+    def event(self, kind: str, **info):
+        self.events.append((kind, info))
+
+    def end_frame(self, tick: int, dt: float, work: float, times: Dict[str, float], counts: Dict[str, int]):
+        """Book one frame (dt and work in seconds, times in ms); dumps if it was a spike"""
+        runs, pause_ns = self.gc_seen
+        gc_info = {'runs': [a - b for a, b in zip(gc_manager.runs, runs)],
+                   'pause_ms': [round((a - b) / 1e6, 3) for a, b in zip(gc_manager.pause_ns, pause_ns)],
+                   'pending': gc.get_count()}
+        self.gc_seen = (list(gc_manager.runs), list(gc_manager.pause_ns))
+        self.frames.append((self.frame, tick, dt * 1000.0, work * 1000.0, times, counts, gc_info, self.events))
+        self.events = []
+        self.frame += 1
+        now = time.perf_counter()
+        if (self.threshold_ms and work * 1000.0 > self.threshold_ms and len(self.dumps) < FLIGHT_MAX_DUMPS
+                and now - self.last_dump >= FLIGHT_COOLDOWN):
+            self.last_dump = now
+            path = f"spike_{time.strftime('%Y%m%d-%H%M%S')}_{work * 1000.0:.0f}ms.json"
+            try:
+                self.dump(path)
+                self.dumps.append(path)
+            except OSError as e:
+                print(f"flight recorder: could not write {path}: {e}", file=sys.stderr)
+
+    def report(self) -> Dict[str, Any]:
+        frames = [{'frame': f, 'tick': tick, 'dt_ms': round(dt, 2), 'work_ms': round(work, 2),
+                   'unaccounted_ms': round(work - sum(times.values()), 2),
+                   'phases': {k: round(v, 3) for k, v in times.items()}, 'counts': counts, 'gc': gc_info,
+                   'events': [dict(info, kind=kind) for kind, info in events]}
+                  for f, tick, dt, work, times, counts, gc_info, events in self.frames]
+        worst = max(frames, key=lambda fr: fr['work_ms'], default=None)
+        return {'written': time.strftime('%Y-%m-%d %H:%M:%S'), 'threshold_ms': self.threshold_ms,
+                'context': self.context() if self.context else {}, 'worst_frame': worst['frame'] if worst else None, 'frames': frames}
+
+    def dump(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=1)
+
+
+# -----------------------------
+# Sampling profiler
+# -----------------------------
+PROFILE_HZ = 250  # default stack samples per second
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack from a background thread; writes Chrome trace + folded stacks.
+
+    Each sample is tagged with the innermost update()/draw phase on the stack, so a flame
+    graph splits by phase without timing hooks in the loop itself.
+    """
+    def __init__(self, hz: int = PROFILE_HZ, thread_id: Optional[int] = None):
+        self.hz = max(1, hz)
+        self.thread_id = thread_id if thread_id is not None else threading.main_thread().ident
+        self.samples: List[Tuple[float, str, int]] = []  # (perf_counter, phase, stack id)
+        self.stacks: Dict[tuple, int] = {}  # root-first code objects -> id
+        self.t0 = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._switch = sys.getswitchinterval()
+
+    @staticmethod
+    def phase_codes() -> Dict[Any, str]:
+        return {
+            World.update.__code__: 'update',
+            Ship.update.__code__: 'ships',
+            Ship.ai_update.__code__: 'ai',
+            World._update_projectiles.__code__: 'projectiles',
+            World._update_effects.__code__: 'effects',
+            World.handle_combat.__code__: 'combat',
+            World.handle_obstacles.__code__: 'obstacles',
+            World.update_capture_points.__code__: 'capture',
+            Game.handle_events.__code__: 'events',
+            Game.step.__code__: 'step',
+            KillCam.capture.__code__: 'killcam',
+            AutoSaver.update.__code__: 'autosave',
+            Game._draw_frame.__code__: 'overlays',
+            Game.draw_world.__code__: 'draw',
+            Game.draw_hud.__code__: 'hud',
+        }
+
+    def start(self) -> 'SamplingProfiler':
+        # The sampler needs the GIL at its own rate, not every 5 ms
+        sys.setswitchinterval(min(self._switch, 1.0 / self.hz))
+        self.t0 = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            sys.setswitchinterval(self._switch)
+
+    def _run(self):
+        interval = 1.0 / self.hz
+        codes = self.phase_codes()
+        tid = self.thread_id
+        stacks = self.stacks
+        samples = self.samples
+        next_t = time.perf_counter()
+        while not self._stop.is_set():
+            next_t += interval
+            delay = next_t - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_t = time.perf_counter()  # fell behind; don't burst to catch up
+            frame = sys._current_frames().get(tid)
+            if frame is None:
+                break
+            stack = []
+            phase = None
+            while frame is not None:
+                code = frame.f_code
+                stack.append(code)
+                if phase is None:
+                    phase = codes.get(code)
+                frame = frame.f_back
+            stack.reverse()
+            key = tuple(stack)
+            sid = stacks.get(key)
+            if sid is None:
+                sid = stacks[key] = len(stacks)
+            samples.append((time.perf_counter(), phase or 'other', sid))
+
+    @staticmethod
+    def _label(code) -> str:
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def folded(self) -> List[str]:
+        """flamegraph.pl / speedscope lines: phase;outer;...;inner count"""
+        by_id = {sid: stack for stack, sid in self.stacks.items()}
+        counts: Dict[Tuple[str, int], int] = {}
+        for _, phase, sid in self.samples:
+            counts[(phase, sid)] = counts.get((phase, sid), 0) + 1
+        lines = [';'.join([phase] + [self._label(c) for c in by_id[sid]]) + f" {n}"
+                 for (phase, sid), n in counts.items()]
+        lines.sort()
+        return lines
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Trace-event JSON: a phase track plus the sampled stacks merged into spans"""
+        by_id = {sid: stack for stack, sid in self.stacks.items()}
+        pid = os.getpid()
+        us = lambda t: round((t - self.t0) * 1e6, 1)
+        events: List[Dict[str, Any]] = [
+            {'ph': 'M', 'name': 'process_name', 'pid': pid, 'args': {'name': 'Space Arena'}},
+            {'ph': 'M', 'name': 'thread_name', 'pid': pid, 'tid': 1, 'args': {'name': 'phase'}},
+            {'ph': 'M', 'name': 'thread_name', 'pid': pid, 'tid': 2, 'args': {'name': 'python'}},
+        ]
+        if not self.samples:
+            return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+        def span(tid, name, start, end):
+            events.append({'ph': 'X', 'name': name, 'pid': pid, 'tid': tid,
+                           'ts': us(start), 'dur': round((end - start) * 1e6, 1)})
+
+        cur_phase, phase_start = None, 0.0
+        open_frames: List[Tuple[Any, float]] = []
+        for t, phase, sid in self.samples:
+            if phase != cur_phase:
+                if cur_phase is not None:
+                    span(1, cur_phase, phase_start, t)
+                cur_phase, phase_start = phase, t
+            stack = by_id[sid]
+            common = 0
+            while common < len(open_frames) and common < len(stack) and open_frames[common][0] is stack[common]:
+                common += 1
+            for code, start in reversed(open_frames[common:]):
+                span(2, self._label(code), start, t)
+            del open_frames[common:]
+            open_frames.extend((code, t) for code in stack[common:])
+        end = self.samples[-1][0] + 1.0 / self.hz
+        span(1, cur_phase, phase_start, end)
+        for code, start in reversed(open_frames):
+            span(2, self._label(code), start, end)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, prefix: str) -> Tuple[str, str]:
+        """Stop sampling and write <prefix>.trace.json and <prefix>.folded"""
+        self.stop()
+        os.makedirs(os.path.dirname(prefix) or '.', exist_ok=True)
+        trace_path, folded_path = prefix + '.trace.json', prefix + '.folded'
+        with open(trace_path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+        with open(folded_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.folded()) + '\n')
+        print(f"profile: {len(self.samples)} samples -> {trace_path}, {folded_path}", file=sys.stderr)
+        return trace_path, folded_path
+
+
+# -----------------------------
+# World (one arena's simulation)
+# -----------------------------
+class World:
+    """One arena: map, ships, projectiles and the match RNG streams, advanced by update().
+
+    Everything that can change a match outcome draws from rng; particles, camera shake
+    and other cosmetics draw from fx_rng, so rendering never shifts the gameplay stream.
+    Worlds share no state, so one process can step any number of them side by side.
+    """
+    def __init__(self, seed: Optional[int] = None, num_teams: int = 2, human_player: bool = False):
+        self.seed = seed  # fixed match seed; None draws a fresh one for every match
+        self.match_seed = 0
+        self.rng = random.Random()
+        self.fx_rng = random.Random()
+        self.sim_time = 0.0  # simulation clock, advanced only by update()
+        self.tick = 0  # simulated ticks this match
         self.state = GameState.PLAY
-        self.game_start_time = time.time()
+        self.human_player = human_player  # ship 0 of team 0 takes PlayerInput instead of AI
+        self.input: Optional[PlayerInput] = None  # this tick's player input, if any
+
+        # Match settings
+        self.num_teams = num_teams
+        self.team_size = TEAM_SIZE
+        self.num_obstacles = NUM_OBSTACLES
+
+        # World
+        self.camera = Camera(ARENA_W, ARENA_H)
+        self.camera.rng = self.fx_rng
+        self.ships: EntityList = EntityList()
+        self.player: Optional[Ship] = None
+        self.obstacles: List[Obstacle] = []
+        self.obstacle_index = ObstacleIndex(self.obstacles)
+        self.capture_points: List[CapturePoint] = []
+        self.pickups: EntityList = EntityList(on_remove=entity_pools.release)
+        self.particles = ParticleSystem()
+        self.dmgtexts: EntityList = EntityList(on_remove=entity_pools.release)
+        self.trails: EntityList = EntityList(on_remove=entity_pools.release)
+        self.screen_effects: EntityList = EntityList()
+
+        # Projectiles/effects
+        self.projectiles = ProjectileRegistry()
+        self.broadphase = ShipBroadphase()
+        self.targets = TargetIndex()
+        self.ai = AIScheduler(AI_PLAN_BUDGET)
+
+        # Match statistics
         self.game_duration = 0.0
+        self.total_kills = 0
+        self.total_captures = 0
+        self.team_scores = {i: 0 for i in range(MAX_TEAMS_LIMIT)}
+        self.team_kills = {i: 0 for i in range(MAX_TEAMS_LIMIT)}  # including kills by expired reinforcements
+        self.weapon_shots: Dict[str, int] = {w: 0 for w in WEAPON_TYPES}  # volleys fired per weapon
+        self.winner: Optional[int] = None
+
+        # Dev helpers
+        self.dev_anti_repeat = 0.0
+        self.phase_timer: Optional[PhaseTimer] = None  # set to time each stage of update()
+        self.flight: Optional[FlightRecorder] = None  # set to log deaths, bursts and resets for spike dumps
+        self.counters = WorkCounters()
+        self.sfx_plays_seen = sfx.plays
+        gc_manager.install()
+        self.gc_seen = gc_manager.totals()
 
     def reset_world(self):
+        # New match: reseed both RNG streams and restart the simulation clock
+        self.match_seed = self.seed if self.seed is not None else random.randrange(1 << 32)
+        self.rng.seed(self.match_seed)
+        self.fx_rng.seed(f"fx-{self.match_seed}")
+        if self.flight:
+            self.flight.event('reset_world', seed=self.match_seed, teams=self.num_teams,
+                              obstacles=self.num_obstacles)
+        self.sim_time = 0.0
+        self.game_duration = 0.0
+        self.tick = 0
+        self.input = None
+        self.total_kills = 0
+        self.team_kills = {i: 0 for i in range(MAX_TEAMS_LIMIT)}
+        self.weapon_shots = {w: 0 for w in WEAPON_TYPES}
+        
         # Clear all game objects
+        self.player = None
         self.ships.clear()
-        self.bullets.clear()
-        self.missiles.clear()
-        self.lasers.clear()
-        self.arcs.clear()
-        self.pulses.clear()
-        self.plasma_balls.clear()
-        self.void_projectiles.clear()
+        self.projectiles.clear()
         self.obstacles.clear()
         self.capture_points.clear()
         self.pickups.clear()
@@ -1945,12 +3973,12 @@ class Game:
         self.camera.target_zoom = 1.0
         
         # Obstacles random
-        for _ in range(NUM_OBSTACLES):
-            shape = random.choice(['rect', 'tri'])
-            w = random.randint(40, 120)
-            h = random.randint(40, 120)
-            x = random.randint(300, ARENA_W-300)
-            y = random.randint(300, ARENA_H-300)
+        for _ in range(self.num_obstacles):
+            shape = self.rng.choice(['rect', 'tri'])
+            w = self.rng.randint(40, 120)
+            h = self.rng.randint(40, 120)
+            x = self.rng.randint(300, ARENA_W-300)
+            y = self.rng.randint(300, ARENA_H-300)
             col = (80, 90, 110)
             self.obstacles.append(Obstacle(shape, pygame.Rect(x, y, w, h), col))
         
@@ -1959,10 +3987,13 @@ class Game:
         for rx, ry in [(80, 80), (ARENA_W-80, 80), (80, ARENA_H-80), (ARENA_W-80, ARENA_H-80)]:
             self.obstacles.append(Obstacle('circle', pygame.Rect(rx-22, ry-22, 44, 44), yellow, spiked=True, kill=True))
         for _ in range(4):
-            cx = ARENA_W//2 + random.randint(-300, 300)
-            cy = ARENA_H//2 + random.randint(-300, 300)
+            cx = ARENA_W//2 + self.rng.randint(-300, 300)
+            cy = ARENA_H//2 + self.rng.randint(-300, 300)
             self.obstacles.append(Obstacle('circle', pygame.Rect(cx-22, cy-22, 44, 44), yellow, spiked=True, kill=True))
         
+        # Obstacles never move after this point
+        self.obstacle_index = ObstacleIndex(self.obstacles)
+        
         # Capture points (more points for more teams)
         if self.num_teams <= 2:
             offsets = [(-700, -700), (700, -700), (-700, 700), (700, 700)]
@@ -1974,11 +4005,11 @@ class Game:
         
         # Ships per team
         for t in range(self.num_teams):
-            for i in range(TEAM_SIZE):
-                sx = random.uniform(SPAWN_ZONES[t].left+60, SPAWN_ZONES[t].right-60)
-                sy = random.uniform(SPAWN_ZONES[t].top+60, SPAWN_ZONES[t].bottom-60)
-                is_player = (t == 0 and i == 0)
-                ship = Ship(sx, sy, t, is_player=is_player)
+            for i in range(self.team_size):
+                sx = self.rng.uniform(SPAWN_ZONES[t].left+60, SPAWN_ZONES[t].right-60)
+                sy = self.rng.uniform(SPAWN_ZONES[t].top+60, SPAWN_ZONES[t].bottom-60)
+                is_player = (t == 0 and i == 0) and self.human_player
+                ship = Ship(self, sx, sy, t, is_player=is_player)
                 ship.set_spawn_rect(SPAWN_ZONES[t])
                 ship.unlocked['Blaster'] = True
                 ship.weapon = 0
@@ -2011,66 +4042,66 @@ class Game:
             avail.append(nid)
         return avail
 
-    # ---------- Events ----------
-    def handle_events(self):
-        for ev in pygame.event.get():
-            if ev.type == pygame.QUIT:
-                self.exit_game()
-            elif ev.type == pygame.VIDEORESIZE:
-                self._handle_resize(ev.w, ev.h)
-            if self.state in (GameState.MENU, GameState.SETTINGS):
-                for b in self.buttons:
-                    b.handle(ev)
-                if self.state == GameState.SETTINGS:
-                    for s in self.sliders:
-                        s.handle(ev)
-            elif self.state == GameState.PLAY:
-                if ev.type == pygame.KEYDOWN and ev.key == pygame.K_ESCAPE:
-                    self.state = GameState.PAUSE
-                # Dev cheats
-                if ev.type == pygame.KEYDOWN and ev.key == pygame.K_F6:
-                    self.dev_add_level(1)
-                if ev.type == pygame.KEYDOWN and ev.key == pygame.K_F7:
-                    self.dev_add_level(5)
-                if ev.type == pygame.KEYDOWN:
-                    if pygame.K_1 <= ev.key <= pygame.K_9:
-                        idx = ev.key - pygame.K_1
-                        if 0 <= idx < len(WEAPON_TYPES):
-                            wname = WEAPON_TYPES[idx]
-                            if self.player.unlocked.get(wname, False):
-                                self.player.weapon = idx
-                    if ev.key == pygame.K_r:
-                        self.use_player_reinforce()
-                    if ev.key == pygame.K_q:
-                        self.use_player_quantum()
-                    if ev.key == pygame.K_t:
-                        if self.player.can_teleport():
-                            mx, my = pygame.mouse.get_pos()
-                            self.player.use_teleport(mx + self.camera.x, my + self.camera.y)
-                    if ev.key == pygame.K_SPACE:
-                        if self.player.can_ultimate():
-                            self.player.use_ultimate()
-                    if ev.key == pygame.K_u:
-                        self.show_upgrades = not self.show_upgrades
-                    if ev.key == pygame.K_j:
-                        self.show_classes = not self.show_classes
-                    if ev.key == pygame.K_i:
-                        self.show_stats = not self.show_stats
-                    if ev.key == pygame.K_h:
-                        self.show_tutorial = not self.show_tutorial
-                    if ev.key == pygame.K_z:
-                        self.camera.set_zoom(0.8)
-                    if ev.key == pygame.K_x:
-                        self.camera.set_zoom(1.2)
-                    if ev.key == pygame.K_c:
-                        self.camera.set_zoom(1.0)
-            elif self.state == GameState.PAUSE:
-                if ev.type == pygame.KEYDOWN and ev.key == pygame.K_ESCAPE:
-                    self.state = GameState.PLAY
-            elif self.state == GameState.VICTORY:
-                if ev.type == pygame.KEYDOWN:
-                    self.state = GameState.MENU
-                    self.setup_menu()
+    # ---------- Player input ----------
+    def read_input(self) -> Optional[PlayerInput]:
+        """This tick's player input; a bare World has no devices, Game reads them or a replay"""
+        return None
+
+    def replaying(self) -> bool:
+        """Whether the player's input comes from a recording rather than live devices"""
+        return False
+
+    def on_player_death(self, victim: Ship, killer: Optional[Ship]):
+        pass
+
+    def apply_input(self, inp: PlayerInput, dt):
+        for act in inp.actions:
+            self.apply_action(act)
+        p = self.player
+        if p is None or p.dead:
+            return
+        b = inp.buttons
+        ax = (bool(b & IN_RIGHT) - bool(b & IN_LEFT)) * 900
+        ay = (bool(b & IN_DOWN) - bool(b & IN_UP)) * 900
+        p.accelerate(ax, ay, dt)
+        
+        # Shooting
+        if b & IN_FIRE:
+            p.shoot(inp.aim_x, inp.aim_y)
+        
+        # Teleport ability
+        if b & IN_TELEPORT and p.can_teleport():
+            p.use_teleport(inp.aim_x, inp.aim_y)
+        
+        # Ultimate ability
+        if b & IN_ULTIMATE and p.can_ultimate():
+            p.use_ultimate()
+
+    def apply_action(self, act: tuple):
+        name, args = act[0], act[1:]
+        p = self.player
+        if p is None:
+            return
+        if name == 'weapon':
+            idx = args[0]
+            if 0 <= idx < len(WEAPON_TYPES) and p.unlocked.get(WEAPON_TYPES[idx], False):
+                p.weapon = idx
+        elif name == 'reinforce':
+            self.use_player_reinforce()
+        elif name == 'quantum':
+            self.use_player_quantum()
+        elif name == 'teleport':
+            p.use_teleport(args[0], args[1])
+        elif name == 'ultimate':
+            p.use_ultimate()
+        elif name == 'upgrade':
+            self.apply_upgrade(p, args[0])
+        elif name == 'class':
+            if p.class_points > 0 and args[0] in self.available_class_nodes(p):
+                p.add_class_node(args[0])
+                p.class_points -= 1
+        elif name == 'dev_level':
+            self.dev_add_level(args[0])
 
     def use_player_reinforce(self):
         if self.player and self.player.can_reinforce():
@@ -2084,10 +4115,17 @@ class Game:
     def update(self, dt):
         if self.state != GameState.PLAY:
             return
+        pt = self.phase_timer
+        if pt: pt.start()
         
         # Update game time
-        if self.game_start_time > 0:
-            self.game_duration = time.time() - self.game_start_time
+        self.tick += 1
+        self.sim_time += dt
+        self.game_duration = self.sim_time
+        targets = self.targets
+        targets.build(self.ships, self.tick)
+        self.ai.schedule(self.ships, self.tick, self.player)
+        if pt: pt.mark('ai')  # the enemy index and plan schedule are AI work, not input
         
         # Update camera
         self.camera.update(dt)
@@ -2096,50 +4134,42 @@ class Game:
             self.dev_anti_repeat -= dt
         
         # Player input
-        keys = pygame.key.get_pressed()
-        mx, my = pygame.mouse.get_pos()
-        if self.player and not self.player.dead:
-            ax = (keys[pygame.K_d] - keys[pygame.K_a]) * 900
-            ay = (keys[pygame.K_s] - keys[pygame.K_w]) * 900
-            self.player.accelerate(ax, ay, dt)
-            
-            # Shooting
-            if pygame.mouse.get_pressed(num_buttons=3)[0]:
-                world_mx, world_my = mx + self.camera.x, my + self.camera.y
-                self.spawn_projectiles(self.player.shoot(world_mx, world_my))
-            
-            # Teleport ability
-            if keys[pygame.K_t] and self.player.can_teleport():
-                self.player.use_teleport(mx + self.camera.x, my + self.camera.y)
-            
-            # Ultimate ability
-            if keys[pygame.K_SPACE] and self.player.can_ultimate():
-                self.player.use_ultimate()
+        self.input = self.read_input()
+        if self.input is not None:
+            self.apply_input(self.input, dt)
+        if pt: pt.mark('input')
         
         # Update ships
         for sh in self.ships:
             if not sh.dead:
-                sh.update(dt, self)
+                sh.update(dt)
+                targets.moved(sh)
+        if pt: pt.mark('ships')
         
         # Respawn / cleanup
-        to_remove = []
         for sh in self.ships:
             if sh.dead:
                 if sh.is_reinforcement or sh.delete_me:
-                    to_remove.append(sh)
+                    self.ships.kill(sh)
                 else:
                     sh.respawn()
-        if to_remove:
-            self.ships = [s for s in self.ships if s not in to_remove]
+                    targets.moved(sh)
+        self.ships.compact()
+        if pt: pt.mark('respawn')
         
         # Update projectiles/effects
         self._update_projectiles(dt)
+        if pt: pt.mark('projectiles')
         self._update_effects(dt)
+        if pt: pt.mark('effects')
         
         # Update collisions
         self.handle_combat(dt)
+        if pt: pt.mark('combat')
         self.handle_obstacles(dt)
+        if pt: pt.mark('obstacles')
         self.update_capture_points(dt)
+        if pt: pt.mark('capture')
         
         # Update camera target
         if self.player:
@@ -2149,190 +4179,53 @@ class Game:
         self.check_victory()
         
         # Update screen effects
-        for effect in list(self.screen_effects):
-            if not effect.update(dt):
-                self.screen_effects.remove(effect)
+        for effect in self.screen_effects:
+            effect.update(dt)
+        self.screen_effects.sweep(lambda e: e.duration <= 0)
+        
+        # One compaction pass for everything tombstoned this tick
+        for lst in self.entity_lists():
+            lst.compact()
+        if pt: pt.mark('upkeep')
+
+    def entity_lists(self) -> Tuple[EntityList, ...]:
+        return (self.ships,) + self.projectiles.entity_lists() + (
+            self.pickups, self.dmgtexts, self.trails, self.screen_effects)
 
     def _update_projectiles(self, dt):
-        # Bullets
-        for b in list(self.bullets):
-            b.update(dt)
-            if b.life <= 0:
-                self.bullets.remove(b)
-        
-        # Missiles
-        for m in list(self.missiles):
-            m.update(dt, self.ships)
-            if m.life <= 0:
-                self.missiles.remove(m)
-        
-        # Lasers
-        for lz in list(self.lasers):
-            lz.update(dt)
-            if lz.time <= 0:
-                self.lasers.remove(lz)
-        
-        # Arcs
-        for arc in list(self.arcs):
-            arc.update(dt)
-            if arc.time <= 0:
-                self.arcs.remove(arc)
-        
-        # Pulses
-        for pulse in list(self.pulses):
-            pulse.update(dt, self.ships, self.bullets)
-            if pulse.time <= 0:
-                self.pulses.remove(pulse)
-        
-        # Plasma balls
-        for pb in list(self.plasma_balls):
-            pb.update(dt)
-            if pb.life <= 0:
-                self.plasma_balls.remove(pb)
-        
-        # Void projectiles
-        for vp in list(self.void_projectiles):
-            vp.update(dt)
-            if vp.life <= 0:
-                self.void_projectiles.remove(vp)
+        self.projectiles.update(dt, self)
+
+    def target_index(self) -> TargetIndex:
+        """Enemy queries for this tick; update() builds the index, callers outside it get a fresh one"""
+        if self.targets.tick != self.tick:
+            self.targets.build(self.ships, self.tick)
+        return self.targets
 
     def _update_effects(self, dt):
         # Pickups
-        for p in list(self.pickups):
+        for p in self.pickups:
             p.update(dt)
-            if p.life <= 0:
-                self.pickups.remove(p)
+        self.pickups.sweep(lambda p: p.life <= 0)
         
         # Particles
-        for prt in list(self.particles):
-            prt.update(dt)
-            if prt.life <= 0:
-                self.particles.remove(prt)
+        self.particles.update(dt)
         
         # Trails
-        for tr in list(self.trails):
+        for tr in self.trails:
             tr.update(dt)
-            if tr.life <= 0:
-                self.trails.remove(tr)
+        self.trails.sweep(lambda tr: tr.life <= 0)
         
         # Damage texts
-        for dtxt in list(self.dmgtexts):
+        for dtxt in self.dmgtexts:
             dtxt.update(dt)
-            if dtxt.life <= 0:
-                self.dmgtexts.remove(dtxt)
-
-    def spawn_projectiles(self, projs: List):
-        for p in projs:
-            if isinstance(p, Bullet):
-                self.bullets.append(p)
-            elif isinstance(p, HomingMissile):
-                self.missiles.append(p)
-            elif isinstance(p, LaserBeam):
-                self.lasers.append(p)
-            elif isinstance(p, PlasmaBall):
-                self.plasma_balls.append(p)
-            elif isinstance(p, VoidProjectile):
-                self.void_projectiles.append(p)
+        self.dmgtexts.sweep(lambda dtxt: dtxt.life <= 0)
 
     def handle_combat(self, dt):
-        # Laser: щит снимается быстрее, HP — слабее
-        for lz in self.lasers:
-            x1, y1, x2, y2 = lz.segment()
-            for sh in self.ships:
-                if sh.dead or sh.team == lz.team:
-                    continue
-                px, py = sh.x, sh.y
-                vx, vy = x2 - x1, y2 - y1
-                l2 = vx*vx + vy*vy
-                if l2 == 0: continue
-                t = max(0.0, min(1.0, ((px - x1)*vx + (py - y1)*vy) / l2))
-                projx = x1 + t*vx; projy = y1 + t*vy
-                d2 = (px - projx)**2 + (py - projy)**2
-                if d2 < (sh.size*0.7)**2:
-                    base = lz.damage * 0.9 * dt
-                    if sh.invuln <= 0:
-                        if sh.shield > 0:
-                            sh.shield = max(0.0, sh.shield - base * 1.7)
-                            sh.hp -= base * 0.25
-                        else:
-                            sh.hp -= base * 0.7
-                        sfx.play("hit")
-                        if sh.hp <= 0:
-                            sh.die(attacker=lz.owner)
-        
-        # Bullets
-        for b in list(self.bullets):
-            br = b.rect()
-            for sh in self.ships:
-                if sh.dead or sh.team == b.team:
-                    continue
-                sr = pygame.Rect(int(sh.x - sh.size*0.6), int(sh.y - sh.size*0.6), int(sh.size*1.2), int(sh.size*1.2))
-                if br.colliderect(sr):
-                    dmg = b.damage
-                    crit = False
-                    if random.random() < b.crit_chance:
-                        dmg *= 2.0; crit = True
-                    
-                    damage_type = "normal"
-                    if b.acid:
-                        sh.add_acid(dps=6.0, dur=2.2)
-                        damage_type = "acid"
-                    elif b.plasma:
-                        sh.status_burn.append((3.0, 4.0))
-                        damage_type = "plasma"
-                    elif b.void:
-                        sh.status_void.append((2.5, 3.0))
-                        damage_type = "void"
-                    
-                    sh.damage(dmg, attacker=b.owner, crit=crit, damage_type=damage_type)
-                    try: self.bullets.remove(b)
-                    except ValueError: pass
-                    break
-        
-        # Missiles
-        for m in list(self.missiles):
-            mr = m.rect()
-            hit = False
-            for sh in self.ships:
-                if sh.dead or sh.team == m.team:
-                    continue
-                sr = pygame.Rect(int(sh.x - sh.size*0.6), int(sh.y - sh.size*0.6), int(sh.size*1.2), int(sh.size*1.2))
-                if mr.colliderect(sr):
-                    sh.damage(m.damage, attacker=m.owner)
-                    hit = True
-                    break
-            if hit:
-                try: self.missiles.remove(m)
-                except ValueError: pass
-        
-        # Plasma balls
-        for pb in list(self.plasma_balls):
-            pbr = pb.rect()
-            for sh in self.ships:
-                if sh.dead or sh.team == pb.team:
-                    continue
-                sr = pygame.Rect(int(sh.x - sh.size*0.6), int(sh.y - sh.size*0.6), int(sh.size*1.2), int(sh.size*1.2))
-                if pbr.colliderect(sr):
-                    sh.damage(pb.damage, attacker=pb.owner, damage_type="plasma")
-                    sh.status_burn.append((3.0, 5.0))
-                    try: self.plasma_balls.remove(pb)
-                    except ValueError: pass
-                    break
-        
-        # Void projectiles
-        for vp in list(self.void_projectiles):
-            vpr = vp.rect()
-            for sh in self.ships:
-                if sh.dead or sh.team == vp.team:
-                    continue
-                sr = pygame.Rect(int(sh.x - sh.size*0.6), int(sh.y - sh.size*0.6), int(sh.size*1.2), int(sh.size*1.2))
-                if vpr.colliderect(sr):
-                    sh.damage(vp.damage, attacker=vp.owner, damage_type="void")
-                    sh.status_void.append((4.0, 6.0))
-                    sh.status_slow = max(sh.status_slow, 2.0)
-                    try: self.void_projectiles.remove(vp)
-                    except ValueError: pass
-                    break
+        # One hash of ship hitboxes serves every projectile kind
+        bp = self.broadphase
+        bp.build(self.ships)
+        self.projectiles.collide(self, bp, dt)
+        self.counters.combat_narrow += bp.tests + len(self.trails) * len(self.ships)
         
         # Trails damage
         for tr in self.trails:
@@ -2343,14 +4236,19 @@ class Game:
                     sh.damage(12.0 * dt, attacker=None)
 
     def handle_obstacles(self, dt):
+        counters = self.counters
         for sh in self.ships:
             if sh.dead: continue
             sr = pygame.Rect(int(sh.x - sh.size*0.5), int(sh.y - sh.size*0.5), int(sh.size), int(sh.size))
-            for ob in self.obstacles:
+            # margin covers the per-hit knockback jitter below
+            near = self.obstacle_index.query_rect(sr, margin=16)
+            counters.obstacle_broad += 1
+            counters.obstacle_narrow += len(near) + len(self.pickups)
+            for ob in near:
                 orr = ob.rect
                 collide = False
                 if ob.shape in ('rect','tri'):
-                    collide = sr.colliderect(orr)
+                    collide = ob.hits_rect(sr)
                 else:
                     cx, cy = orr.center
                     if (sh.x - cx)**2 + (sh.y - cy)**2 < (orr.w//2 + sh.size*0.4)**2:
@@ -2362,15 +4260,16 @@ class Game:
                     else:
                         base = 1.0 if speed < 180 else (2.0 if speed < 280 else (5.0 if speed < 380 else 10.0))
                         sh.damage(base, attacker=None)
-                        sh.x += random.uniform(-6, 6)
-                        sh.y += random.uniform(-6, 6)
+                        sh.x += self.rng.uniform(-6, 6)
+                        sh.y += self.rng.uniform(-6, 6)
             # Pickups
-            for p in list(self.pickups):
+            for p in self.pickups:
+                if self.pickups.is_dead(p):
+                    continue
                 if sr.colliderect(p.rect()):
                     owner = sh
                     owner.award_spheres(p.value)
-                    try: self.pickups.remove(p)
-                    except ValueError: pass
+                    self.pickups.kill(p)
 
     def update_capture_points(self, dt):
         for cp in self.capture_points:
@@ -2389,13 +4288,13 @@ class Game:
                 
                 # Victory effects
                 for _ in range(50):
-                    x = random.uniform(0, SCREEN_W)
-                    y = random.uniform(0, SCREEN_H)
-                    Game.instance.particles.append(Particle(
+                    x = self.fx_rng.uniform(0, SCREEN_W)
+                    y = self.fx_rng.uniform(0, SCREEN_H)
+                    self.particles.emit(
                         x, y,
-                        random.uniform(-100, 100), random.uniform(-100, 100),
+                        self.fx_rng.uniform(-100, 100), self.fx_rng.uniform(-100, 100),
                         2.0, TEAM_COLORS[t], 5, "spark"
-                    ))
+                    )
                 
                 # Victory screen effect
                 self.screen_effects.append(ScreenEffect("flash", 0.5, 0.3, TEAM_COLORS[t]))
@@ -2467,7 +4366,7 @@ class Game:
 
     def apply_random_upgrade(self, ship: Ship):
         pool = ['speed','firerate','damage','armor','trail','resource','crit','reinforce','quantum'] + WEAPON_TYPES
-        random.shuffle(pool)
+        self.rng.shuffle(pool)
         for k in pool:
             before = ship.upgrade_points
             self.apply_upgrade(ship, k)
@@ -2485,17 +4384,660 @@ class Game:
             need = max(1, int(math.ceil((self.player.need_spheres() - self.player.spheres_this_level) / mult)))
             self.player.award_spheres(need)
 
+    # ---------- Stepping ----------
+    def step(self):
+        """One fixed simulation tick, remembering where things were for interpolation"""
+        self.store_prev_state()
+        self.update(SIM_DT)
+
+    def _interpolated(self):
+        yield self.camera
+        yield from self.ships
+        for store in self.projectiles.moving():
+            yield from store
+
+    def store_prev_state(self):
+        for obj in self._interpolated():
+            obj.prev_x, obj.prev_y = obj.x, obj.y
+
+    def _lerp_state(self, alpha: float) -> List[Tuple[Any, float, float]]:
+        """Move the camera and moving objects to their render positions; returns what to put back"""
+        saved = []
+        for obj in self._interpolated():
+            x, y = obj.x, obj.y
+            saved.append((obj, x, y))
+            obj.x = obj.prev_x + (x - obj.prev_x) * alpha
+            obj.y = obj.prev_y + (y - obj.prev_y) * alpha
+        return saved
+
+    def simulate(self, ticks: int, dt: float = 1.0 / FPS) -> Dict[str, Any]:
+        """Run a fresh match with a fixed dt, unthrottled, for N ticks or until victory"""
+        self.reset_world()
+        self.state = GameState.PLAY
+        self.winner = None
+        return self.run_ticks(ticks, dt)
+
+    def run_ticks(self, ticks: int, dt: float = 1.0 / FPS) -> Dict[str, Any]:
+        """Continue the current match unthrottled for N ticks or until victory"""
+        done = 0
+        totals: Dict[str, int] = {}
+        peaks: Dict[str, int] = {}
+        self.take_counters()
+        t0 = time.perf_counter()
+        while done < ticks and self.state == GameState.PLAY:
+            self.update(dt)
+            done += 1
+            for name, v in self.take_counters().items():
+                totals[name] = totals.get(name, 0) + v
+                if v > peaks.get(name, 0):
+                    peaks[name] = v
+        wall = time.perf_counter() - t0
+        result = self.match_result(done, wall)
+        result['work'] = {name: {'mean': round(v / max(1, done), 2), 'max': peaks.get(name, 0)}
+                          for name, v in totals.items()}
+        return result
+
+    # ---------- Counters ----------
+    def entity_counts(self) -> Dict[str, int]:
+        """Live entities by kind"""
+        stores = self.projectiles.stores
+        return {
+            'ships': sum(1 for sh in self.ships if not sh.dead),
+            'bullets': stores['bullet'].n,
+            'missiles': len(stores['missile']),
+            'lasers': len(stores['laser']),
+            'arcs': len(stores['arc']),
+            'pulses': len(stores['pulse']),
+            'plasma': len(stores['plasma']),
+            'void': len(stores['void']),
+            'particles': self.particles.n,
+            'trails': len(self.trails),
+            'dmgtexts': len(self.dmgtexts),
+            'pickups': len(self.pickups),
+        }
+
+    def take_counters(self) -> Dict[str, int]:
+        """Entities alive now, plus the work done since the last call (sfx plays and GC are process-wide)"""
+        out = self.entity_counts()
+        out.update(self.counters.take())
+        out['sfx_plays'] = sfx.plays - self.sfx_plays_seen
+        self.sfx_plays_seen = sfx.plays
+        out['target_tests'] = self.targets.tests
+        self.targets.tests = 0
+        out['ai_deferred'] = self.ai.deferred
+        self.ai.deferred = 0
+        runs, pause_ns = gc_manager.totals()
+        out['gc_runs'] = runs - self.gc_seen[0]
+        out['gc_us'] = (pause_ns - self.gc_seen[1]) // 1000
+        self.gc_seen = (runs, pause_ns)
+        return out
+
+    def match_result(self, ticks: int, wall: float) -> Dict[str, Any]:
+        """Summary of the current match for headless reports"""
+        owners = {t: 0 for t in range(self.num_teams)}
+        for cp in self.capture_points:
+            if cp.owner is not None and cp.owner < self.num_teams:
+                owners[cp.owner] += 1
+        scores = {t: 0 for t in range(self.num_teams)}
+        for sh in self.ships:
+            if sh.team in scores:
+                scores[sh.team] += sh.score
+        return {
+            'ticks': ticks,
+            'sim_seconds': round(self.game_duration, 3),
+            'wall_seconds': round(wall, 3),
+            'ticks_per_sec': round(ticks / wall, 1) if wall > 0 else None,
+            'realtime_factor': round(self.game_duration / wall, 1) if wall > 0 else None,
+            'winner': self.winner,
+            'winner_name': TEAM_NAMES[self.winner] if self.winner is not None else None,
+            'points_owned': owners,
+            'team_scores': scores,
+            'ships_alive': sum(1 for sh in self.ships if not sh.dead),
+            'kills': {t: self.team_kills[t] for t in range(self.num_teams)},
+            'weapon_usage': {w: n for w, n in self.weapon_shots.items() if n},
+            'pools': entity_pools.stats(),
+            'seed': self.match_seed,
+            'digest': self.state_digest(),
+        }
+
+    def state_digest(self) -> str:
+        """sha1 of the simulation state; same seed and inputs must give the same digest"""
+        h = hashlib.sha1()
+        h.update(repr((self.match_seed, self.sim_time, self.winner)).encode())
+        for sh in self.ships:
+            h.update(repr((sh.team, sh.x, sh.y, sh.vx, sh.vy, sh.hp, sh.shield, sh.level, sh.score,
+                           sh.dead, sorted(sh.class_nodes))).encode())
+        for cp in self.capture_points:
+            h.update(repr((cp.owner, sorted(cp.progress.items()))).encode())
+        for p in self.pickups:
+            h.update(repr((p.x, p.y, p.value, p.life)).encode())
+        pool = self.projectiles.bullets
+        for arr in (pool.x, pool.y, pool.vx, pool.vy, pool.life):
+            h.update(arr[:pool.n].tobytes())
+        h.update(repr(sorted(self.projectiles.counts().items())).encode())
+        for store in self.projectiles.moving():
+            h.update(repr([(p.x, p.y) for p in store]).encode())
+        h.update(repr(self.rng.getstate()).encode())
+        return h.hexdigest()
+
+    # ---------- Snapshots ----------
+    def snapshot(self) -> bytes:
+        """Full simulation state between ticks (obstacles are static and excluded), pickled + zlib"""
+        cam = self.camera
+        state = {
+            'tick': self.tick, 'sim_time': self.sim_time, 'game_duration': self.game_duration,
+            'winner': self.winner, 'dev_anti_repeat': self.dev_anti_repeat,
+            'rng': self.rng.getstate(), 'fx_rng': self.fx_rng.getstate(),
+            'ships': list(self.ships), 'player': self.player,
+            'capture_points': self.capture_points,
+            'pickups': list(self.pickups), 'trails': list(self.trails), 'dmgtexts': list(self.dmgtexts),
+            'screen_effects': list(self.screen_effects),
+            'projectiles': self.projectiles.snapshot(), 'particles': self.particles.snapshot(),
+            'camera': (cam.x, cam.y, cam.zoom, cam.target_zoom, cam.shake_time, cam.shake_intensity),
+            'input': self.input,
+        }
+        buf = io.BytesIO()
+        pk = pickle.Pickler(buf, pickle.HIGHEST_PROTOCOL)
+        pk.persistent_id = lambda obj: 0 if obj is self else None  # ships point back at their world
+        pk.dump(state)
+        return zlib.compress(buf.getvalue(), 1)
+
+    def restore(self, blob: bytes):
+        """Inverse of snapshot(); the world must belong to the same match (same seed and map)"""
+        up = pickle.Unpickler(io.BytesIO(zlib.decompress(blob)))
+        up.persistent_load = lambda pid: self
+        st = up.load()
+        self.tick, self.sim_time, self.game_duration = st['tick'], st['sim_time'], st['game_duration']
+        self.winner, self.dev_anti_repeat = st['winner'], st['dev_anti_repeat']
+        self.state = GameState.VICTORY if self.winner is not None else GameState.PLAY
+        self.rng.setstate(st['rng'])
+        self.fx_rng.setstate(st['fx_rng'])
+        for lst, key in ((self.ships, 'ships'), (self.pickups, 'pickups'), (self.trails, 'trails'),
+                         (self.dmgtexts, 'dmgtexts'), (self.screen_effects, 'screen_effects')):
+            lst.clear()
+            lst.extend(st[key])
+        self.player = st['player']
+        self.capture_points[:] = st['capture_points']
+        self.projectiles.restore(st['projectiles'])
+        self.particles.restore(st['particles'])
+        cam = self.camera
+        cam.x, cam.y, cam.zoom, cam.target_zoom, cam.shake_time, cam.shake_intensity = st['camera']
+        self.input = st['input']
+        self.store_prev_state()
+
+    # ---------- Save games ----------
+    def save_game(self, path: str):
+        """Synchronous save (tools, tests); the game itself saves through the autosaver"""
+        write_save(path, encode_save(capture_save(self)))
+
+    def load_game(self, path: str):
+        with open(path, 'rb') as f:
+            self.apply_save(decode_save(f.read()))
+
+    def apply_save(self, st: Dict[str, Any]):
+        """Rebuild the live world from capture_save() data and continue the match"""
+        if st.get('version') != SAVE_VERSION:
+            raise ValueError(f"unsupported save version {st.get('version')}")
+        m = st['match']
+        self.match_seed = m['seed']
+        self.num_teams = m['num_teams']
+        self.team_size = m['team_size']
+        self.num_obstacles = m['num_obstacles']
+        self.human_player = m['human_player']
+        self.tick, self.sim_time, self.game_duration = st['tick'], st['sim_time'], st['game_duration']
+        self.winner, self.dev_anti_repeat = st['winner'], st['dev_anti_repeat']
+        self.total_kills, self.total_captures = st['total_kills'], st['total_captures']
+        self.weapon_shots = dict(st['weapon_shots'])
+        
+        self.ships.clear()
+        self.projectiles.clear()
+        self.obstacles.clear()
+        self.capture_points.clear()
+        self.pickups.clear()
+        self.particles.clear()
+        self.dmgtexts.clear()
+        self.trails.clear()
+        self.screen_effects.clear()
+        
+        # Shells first, so references between ships, points and projectiles resolve in any order
+        points = [CapturePoint.__new__(CapturePoint) for _ in st['points']]
+        dec = SaveDecoder(self, len(st['ships']), points)
+        self.team_kills = dec.value(st['team_kills'])
+        for cp, fields in zip(points, st['points']):
+            dec.fill(cp, fields)
+        for sh, fields in zip(dec.ships, st['ships']):
+            dec.fill(sh, fields)
+        self.capture_points.extend(points)
+        self.ships.extend(dec.ships[:st['live_ships']])
+        self.player = dec.ships[st['player']] if st['player'] is not None else None
+        self.obstacles.extend(dec.fill(Obstacle.__new__(Obstacle), f) for f in st['obstacles'])
+        self.obstacle_index = ObstacleIndex(self.obstacles)
+        self.pickups.extend(dec.fill(Pickup.__new__(Pickup), f) for f in st['pickups'])
+        self.trails.extend(dec.fill(TrailSeg.__new__(TrailSeg), f) for f in st['trails'])
+        self.dmgtexts.extend(dec.fill(DamageText.__new__(DamageText), f) for f in st['dmgtexts'])
+        for name, items in st['projectiles'].items():
+            store = self.projectiles[name]
+            if isinstance(store, BulletPool):
+                k = len(items['x'])
+                store.reserve(k)
+                for f, dtype, _ in BulletPool.FIELDS:
+                    if dtype is not object and k:
+                        getattr(store, f)[:k] = items[f]
+                for i, o in enumerate(items['owner']):
+                    store.owner[i] = dec.ships[o] if o is not None else None
+                store.n = k
+                store.trail_head = items['trail_head']
+            else:
+                store.extend(dec.value(p) for p in items)
+        
+        self.rng.setstate(dec.value(st['rng']))
+        self.fx_rng.setstate(dec.value(st['fx_rng']))
+        self.input = dec.value(st['input'])
+        cam = self.camera
+        cam.x, cam.y, cam.zoom, cam.target_zoom = st['camera']
+        cam.shake_time = cam.shake_intensity = 0.0
+        self.state = GameState.VICTORY if self.winner is not None else GameState.PLAY
+        self.store_prev_state()
+
+
+# -----------------------------
+# Game Orchestrator
+# -----------------------------
+class Game(World):
+    """Window, menus, HUD, player devices, replays and saves around one World"""
+    def __init__(self, headless: bool = False, seed: Optional[int] = None):
+        super().__init__(seed=seed, human_player=not headless)
+        # Headless: no window, fonts, mixer or input devices — simulation only
+        self.headless = headless
+        
+        # Player input: gathered per tick from devices or a replay, optionally recorded
+        self.pending_actions: List[tuple] = []
+        self.replay: Optional[Iterator[PlayerInput]] = None
+        self.replay_end = 0  # last recorded tick
+        self.replay_reader: Optional[ReplayReader] = None
+        self.seeker: Optional[ReplaySeeker] = None
+        self.killcam = KillCam()
+        self.killcam_enabled = not headless
+        self.recorder: Optional[ReplayWriter] = None
+        self.record_dir: Optional[str] = None
+        
+        # Save games: periodic autosave in the windowed game, F5/F9 quick save/load
+        self.autosaver: Optional[AutoSaver] = None if headless else AutoSaver(os.path.join(SAVE_DIR, AUTOSAVE_FILE))
+        self.save_note = ""
+        self.save_note_until = 0.0
+        
+        # Initialize window manager
+        self.window_manager = WindowManager()
+        
+        if headless:
+            self.screen = None
+            self.clock = None
+            self.font = self.big = self.mid = None
+        else:
+            pygame.init()
+            pygame.display.set_caption("Space Arena — командные космобои")
+            
+            # Create resizable window
+            self.screen = pygame.display.set_mode((SCREEN_W, SCREEN_H), pygame.RESIZABLE)
+            self.clock = pygame.time.Clock()
+            
+            # Initialize fonts with scaling
+            self._init_fonts()
+        
+        # Update window manager with current size
+        self.window_manager.resize_window(SCREEN_W, SCREEN_H)
+
+        if not headless:
+            sfx.init(); sfx.build()
+            if sfx.enabled:
+                pygame.mixer.music.set_volume(0.35)
+
+        # Settings
+        self.volume = 0.7
+        self.camera.set_game_reference(self)
+        self.render_lag = 0.0  # seconds of the current tick not yet simulated, for pool extrapolation
+
+        # UI state
+        self.state = GameState.MENU
+        self.buttons: List[Button] = []
+        self.sliders: List[Slider] = []
+        self.show_upgrades = False
+        self.show_classes = False
+        self.show_stats = False
+        self.show_tutorial = False
+        self.profiler: Optional[FrameProfiler] = None  # F3
+        self.gc_freeze = GC_FREEZE and not headless
+        if not headless:
+            self.flight = FlightRecorder()
+            self.flight.context = self.flight_context
+            self.phase_timer = self.flight.timer
+
+        # Tutorial system
+        self.tutorial_step = 0
+        self.tutorial_completed = False
+
+        self.setup_menu()
+
+    def _init_fonts(self):
+        """Initialize fonts with proper scaling"""
+        scale_x, scale_y = self.window_manager.get_scale_factors()
+        base_font_size = int(20 * min(scale_x, scale_y))
+        base_font_size = max(12, min(base_font_size, 32))  # Clamp between 12 and 32
+        
+        big_font_size = int(48 * min(scale_x, scale_y))
+        big_font_size = max(24, min(big_font_size, 72))
+        
+        mid_font_size = int(28 * min(scale_x, scale_y))
+        mid_font_size = max(16, min(mid_font_size, 48))
+        
+        self.font = CountingFont(pygame.font.SysFont("Segoe UI", base_font_size), self.counters)
+        self.big = CountingFont(pygame.font.SysFont("Segoe UI Semibold", big_font_size), self.counters)
+        self.mid = CountingFont(pygame.font.SysFont("Segoe UI", mid_font_size), self.counters)
+
+    def _handle_resize(self, width, height):
+        """Handle window resize event"""
+        self.window_manager.resize_window(width, height)
+        self._init_fonts()
+        
+        # Recreate screen with new size
+        self.screen = pygame.display.set_mode((width, height), pygame.RESIZABLE)
+        
+        # Recreate UI elements for current state
+        if self.state == GameState.MENU:
+            self.setup_menu()
+        elif self.state == GameState.SETTINGS:
+            self.goto_settings()
+
+    # ---------- State setups ----------
+    def setup_menu(self):
+        self.buttons = []
+        cx, cy = self.window_manager.center_position(280, 54)
+        button_y_start = int(280 * self.window_manager.scale_y)
+        button_spacing = int(70 * self.window_manager.scale_y)
+        
+        self.buttons.append(Button((cx, button_y_start, 280, 54), "Играть", self.start_game))
+        self.buttons.append(Button((cx, button_y_start + button_spacing, 280, 54), "Настройки", self.goto_settings))
+        self.buttons.append(Button((cx, button_y_start + button_spacing * 2, 280, 54), "Туториал", self.show_tutorial_menu))
+        self.buttons.append(Button((cx, button_y_start + button_spacing * 3, 280, 54), "Выход", self.exit_game))
+
+    def show_tutorial_menu(self):
+        self.show_tutorial = True
+        self.state = GameState.PLAY
+        self.reset_world()
+
+    def goto_settings(self):
+        self.state = GameState.SETTINGS
+        self.buttons = []
+        self.sliders = []
+        cx, cy = self.window_manager.center_position(320, 50)
+        slider_cx, slider_cy = self.window_manager.center_position(400, 40)
+        
+        # Scale positions
+        back_y = int(560 * self.window_manager.scale_y)
+        slider1_y = int(200 * self.window_manager.scale_y)
+        slider2_y = int(300 * self.window_manager.scale_y)
+        
+        self.buttons.append(Button((cx, back_y, 320, 50), "Назад", self.back_to_menu))
+        self.sliders.append(Slider((slider_cx, slider1_y, 400, 40), 0.0, 1.0, self.volume))
+        self.sliders.append(Slider((slider_cx, slider2_y, 400, 40), 2, 6, self.num_teams))
+        
+        # Add SFX volume slider
+        slider3_y = int(400 * self.window_manager.scale_y)
+        self.sliders.append(Slider((slider_cx, slider3_y, 400, 40), 0.0, 1.0, sfx.sfx_volume))
+
+    def back_to_menu(self):
+        self.volume = self.sliders[0].value
+        self.num_teams = int(round(self.sliders[1].value))
+        sfx.sfx_volume = self.sliders[2].value
+        pygame.mixer.music.set_volume(self.volume if sfx.enabled else 0)
+        self.state = GameState.MENU
+        self.setup_menu()
+
+    def exit_game(self):
+        self.stop_recording()
+        if self.autosaver is not None:
+            self.autosaver.wait()
+        pygame.quit(); sys.exit()
+
+    def start_game(self):
+        self.reset_world()
+        self.state = GameState.PLAY
+
+    def reset_world(self):
+        self.pending_actions.clear()
+        self.stop_recording()
+        super().reset_world()
+        if self.record_dir and self.replay is None:
+            name = f"match_{time.strftime('%Y%m%d-%H%M%S')}_{self.match_seed}.sarp"
+            self.recorder = ReplayWriter.create(os.path.join(self.record_dir, name), self.replay_header())
+        
+        self.killcam.reset()
+        if self.autosaver is not None:
+            self.autosaver.reset()
+        if self.replay is not None:
+            self.seeker = ReplaySeeker(self, self.replay_reader)
+            self.seeker.capture()
+        else:
+            self.replay_reader = self.seeker = None
+        if self.gc_freeze:
+            self.freeze_heap()
+
+    def freeze_heap(self):
+        """Match start/load: the map, fonts and sounds are here to stay, keep later collections off them"""
+        t0 = time.perf_counter()
+        gc_manager.freeze()
+        if self.flight:
+            self.flight.event('gc_freeze', ms=round((time.perf_counter() - t0) * 1000.0, 2),
+                              frozen=gc.get_freeze_count())
+
+    def gc_safe_point(self) -> bool:
+        """Nobody is watching the action: menus, pause, victory, the kill cam or the respawn wait"""
+        return (self.state != GameState.PLAY or self.killcam.playing
+                or (self.player is not None and self.player.dead))
+
+    # ---------- Events ----------
+    def handle_events(self):
+        for ev in pygame.event.get():
+            if ev.type == pygame.QUIT:
+                self.exit_game()
+            elif ev.type == pygame.VIDEORESIZE:
+                self._handle_resize(ev.w, ev.h)
+            elif ev.type == pygame.KEYDOWN and ev.key == pygame.K_F3:
+                self.toggle_profiler()
+                continue
+            if self.killcam.playing and ev.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
+                self.killcam.skip()
+                continue
+            if self.seeker is not None and ev.type == pygame.KEYDOWN and ev.key in REPLAY_SEEK_KEYS:
+                self.seeker.seek(self.tick + REPLAY_SEEK_KEYS[ev.key])
+                continue
+            if self.state in (GameState.MENU, GameState.SETTINGS):
+                for b in self.buttons:
+                    b.handle(ev)
+                if self.state == GameState.SETTINGS:
+                    for s in self.sliders:
+                        s.handle(ev)
+            elif self.state == GameState.PLAY:
+                if ev.type == pygame.KEYDOWN and ev.key == pygame.K_ESCAPE:
+                    self.state = GameState.PAUSE
+                # Dev cheats
+                if ev.type == pygame.KEYDOWN and ev.key == pygame.K_F6:
+                    self.queue_action('dev_level', 1)
+                if ev.type == pygame.KEYDOWN and ev.key == pygame.K_F7:
+                    self.queue_action('dev_level', 5)
+                # Quick save / load
+                if ev.type == pygame.KEYDOWN and ev.key == pygame.K_F5:
+                    self.quick_save()
+                if ev.type == pygame.KEYDOWN and ev.key == pygame.K_F9:
+                    self.quick_load()
+                if ev.type == pygame.KEYDOWN:
+                    if pygame.K_1 <= ev.key <= pygame.K_9:
+                        self.queue_action('weapon', ev.key - pygame.K_1)
+                    if ev.key == pygame.K_r:
+                        self.queue_action('reinforce')
+                    if ev.key == pygame.K_q:
+                        self.queue_action('quantum')
+                    if ev.key == pygame.K_t:
+                        mx, my = pygame.mouse.get_pos()
+                        self.queue_action('teleport', int(mx + self.camera.x), int(my + self.camera.y))
+                    if ev.key == pygame.K_SPACE:
+                        self.queue_action('ultimate')
+                    if ev.key == pygame.K_u:
+                        self.show_upgrades = not self.show_upgrades
+                    if ev.key == pygame.K_j:
+                        self.show_classes = not self.show_classes
+                    if ev.key == pygame.K_i:
+                        self.show_stats = not self.show_stats
+                    if ev.key == pygame.K_h:
+                        self.show_tutorial = not self.show_tutorial
+                    if ev.key == pygame.K_z:
+                        self.camera.set_zoom(0.8)
+                    if ev.key == pygame.K_x:
+                        self.camera.set_zoom(1.2)
+                    if ev.key == pygame.K_c:
+                        self.camera.set_zoom(1.0)
+            elif self.state == GameState.PAUSE:
+                if ev.type == pygame.KEYDOWN and ev.key == pygame.K_ESCAPE:
+                    self.state = GameState.PLAY
+            elif self.state == GameState.VICTORY:
+                if ev.type == pygame.KEYDOWN:
+                    self.state = GameState.MENU
+                    self.setup_menu()
+
+    def toggle_profiler(self):
+        self.profiler = None if self.profiler else FrameProfiler(self.flight.timer)
+
+    # ---------- Player input ----------
+    def queue_action(self, name: str, *args):
+        """One-shot player action, applied at the start of the next tick (ignored while a replay drives the player)"""
+        if self.replay is None:
+            self.pending_actions.append((name, *args))
+
+    def poll_input(self) -> PlayerInput:
+        keys = pygame.key.get_pressed()
+        buttons = 0
+        for key, bit in INPUT_KEYS:
+            if keys[key]:
+                buttons |= bit
+        if pygame.mouse.get_pressed(num_buttons=3)[0]:
+            buttons |= IN_FIRE
+        # Aim only matters while firing/teleporting; keeping it otherwise keeps replays small
+        if buttons & (IN_FIRE | IN_TELEPORT) or self.input is None:
+            mx, my = pygame.mouse.get_pos()
+            aim_x, aim_y = int(mx + self.camera.x), int(my + self.camera.y)
+        else:
+            aim_x, aim_y = self.input.aim_x, self.input.aim_y
+        actions, self.pending_actions = self.pending_actions, []
+        return PlayerInput(buttons, aim_x, aim_y, actions)
+
+    def read_input(self) -> Optional[PlayerInput]:
+        """This tick's player input, from the replay being played or from devices"""
+        if self.replay is not None:
+            inp = next(self.replay, None)
+            if inp is None or self.tick >= self.replay_end:
+                self.replay = None  # recording exhausted; live input takes over
+        elif self.player is not None and not self.headless:
+            inp = self.poll_input()
+        else:
+            return None
+        if inp is not None and self.recorder is not None:
+            self.recorder.write(self.tick, inp)
+        return inp
+
+    def replaying(self) -> bool:
+        return self.replay is not None
+
+    def on_player_death(self, victim: Ship, killer: Optional[Ship]):
+        self.killcam.trigger(victim, killer)
+
+    # ---------- Replays ----------
+    def replay_header(self) -> ReplayHeader:
+        return ReplayHeader(self.match_seed, self.num_teams, self.team_size, self.num_obstacles)
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close(self.tick, self.state_digest())
+            self.recorder = None
+
+    def load_replay(self, path: str) -> ReplayReader:
+        """Set up the next match to re-run a recording; the caller then resets the world"""
+        reader = ReplayReader.load(path)
+        h = reader.header
+        if h.hz != FPS:
+            raise ValueError(f"replay recorded at {h.hz} Hz, simulation runs at {FPS} Hz")
+        self.seed = h.seed
+        self.num_teams = h.num_teams
+        self.team_size = h.team_size
+        self.num_obstacles = h.num_obstacles
+        self.human_player = True
+        self.replay = reader.inputs()
+        self.replay_end = reader.ticks
+        self.replay_reader = reader
+        return reader
+
+    # ---------- Save games ----------
+    def quick_save(self):
+        if self.autosaver is None or self.replay_reader is not None:
+            return
+        self.autosaver.save(self, os.path.join(SAVE_DIR, QUICKSAVE_FILE))
+        self.note_save("Сохранено")
+
+    def quick_load(self):
+        path = os.path.join(SAVE_DIR, QUICKSAVE_FILE)
+        if self.autosaver is not None:
+            self.autosaver.wait()
+        try:
+            self.load_game(path)
+        except (OSError, ValueError) as e:
+            self.note_save(f"Не удалось загрузить: {e}")
+            return
+        self.note_save("Загружено")
+
+    def note_save(self, text: str):
+        self.save_note = text
+        self.save_note_until = time.time() + 2.0
+
+    def apply_save(self, st: Dict[str, Any]):
+        self.stop_recording()
+        self.replay = None
+        self.replay_reader = self.seeker = None
+        self.pending_actions.clear()
+        super().apply_save(st)
+        self.killcam.reset()
+        if self.autosaver is not None:
+            self.autosaver.reset(self.sim_time)
+        if self.flight:
+            self.flight.event('load_save', tick=self.tick, ships=len(self.ships))
+        if self.gc_freeze:
+            self.freeze_heap()
+
     # ---------- Draw ----------
-    def draw(self):
+    def draw(self, alpha: float = 1.0):
+        """alpha: how far (0..1) real time has got between the last two simulation ticks"""
+        self.render_lag = (1.0 - alpha) * SIM_DT
+        saved = self._lerp_state(alpha) if alpha < 1.0 else []
+        try:
+            self._draw_frame()
+        finally:
+            for obj, x, y in saved:
+                obj.x, obj.y = x, y
+
+    def _draw_frame(self):
+        pt = self.phase_timer
+        if pt: pt.start()
         self.screen.fill((12, 14, 22))
         if self.state == GameState.MENU:
             self.draw_title()
             [b.draw(self.screen, self.mid) for b in self.buttons]
         elif self.state == GameState.SETTINGS:
             self.draw_settings()
+        elif self.state in (GameState.PLAY, GameState.PAUSE, GameState.VICTORY) and self.killcam.playing:
+            self.killcam.draw(self, self.screen)
         elif self.state in (GameState.PLAY, GameState.PAUSE, GameState.VICTORY):
             self.draw_world()
+            if pt: pt.mark('draw')
             self.draw_hud()
+            if pt: pt.mark('hud')
             if self.state == GameState.PAUSE:
                 self.draw_pause()
             if self.state == GameState.VICTORY:
@@ -2504,7 +5046,11 @@ class Game:
                 self.draw_stats_overlay()
             if self.show_tutorial:
                 self.draw_tutorial_overlay()
+        if pt: pt.mark('overlays')
+        if self.profiler:
+            self.profiler.draw(self.screen, self.font)
         pygame.display.flip()
+        if pt: pt.mark('flip')
 
     def draw_title(self):
         title = self.big.render("SPACE ARENA", True, (255,255,255))
@@ -2572,31 +5118,18 @@ class Game:
             cp.draw(self.screen, self.camera)
         
         # Obstacles & effects
-        for ob in self.obstacles:
+        view = (int(self.camera.x), int(self.camera.y), screen_w, screen_h)
+        for ob in self.obstacle_index.query(*view):
             if self.camera.rect_on_screen(ob.rect):
                 ob.draw(self.screen, self.camera)
         
         # Particles and trails
-        for prt in self.particles:
-            prt.draw(self.screen, self.camera)
+        self.particles.draw(self.screen, self.camera, self.render_lag)
         for tr in self.trails:
             tr.draw(self.screen, self.camera)
         
         # Projectiles
-        for arc in self.arcs:
-            arc.draw(self.screen, self.camera)
-        for pulse in self.pulses:
-            pulse.draw(self.screen, self.camera)
-        for lz in self.lasers:
-            lz.draw(self.screen, self.camera)
-        for b in self.bullets:
-            b.draw(self.screen, self.camera)
-        for m in self.missiles:
-            m.draw(self.screen, self.camera)
-        for pb in self.plasma_balls:
-            pb.draw(self.screen, self.camera)
-        for vp in self.void_projectiles:
-            vp.draw(self.screen, self.camera)
+        self.projectiles.draw(self.screen, self.camera, self.render_lag)
         
         # Ships & pickups
         for sh in self.ships:
@@ -2670,9 +5203,7 @@ class Game:
             for i in range(len(WEAPON_TYPES)):
                 r = pygame.Rect(wx + i*70, wy, 65, 50)
                 if r.collidepoint((mx,my)):
-                    name = WEAPON_TYPES[i]
-                    if self.player.unlocked.get(name, False):
-                        self.player.weapon = i
+                    self.queue_action('weapon', i)
         # Abilities buttons
         ax = int(30 * self.window_manager.scale_x)
         ay = int((self.window_manager.current_height - 80) * self.window_manager.scale_y)
@@ -2705,15 +5236,15 @@ class Game:
         if pygame.mouse.get_pressed()[0]:
             mx, my = pygame.mouse.get_pos()
             if r1.collidepoint((mx,my)):
-                self.use_player_reinforce()
+                self.queue_action('reinforce')
             if r2.collidepoint((mx,my)):
-                self.use_player_quantum()
+                self.queue_action('quantum')
             if r3.collidepoint((mx,my)):
-                self.player.use_teleport(mx + self.camera.x, my + self.camera.y)
+                self.queue_action('teleport', int(mx + self.camera.x), int(my + self.camera.y))
             if r4.collidepoint((mx,my)):
-                self.player.use_ultimate()
+                self.queue_action('ultimate')
             if self.dev_anti_repeat <= 0 and r5.collidepoint((mx,my)):
-                self.dev_add_level(1)
+                self.queue_action('dev_level', 1)
                 self.dev_anti_repeat = 0.25
         # Team ownership display
         owners = {t: 0 for t in range(self.num_teams)}
@@ -2728,6 +5259,11 @@ class Game:
         
         # Game time
         time_text = f"Время: {int(self.game_duration)}с"
+        if self.replay_reader is not None:
+            total = self.replay_reader.ticks // FPS
+            time_text += f"  |  Повтор {int(self.game_duration)}/{total}с (←/→, PgUp/PgDn, Home/End)"
+        if self.save_note and time.time() < self.save_note_until:
+            time_text += f"  |  {self.save_note}"
         time_surf = self.font.render(time_text, True, (200, 210, 225))
         time_x = int((self.window_manager.current_width - time_surf.get_width() - 20) * self.window_manager.scale_x)
         time_y = int(12 * self.window_manager.scale_y)
@@ -2793,7 +5329,7 @@ class Game:
         if pygame.mouse.get_pressed()[0] and self.player.upgrade_points > 0:
             for r, key in btns:
                 if r.collidepoint((mx,my)):
-                    self.apply_upgrade(self.player, key)
+                    self.queue_action('upgrade', key)
                     break
 
     def draw_class_overlay(self):
@@ -2838,8 +5374,7 @@ class Game:
         if pygame.mouse.get_pressed()[0] and self.player.class_points > 0:
             for r, nid, can_buy in btns:
                 if can_buy and r.collidepoint((mx,my)):
-                    self.player.add_class_node(nid)
-                    self.player.class_points -= 1
+                    self.queue_action('class', nid)
                     break
 
     def draw_pause(self):
@@ -2954,6 +5489,7 @@ class Game:
             "I - статистика",
             "H - туториал",
             "Z/X/C - зум камеры",
+            "F3 - профайлер кадра",
             "",
             "НОВЫЕ ФУНКЦИИ:",
             "• Улучшенная камера с зумом",
@@ -2976,20 +5512,141 @@ class Game:
 
     # ---------- Main loop ----------
     def run(self):
+        # Fixed-step simulation, rendering decoupled: the accumulator holds real time
+        # not yet simulated, capped so a long stall costs at most MAX_SIM_STEPS ticks.
+        acc = 0.0
         while True:
-            dt = self.clock.tick(FPS) / 1000.0
+            frame = self.clock.tick(RENDER_FPS) / 1000.0
+            t0 = time.perf_counter()
+            pt = self.phase_timer
+            if pt: pt.start()
             self.handle_events()
-            self.update(dt)
-            self.draw()
+            if pt: pt.mark('events')
+            acc = min(acc + frame, SIM_DT * MAX_SIM_STEPS)
+            while acc >= SIM_DT:
+                self.step()
+                acc -= SIM_DT
+            self.killcam.advance(frame)
+            self.draw(acc / SIM_DT)
+            self.end_frame(frame, time.perf_counter() - t0)
+
+    def end_frame(self, dt: float, work: float):
+        """Hand the frame's phase times and counters to the flight recorder and the F3 overlay"""
+        gc_manager.end_frame(self.gc_safe_point())
+        times = {name: t * 1000.0 for name, t in self.phase_timer.take().items()}
+        counters = self.take_counters()
+        self.flight.end_frame(self.tick, dt, work, times, counters)
+        if self.profiler:
+            self.profiler.end_frame(times, counters)
+
+    def flight_context(self) -> Dict[str, Any]:
+        return {'state': self.state.name, 'match_seed': self.match_seed, 'num_teams': self.num_teams,
+                'tick': self.tick, 'sim_time': round(self.sim_time, 3), 'replay': self.replay is not None,
+                'profiler': self.profiler is not None, 'gc': gc_manager.report()}
+
+    def step(self):
+        """One simulation tick plus the kill cam, replay keyframes and autosave that ride on it"""
+        super().step()
+        pt = self.phase_timer
+        if self.killcam_enabled:
+            self.killcam.capture(self)
+            if pt: pt.mark('killcam')
+        if self.seeker is not None:
+            self.seeker.capture()
+            if pt: pt.mark('keyframes')
+        elif self.autosaver is not None:
+            self.autosaver.update(self)
+            if pt: pt.mark('autosave')
+
+
+def run_headless(num_teams: int = 2, ticks: int = FPS * 300, dt: float = 1.0 / FPS,
+                 seed: Optional[int] = None, num_obstacles: int = NUM_OBSTACLES) -> Dict[str, Any]:
+    """Bot-only match without display, fonts, mixer or input; returns the match result"""
+    world = World(seed=seed, num_teams=clamp(num_teams, 2, MAX_TEAMS_LIMIT))
+    world.num_obstacles = max(0, num_obstacles)
+    result = world.simulate(ticks, dt)
+    result['num_teams'] = world.num_teams
+    return result
+
+
+def run_replay(path: str) -> Dict[str, Any]:
+    """Re-simulate a recorded match headless, unthrottled; checks the final state against the recording"""
+    game = Game(headless=True)
+    reader = game.load_replay(path)
+    result = game.simulate(reader.ticks)
+    result['num_teams'] = game.num_teams
+    result['replay'] = path
+    result['digest_match'] = (result['digest'] == reader.digest) if reader.digest else None
+    return result
+
+
+def run_save(path: str, ticks: int = FPS * 300) -> Dict[str, Any]:
+    """Continue a saved match headless for up to N more ticks"""
+    world = World()
+    world.load_game(path)
+    result = world.run_ticks(ticks)
+    result['num_teams'] = world.num_teams
+    result['save'] = path
+    return result
+
+
+def parse_args(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Space Arena")
+    ap.add_argument('--headless', action='store_true', help="bot-only match without a window, prints JSON result")
+    ap.add_argument('--ticks', type=int, default=FPS * 300, help="max simulation ticks in headless mode")
+    ap.add_argument('--teams', type=int, default=2, help="number of teams in headless mode (2-6)")
+    ap.add_argument('--dt', type=float, default=1.0 / FPS, help="fixed simulation step, seconds")
+    ap.add_argument('--seed', type=int, default=None, help="match seed (default: a fresh one per match)")
+    ap.add_argument('--obstacles', type=int, default=NUM_OBSTACLES, help="number of random obstacles on the map")
+    ap.add_argument('--record', action='store_true', help=f"record every match to {REPLAY_DIR}/")
+    ap.add_argument('--replay', metavar='FILE', help="play a recorded match (with --headless: re-simulate and print JSON)")
+    ap.add_argument('--load', metavar='FILE', help="continue a saved match (with --headless: run --ticks more, print JSON)")
+    ap.add_argument('--profile', metavar='PREFIX',
+                    help="sample the main thread's stack; on exit write PREFIX.trace.json and PREFIX.folded")
+    ap.add_argument('--profile-hz', type=int, default=PROFILE_HZ, help="stack samples per second for --profile")
+    ap.add_argument('--spike-ms', type=float, default=FLIGHT_SPIKE_MS,
+                    help="dump the flight recorder when a frame takes longer than this (0 = never)")
+    ap.add_argument('--no-gc-freeze', action='store_true', help="don't freeze the heap at match start")
+    ap.add_argument('--gc-defer', action='store_true', default=GC_DEFER_GEN2,
+                    help="hold full garbage collections for pauses, menus and respawn waits")
+    return ap.parse_args(argv)
 
 
 if __name__ == '__main__':
+    args = parse_args()
+    if args.profile:
+        import atexit
+        atexit.register(SamplingProfiler(args.profile_hz).start().save, args.profile)
+    if args.headless:
+        if args.replay:
+            result = run_replay(args.replay)
+        elif args.load:
+            result = run_save(args.load, args.ticks)
+        else:
+            result = run_headless(args.teams, args.ticks, args.dt, args.seed, args.obstacles)
+        print(json.dumps(result, ensure_ascii=False))
+        sys.exit(0)
+    game = None
     try:
-        Game().run()
+        game = Game(seed=args.seed)
+        game.flight.threshold_ms = args.spike_ms
+        game.gc_freeze = not args.no_gc_freeze
+        gc_manager.defer_gen2(args.gc_defer)
+        if args.record:
+            game.record_dir = REPLAY_DIR
+        if args.replay:
+            game.load_replay(args.replay)
+            game.start_game()
+        elif args.load:
+            game.load_game(args.load)
+        game.run()
     except Exception as e:
         import traceback
         tb = traceback.format_exc()
         with open('error_log.txt', 'w', encoding='utf-8') as f:
             f.write(tb)
+        if game is not None:
+            game.flight.dump(FLIGHT_CRASH_FILE)
         print(tb)
         raise